@@ -0,0 +1,258 @@
+"""publican_api autocomplete"""
+
+import bisect
+import datetime
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connection
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+import publican_api.basemodels as api_basemodels
+import publican_api.registry as api_registry
+
+
+# Sorts after every character a name can hold, closing a prefix range.
+PREFIX_END = '\U0010ffff'
+
+# Prefix ranges wider than this are ranked once and cached until the next
+# write or rating refresh; at most MAX_CACHED_PREFIXES of them are kept.
+CACHE_RANGE_OVER = 1000
+MAX_CACHED_PREFIXES = 256
+
+
+def get_autocomplete_limit():
+    return getattr(settings, 'AUTOCOMPLETE_LIMIT', 10)
+
+
+def get_rating_refresh_interval():
+    return getattr(settings, 'AUTOCOMPLETE_RATING_REFRESH', 60)
+
+
+def get_rank(_rating, _key):
+    # Drinks best rated first, then every unrated Resource; ties by name.
+    return (_rating is None, -(_rating or 0), _key)
+
+
+def get_fields(_model):
+    return (('pk', 'name', 'slug') 
+            + (('overall_rating',) if issubclass(_model, api_basemodels.Drink) else ()))
+
+
+class AutocompleteIndex(object):
+    """
+    Sorted array of (lowercased name, collection, pk) keys over every Resource, 
+    searched by prefix with bisect.  Each entry also holds its name, slug and, 
+    for Drinks, overall_rating, which ranks matches.  Built from every table 
+    on first use only; after that post_save/post_delete queue the written 
+    rows and apply() moves just those in the sorted array once their 
+    transaction has committed, re-reading them so a rolled back write never 
+    shows up.  Rows other processes write are caught up from the updated 
+    index, and ratings, which change through queryset updates, re-read from 
+    the drink tables, at most every AUTOCOMPLETE_RATING_REFRESH seconds.
+    """
+    def __init__(self):
+        self._keys = None
+        self._entries = {}
+        self._ranked = {}
+        self._refreshed = 0
+        self._synced = None
+        self._pending = threading.local()
+        self._lock = threading.RLock()
+    
+    def _get_key(self, _collection, _pk):
+        _name = self._entries[(_collection, _pk)][0]
+        return (_name.lower(), _collection, _pk)
+    
+    def build(self):
+        _synced = timezone.now()
+        _keys = []
+        _entries = {}
+        for _entry in api_registry.get_registry().resources:
+            for _row in _entry.model.objects.values_list(*get_fields(_entry.model)).iterator():
+                _entries[(_entry.collection, _row[0])] = (
+                                _row[1], _row[2], _row[3] if len(_row) > 3 else None)
+                _keys.append((_row[1].lower(), _entry.collection, _row[0]))
+        _keys.sort()
+        with self._lock:
+            self._keys = _keys
+            self._entries = _entries
+            self._ranked = {}
+            self._refreshed = time.time()
+            self._synced = _synced
+    
+    def _remove(self, _collection, _pk):
+        if (_collection, _pk) not in self._entries:
+            return
+        _key = self._get_key(_collection, _pk)
+        _index = bisect.bisect_left(self._keys, _key)
+        if _index < len(self._keys) and self._keys[_index] == _key:
+            del self._keys[_index]
+        del self._entries[(_collection, _pk)]
+    
+    def _update(self, _model, _pks, _rows):
+        # Every pk is dropped first, so renames re-sort and deletes stay gone.
+        _collection = api_registry.get_registry().by_model[_model].collection
+        with self._lock:
+            for _pk in _pks:
+                self._remove(_collection, _pk)
+            for _row in _rows:
+                self._remove(_collection, _row[0])
+                self._entries[(_collection, _row[0])] = (
+                                _row[1], _row[2], _row[3] if len(_row) > 3 else None)
+                bisect.insort(self._keys, self._get_key(_collection, _row[0]))
+            self._ranked = {}
+    
+    def queue(self, _model, _pk):
+        """Queue a written row for apply(), or for the build if not built yet."""
+        if self._keys is None:
+            return
+        if not hasattr(self._pending, 'rows'):
+            self._pending.rows = set()
+        self._pending.rows.add((_model, _pk))
+    
+    def apply(self):
+        """
+        Re-read the rows this thread queued and move them in the index, one 
+        query per model.  Waits while the thread is inside a transaction, 
+        whose writes may still roll back.
+        """
+        _pending = getattr(self._pending, 'rows', None)
+        if not _pending or connection.in_atomic_block:
+            return
+        self._pending.rows = set()
+        _pks = {}
+        for _model, _pk in _pending:
+            _pks.setdefault(_model, set()).add(_pk)
+        for _model, _model_pks in _pks.items():
+            _rows = [_row for _chunk in api_basemodels.filter_in(_model.objects.all(), 
+                                                                 'pk', 
+                                                                 _model_pks) 
+                     for _row in _chunk.values_list(*get_fields(_model))]
+            self._update(_model, _model_pks, _rows)
+    
+    def catch_up(self):
+        """
+        Apply rows updated since the last pass, by this or another process, 
+        and refresh every drink rating, dropping drinks deleted elsewhere.  
+        The lookback overlaps the previous pass by one interval, so rows 
+        whose transaction committed after their updated time are not missed.
+        """
+        _synced = timezone.now()
+        _since = self._synced - datetime.timedelta(seconds=get_rating_refresh_interval())
+        _ratings = []
+        for _entry in api_registry.get_registry().resources:
+            self._update(_entry.model, (), _entry.model.objects.filter(updated__gte=_since)
+                                                               .values_list(*get_fields(_entry.model)))
+            if issubclass(_entry.model, api_basemodels.Drink):
+                _ratings.append((_entry.collection, dict(
+                                    _entry.model.objects.values_list('pk', 'overall_rating')
+                                                        .iterator())))
+        with self._lock:
+            for _collection, _collection_ratings in _ratings:
+                for (_entry_collection, _pk), _value in list(self._entries.items()):
+                    if _entry_collection != _collection:
+                        continue
+                    if _pk in _collection_ratings:
+                        self._entries[(_collection, _pk)] = (_value[:2] 
+                                                             + (_collection_ratings[_pk],))
+                    else:
+                        self._remove(_collection, _pk)
+            self._ranked = {}
+            self._refreshed = time.time()
+            self._synced = _synced
+    
+    def _ensure_current(self):
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self.build()
+            return
+        self.apply()
+        if time.time() - self._refreshed > get_rating_refresh_interval():
+            with self._lock:
+                if time.time() - self._refreshed > get_rating_refresh_interval():
+                    self.catch_up()
+    
+    def complete(self, _prefix, limit=10, _collections=None):
+        """
+        Return up to limit (collection, pk, name, slug, rating) tuples whose 
+        name starts with _prefix, case-insensitively, best rated first, then 
+        by name.  Resources without a rating follow every Drink.
+        """
+        self._ensure_current()
+        _prefix = _prefix.lower()
+        _cache_key = (_prefix, limit, _collections)
+        _ranked = self._ranked.get(_cache_key)
+        if _ranked is not None:
+            return _ranked
+        
+        with self._lock:
+            _keys = self._keys
+            _entries = self._entries
+            _low = bisect.bisect_left(_keys, (_prefix,))
+            _high = bisect.bisect_left(_keys, (_prefix + PREFIX_END,))
+            _candidates = (_keys[_index] for _index in range(_low, _high)
+                           if _collections is None
+                           or _keys[_index][1] in _collections)
+            _ranked = [(_collection, _pk) + _entries[(_collection, _pk)]
+                       for _name, _collection, _pk in heapq.nsmallest(
+                            limit, 
+                            _candidates, 
+                            key=lambda _key: get_rank(_entries[_key[1:]][2], _key))]
+            if _high - _low > CACHE_RANGE_OVER:
+                if len(self._ranked) >= MAX_CACHED_PREFIXES:
+                    self._ranked = {}
+                self._ranked[_cache_key] = _ranked
+        return _ranked
+# /AutocompleteIndex
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def index_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete_index.queue(sender, instance.pk)
+        apply_on_commit()
+# /index_saved
+
+
+def unindex_deleted(sender, instance, **kwargs):
+    autocomplete_index.queue(sender, instance.pk)
+    apply_on_commit()
+# /unindex_deleted
+
+
+def apply_on_commit():
+    # Django 1.9 runs the callback once the outermost transaction commits; 
+    # earlier versions apply now if not in one, else at the end of the 
+    # request or on the next completion in this thread.
+    _on_commit = getattr(transaction, 'on_commit', None)
+    if _on_commit is not None:
+        _on_commit(autocomplete_index.apply)
+    else:
+        autocomplete_index.apply()
+# /apply_on_commit
+
+
+def apply_pending(sender, **kwargs):
+    autocomplete_index.apply()
+# /apply_pending
+
+
+def connect(_resource_models):
+    for _model in _resource_models:
+        post_save.connect(index_saved, sender=_model)
+        post_delete.connect(unindex_deleted, sender=_model)
+    request_finished.connect(apply_pending)
+# /connect
+
+
+# EOF - publican_api autocomplete
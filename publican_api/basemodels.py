@@ -1,12 +1,107 @@
 """publican_api base models"""
 
+import itertools
+import re
+
 from django.db import models
+from django.db import transaction
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 from django.contrib.contenttypes import generic
+from django.contrib.contenttypes.models import ContentType
 from django.utils.text import slugify
 
+import publican_api.urlcache as api_urlcache
+import publican_api.writebehind as api_writebehind
+
+
+SLUG_LENGTH = 128
+
+# Room kept at the end of a slug for a '-<n>' collision suffix.
+SLUG_SUFFIX_LENGTH = 8
+
+# Values bound per IN (...) lookup, under SQLite's 999 bound parameter limit.
+IN_CHUNK_SIZE = 500
+
+
+def filter_in(_queryset, _field, _values, chunk_size=IN_CHUNK_SIZE):
+    """
+    Yield _queryset filtered on _field__in each chunk_size slice of _values, 
+    so lookups of any number of values stay under the parameter limit.
+    """
+    _values = list(_values)
+    for _start in range(0, len(_values), chunk_size):
+        yield _queryset.filter(**{_field + '__in': _values[_start:_start + chunk_size]})
+# /filter_in
+
+
+def get_base_slug(_model, _value):
+    """
+    Slugify _value, leaving room for a collision suffix.  Empty or all-digit 
+    slugs get the model name appended, so a slug never reads as a pk.
+    """
+    _slug = slugify(_value)[:SLUG_LENGTH - SLUG_SUFFIX_LENGTH].strip('-')
+    if not _slug or _slug.isdigit():
+        _slug = '-'.join(_part for _part in (_slug, _model._meta.model_name) if _part)
+    return _slug
+# /get_base_slug
+
+
+def is_slug_of(_slug, _base):
+    return _slug == _base or re.match(re.escape(_base) + r'-\d+$', _slug) is not None
+# /is_slug_of
+
+
+def next_free_slug(_base, _taken):
+    if _base not in _taken:
+        return _base
+    for _n in itertools.count(2):
+        _slug = '%s-%d' % (_base, _n)
+        if _slug not in _taken:
+            return _slug
+# /next_free_slug
+
+
+def get_unique_slug(_instance, _value):
+    """
+    Return a slug for _value that no other row of _instance's model holds.  
+    An instance keeps its slug while _value still slugifies to it, so only 
+    inserts and renames pay the one query for the slugs already taken.  The 
+    unique index on slug settles any race between concurrent writers.
+    """
+    _model = type(_instance)
+    _base = get_base_slug(_model, _value)
+    if _instance.pk is not None and _instance.slug and is_slug_of(_instance.slug, _base):
+        return _instance.slug
+    _taken = set(_model.objects.filter(slug__startswith=_base)
+                               .exclude(pk=_instance.pk)
+                               .values_list('slug', flat=True))
+    return next_free_slug(_base, _taken)
+# /get_unique_slug
+
+
+def get_unique_slugs(_model, _values):
+    """
+    Allocate unique slugs for a batch of new _model rows in _values order.  
+    One query per IN_CHUNK_SIZE bases finds those already taken, and only 
+    those bases are queried again for their suffixed slugs.
+    """
+    _bases = [get_base_slug(_model, _value) for _value in _values]
+    _collided = set(_slug for _chunk in filter_in(_model.objects.all(), 'slug', set(_bases)) 
+                    for _slug in _chunk.values_list('slug', flat=True))
+    _taken = set()
+    for _base in _collided:
+        _taken.update(_model.objects.filter(slug__startswith=_base)
+                                    .values_list('slug', flat=True))
+    _slugs = []
+    for _base in _bases:
+        _slug = next_free_slug(_base, _taken)
+        _taken.add(_slug)
+        _slugs.append(_slug)
+    return _slugs
+# /get_unique_slugs
+
 
 class Resource(models.Model):
     
@@ -15,13 +110,16 @@ class Resource(models.Model):
         app_label = settings.APP_LABEL
         get_latest_by = "updated"
         ordering = ['name']
+        # Keyset pagination keys; see publican_api.pagination.
+        index_together = (('name', 'id'), ('updated', 'id'))
     
     name = models.CharField("Name", 
                             max_length=128, 
                             unique=True, 
                             help_text="Max 128 characters.")
     
-    slug = models.SlugField(max_length=128, 
+    slug = models.SlugField(max_length=SLUG_LENGTH, 
+                            unique=True, 
                             editable=False)
     
     created = models.DateTimeField("Created", 
@@ -33,12 +131,21 @@ class Resource(models.Model):
                                    editable=False)
     
     def get_absolute_url(self):
-        _view_name = self._meta.verbose_name.replace(' ', '') + "-detail"
-        return reverse(_view_name, kwargs={'lookup': str(self.id)})
+        _view_name = api_urlcache.url_templates.get_view_name(type(self))
+        _path = api_urlcache.url_templates.get_path(_view_name, self.slug)
+        if _path is None:
+            return reverse(_view_name, kwargs={'pk': self.slug})
+        return _path
+    
+    def get_catalog_model(self):
+        return models.get_model(app_label=settings.APP_LABEL, 
+                                model_name='CatalogEntry')
     
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.name)
-        super(Resource, self).save(*args, **kwargs)
+        self.slug = get_unique_slug(self, self.name)
+        with transaction.atomic(savepoint=False):
+            super(Resource, self).save(*args, **kwargs)
+            self.get_catalog_model().index(self)
     
     def __str__(self):
         return self.name
@@ -52,7 +159,64 @@ class Drink(models.Model):
     
     overall_rating = models.FloatField("Overall Rating", 
                                        default=0, 
+                                       db_index=True, 
                                        editable=False)
+    
+    rating_sum = models.FloatField("Rating Sum", 
+                                   default=0, 
+                                   editable=False)
+    
+    rating_count = models.PositiveIntegerField("Rating Count", 
+                                               default=0, 
+                                               editable=False)
+    
+    # (attribute, minimum, maximum) rows, set by concrete drinks.
+    VALUE_RANGES = ()
+    
+    # Indexed attributes list views filter on, set by concrete drinks; see 
+    # publican_api.filters.
+    FILTER_FIELDS = ()
+    
+    @staticmethod
+    def calculate_overall_rating(rating_sum, rating_count):
+        """
+        1) Divide the running rating sum by the running rating count.
+            average_rating = rating_sum / rating_count
+        2) Ratchet average rating to final quarter fractional value.
+            overall_rating = round(DENOMINATION * average_rating) / DENOMINATION
+        3) Return overall rating, or zero for a drink with no reviews.
+        """
+        DENOMINATION = 4
+        
+        if not rating_count:
+            return 0
+        average_rating = rating_sum / rating_count
+        overall_rating = round(DENOMINATION * average_rating) / DENOMINATION
+        return overall_rating
+    
+    @classmethod
+    def adjust_rating(cls, pk, rating_delta, count_delta):
+        """
+        Apply a review delta to the running rating_sum/rating_count of one 
+        drink and refresh its overall_rating from those two numbers, in two 
+        queries: a locking read of the drink row and one UPDATE of the three 
+        columns.  Must run inside a transaction so the lock is held until the 
+        write commits.  The drink row is updated in place, so neither save() 
+        nor slugify() run.  Returns the new (rating_sum, rating_count, 
+        overall_rating).
+        """
+        _drinks = cls.objects.filter(pk=pk)
+        rating_sum, rating_count = (_drinks.select_for_update()
+                                           .values_list('rating_sum', 
+                                                        'rating_count')
+                                           .get())
+        rating_sum += rating_delta
+        rating_count += count_delta
+        overall_rating = cls.calculate_overall_rating(rating_sum, rating_count)
+        _drinks.update(rating_sum=rating_sum, 
+                       rating_count=rating_count, 
+                       overall_rating=overall_rating)
+        return rating_sum, rating_count, overall_rating
 # /Drink
 
 
@@ -97,6 +261,8 @@ class Review(models.Model):
         app_label = settings.APP_LABEL
         get_latest_by = "updated"
         ordering = ['title']
+        # Keyset pagination keys; see publican_api.pagination.
+        index_together = (('title', 'id'), ('updated', 'id'))
     
     rater = models.ForeignKey(User, 
                               related_name="%(app_label)s_%(class)s_rater")
@@ -105,7 +271,8 @@ class Review(models.Model):
                              unique=True, 
                              help_text="Max 128 characters.")
     
-    slug = models.SlugField(max_length=128, 
+    slug = models.SlugField(max_length=SLUG_LENGTH, 
+                            unique=True, 
                             editable=False)
     
     description = models.CharField("Description", 
@@ -116,6 +283,12 @@ class Review(models.Model):
                                      default=0, 
                                      editable=False)
     
+    # Version of the RatingWeightProfile total_rating was scored with.
+    weight_version = models.PositiveIntegerField("Weight Version", 
+                                                 default=0, 
+                                                 db_index=True, 
+                                                 editable=False)
+    
     created = models.DateTimeField("Created", 
                                    auto_now_add=True, 
                                    editable=False)
@@ -124,6 +297,20 @@ class Review(models.Model):
                                    auto_now=True, 
                                    editable=False)
     
+    # Name of the ForeignKey to the reviewed Drink, set by concrete reviews.
+    drink_field = None
+    
+    # Default (attribute, weight) pairs, set by concrete reviews and 
+    # superseded by any published RatingWeightProfile.
+    RATING_WEIGHTS = ()
+    
+    # (attribute, minimum, maximum) rows, set by concrete reviews.
+    RATING_RANGES = ()
+    
+    def __init__(self, *args, **kwargs):
+        super(Review, self).__init__(*args, **kwargs)
+        self._remember_rating()
+    
     @staticmethod
     def calculate_total_rating(categories):
         """
@@ -146,9 +333,172 @@ class Review(models.Model):
         total_rating = round(DENOMINATION * fractional_rating) / DENOMINATION
         return total_rating
     
+    def get_drink_model(self):
+        return self._meta.get_field(self.drink_field).rel.to
+    
+    def get_drink_id(self):
+        return getattr(self, self._meta.get_field(self.drink_field).attname)
+    
+    def _remember_rating(self):
+        """
+        Snapshot the persisted (drink_id, total_rating) pair so the next save or 
+        delete can apply a delta instead of rescanning every sibling review.  
+        Deferred fields are not in __dict__ and are fetched lazily on save.
+        """
+        if self.pk is None:
+            self._rated = None
+        else:
+            _attname = self._meta.get_field(self.drink_field).attname
+            self._rated = (self.__dict__.get(_attname), 
+                           self.__dict__.get('total_rating'))
+    
+    def _load_rated(self):
+        if self._rated is not None and None in self._rated:
+            _attname = self._meta.get_field(self.drink_field).attname
+            self._rated = type(self).objects.filter(pk=self.pk).values_list(
+                                                _attname, 'total_rating').get()
+    
+    def get_rating_changes(self):
+        """
+        Return the list of (drink_id, total_rating, sign) entries that move the 
+        previously persisted rating out of its drink and the current rating in.
+        """
+        _drink_id = self.get_drink_id()
+        if self._rated is None:
+            return [(_drink_id, self.total_rating, 1)]
+        _old_drink_id, _old_rating = self._rated
+        if (_old_drink_id, _old_rating) == (_drink_id, self.total_rating):
+            return []
+        return [(_old_drink_id, _old_rating, -1), 
+                (_drink_id, self.total_rating, 1)]
+    
+    def apply_rating_changes(self, changes):
+        """
+        Coalesce rating changes per drink and apply them as atomic increments 
+        of the drink's running rating_sum and rating_count.
+        """
+        _deltas = {}
+        for _drink_id, _rating, _sign in changes:
+            _rating_delta, _count_delta = _deltas.get(_drink_id, (0, 0))
+            _deltas[_drink_id] = (_rating_delta + _sign * _rating, 
+                                  _count_delta + _sign)
+        
+        _drink_model = self.get_drink_model()
+        _cache_name = self._meta.get_field(self.drink_field).get_cache_name()
+        _cached_drink = getattr(self, _cache_name, None)
+        for _drink_id, (_rating_delta, _count_delta) in _deltas.items():
+            if not (_rating_delta or _count_delta):
+                continue
+            _result = _drink_model.adjust_rating(_drink_id, 
+                                                 _rating_delta, 
+                                                 _count_delta)
+            if _cached_drink is not None and _cached_drink.pk == _drink_id:
+                (_cached_drink.rating_sum, 
+                 _cached_drink.rating_count, 
+                 _cached_drink.overall_rating) = _result
+    
+    def apply_histogram_changes(self, changes):
+        """
+        Move each rating change in or out of its drink's histogram bucket.  
+        Histogram rows are not the contended drink row, so this always runs 
+        inside the review's transaction, deferred mode or not.
+        """
+        _histogram_model = models.get_model(app_label=settings.APP_LABEL, 
+                                            model_name='RatingHistogram')
+        _content_type = ContentType.objects.get_for_model(self.get_drink_model())
+        for _drink_id, _rating, _sign in changes:
+            _histogram_model.adjust(_content_type, _drink_id, _rating, _sign)
+    
+    def apply_rollup_changes(self, changes):
+        """
+        Move each rating change in or out of the daily rollup for the day this 
+        review was created, alongside the histogram in the review transaction.  
+        Changes are coalesced per drink, so re-rating a review is one UPDATE.
+        """
+        _rollup_model = models.get_model(app_label=settings.APP_LABEL, 
+                                         model_name='RatingRollup')
+        _content_type = ContentType.objects.get_for_model(self.get_drink_model())
+        _day = self.created.date()
+        _deltas = {}
+        for _drink_id, _rating, _sign in changes:
+            _count_delta, _rating_delta = _deltas.get(_drink_id, (0, 0))
+            _deltas[_drink_id] = (_count_delta + _sign, 
+                                  _rating_delta + _sign * _rating)
+        for _drink_id, (_count_delta, _rating_delta) in _deltas.items():
+            _rollup_model.adjust(_content_type, 
+                                 _drink_id, 
+                                 _day, 
+                                 _count_delta, 
+                                 _rating_delta)
+    
+    def defer_rating_changes(self, changes):
+        """
+        Mark the drinks touched by changes dirty for the write-behind queue, 
+        which recomputes each of them once per flush interval.
+        """
+        for _drink_id, _rating, _sign in changes:
+            api_writebehind.rating_queue.mark_dirty(type(self), _drink_id)
+    
+    @classmethod
+    def get_weight_profile(cls):
+        _profile_model = models.get_model(app_label=settings.APP_LABEL, 
+                                          model_name='RatingWeightProfile')
+        return _profile_model.get_current_weights(cls)
+    
+    def get_rating_categories(self, weights):
+        return [(getattr(self, _attribute), _weight) 
+                for _attribute, _weight in weights]
+    
+    def save(self, *args, **kwargs):
+        """
+        Pass a list of tuples of attributes and their respective rating weights.
+        The weighted ratings are whole number percentages, so the sum of 
+        weighted ratings must add up to 100.
+        """
+        self.slug = get_unique_slug(self, self.title)
+        self.weight_version, _weights = self.get_weight_profile()
+        self.total_rating = self.calculate_total_rating(
+                                        self.get_rating_categories(_weights))
+        _deferred = api_writebehind.is_deferred()
+        with transaction.atomic(savepoint=False):
+            self._load_rated()
+            super(Review, self).save(*args, **kwargs)
+            _changes = self.get_rating_changes()
+            self.apply_histogram_changes(_changes)
+            self.apply_rollup_changes(_changes)
+            if not _deferred:
+                self.apply_rating_changes(_changes)
+        if _deferred:
+            self.defer_rating_changes(_changes)
+        self._remember_rating()
+    
+    def delete(self, *args, **kwargs):
+        """
+        Remove this review's rating from its drink's running aggregates.  
+        Queryset deletes bypass this method; run the recompute_ratings command 
+        afterwards to bring those aggregates back in line.
+        """
+        _deferred = api_writebehind.is_deferred()
+        with transaction.atomic(savepoint=False):
+            self._load_rated()
+            _changes = []
+            if self._rated is not None:
+                _changes.append(self._rated + (-1,))
+            super(Review, self).delete(*args, **kwargs)
+            self.apply_histogram_changes(_changes)
+            self.apply_rollup_changes(_changes)
+            if not _deferred:
+                self.apply_rating_changes(_changes)
+        if _deferred:
+            self.defer_rating_changes(_changes)
+        self._rated = None
+    
     def get_absolute_url(self):
-        _view_name = self._meta.verbose_name.replace(' ', '') + "-detail"
-        return reverse(_view_name, kwargs={'lookup': str(self.id)})
+        _view_name = api_urlcache.url_templates.get_view_name(type(self))
+        _path = api_urlcache.url_templates.get_path(_view_name, self.slug)
+        if _path is None:
+            return reverse(_view_name, kwargs={'pk': self.slug})
+        return _path
     
     def __str__(self):
         return self.title
@@ -0,0 +1,76 @@
+"""publican_api row count cache"""
+
+try:
+    from django.core.cache import caches
+except ImportError:
+    # Django 1.6
+    caches = None
+    from django.core.cache import get_cache
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+
+COUNT_CACHE_KEY = 'publican_api.count.{0}.{1}'
+
+
+def get_count_cache():
+    _alias = getattr(settings, 'ROW_COUNT_CACHE', 'default')
+    if caches is None:
+        return get_cache(_alias)
+    return caches[_alias]
+
+
+def get_count_timeout():
+    # A backstop for changes that bypass the signals, e.g. queryset updates
+    # moving users in or out of UserViewSet's queryset.
+    return getattr(settings, 'ROW_COUNT_CACHE_TIMEOUT', 300)
+
+
+def get_count_key(_model):
+    return COUNT_CACHE_KEY.format(_model._meta.app_label, _model._meta.model_name)
+
+
+def get_count(_queryset):
+    """
+    Return the row count of a viewset's base _queryset from the cache, 
+    counting it only on a miss.  One count is kept per model, so each model 
+    must have a single base queryset counted this way.  The ROW_COUNT_CACHE 
+    alias must be shared by every process: with a per-process cache, such 
+    as the default local memory one, other processes' invalidations are 
+    missed until ROW_COUNT_CACHE_TIMEOUT.
+    """
+    _key = get_count_key(_queryset.model)
+    _cache = get_count_cache()
+    _count = _cache.get(_key)
+    if _count is None:
+        _count = _queryset.count()
+        _cache.set(_key, _count, get_count_timeout())
+    return _count
+# /get_count
+
+
+def invalidate_count(_model):
+    get_count_cache().delete(get_count_key(_model))
+
+
+def invalidate_created(sender, instance, created=False, **kwargs):
+    if created:
+        invalidate_count(sender)
+# /invalidate_created
+
+
+def invalidate_deleted(sender, instance, **kwargs):
+    invalidate_count(sender)
+# /invalidate_deleted
+
+
+def connect(_counted_models):
+    for _model in _counted_models:
+        post_save.connect(invalidate_created, sender=_model)
+        post_delete.connect(invalidate_deleted, sender=_model)
+# /connect
+
+
+# EOF - publican_api row count cache
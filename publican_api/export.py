@@ -0,0 +1,61 @@
+"""publican_api collection export"""
+
+import itertools
+
+from django.conf import settings
+
+import publican_api.fastpath as api_fastpath
+import publican_api.queryplan as api_queryplan
+
+
+# Fast-path rows mapped per call while a chunk is read from its iterator.
+MAP_BATCH_SIZE = 100
+
+
+def get_export_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+
+
+def iter_export(_queryset, _serializer_class, request, after=0, chunk_size=None, context=None):
+    """
+    Yield the representation of every row of _queryset with a pk above 
+    after, in pk order.  Rows are read chunk_size at a time, each chunk a 
+    keyset query on pk > the last pk sent, so memory stays flat however 
+    large the table and no chunk re-reads the rows before it.  Serializers 
+    with a fast path map each chunk's values_list() rows MAP_BATCH_SIZE at a 
+    time as .iterator() reads them; the rest go through DRF with their 
+    query plan applied.
+    """
+    chunk_size = chunk_size or get_export_chunk_size()
+    _fast = api_fastpath.get_fast_serializer(_serializer_class, _queryset.model)
+    _map_rows = _fast.bind_rows(request) if _fast is not None else None
+    _last = after
+    while True:
+        _chunk = _queryset.filter(pk__gt=_last).order_by('pk')[:chunk_size]
+        _read = 0
+        if _map_rows is not None:
+            # pk is appended after the serializer's columns to track the key.
+            _rows = _chunk.values_list(*(_fast.columns + ('pk',))).iterator()
+            while True:
+                _batch = list(itertools.islice(_rows, MAP_BATCH_SIZE))
+                if not _batch:
+                    break
+                _read += len(_batch)
+                _last = _batch[-1][-1]
+                for _item in _map_rows(_batch):
+                    yield _item
+        else:
+            # Not .iterator(): it would skip the plan's prefetch_related.
+            _instances = list(api_queryplan.apply_query_plan(_chunk, _serializer_class))
+            _read = len(_instances)
+            if _instances:
+                _last = _instances[-1].pk
+            for _item in _serializer_class(_instances, many=True, context=context).data:
+                yield _item
+        # A short chunk was the last one.
+        if _read < chunk_size:
+            return
+# /iter_export
+
+
+# EOF - publican_api collection export
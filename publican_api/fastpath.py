@@ -0,0 +1,265 @@
+"""publican_api fast-path list serialization"""
+
+from collections import OrderedDict
+import itertools
+import threading
+import weakref
+
+from django.conf import settings
+from django.db import models
+from django.db.models.fields import FieldDoesNotExist
+
+from rest_framework import ISO_8601
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+import publican_api.urlcache as api_urlcache
+
+
+# Model fields whose DRF 2.4 representation is the database value itself.
+PASSTHROUGH_FIELDS = (models.AutoField, 
+                      models.BooleanField, 
+                      models.CharField, 
+                      models.FloatField, 
+                      models.IntegerField)
+
+# Declared serializer fields that render those model fields unchanged.
+DECLARED_PASSTHROUGH_FIELDS = (serializers.BooleanField, 
+                               serializers.CharField, 
+                               serializers.FloatField, 
+                               serializers.IntegerField)
+
+
+def is_enabled():
+    # FastPathTest checks every compiled serializer, and its sparse 
+    # variants, render the same JSON as DRF.
+    return getattr(settings, 'FAST_PATH_SERIALIZERS', True)
+
+
+def format_datetime(_value, _format=None):
+    # Mirrors rest_framework.fields.DateTimeField.to_native.
+    if _value is None or _format is None:
+        return _value
+    if _format.lower() == ISO_8601:
+        _ret = _value.isoformat()
+        if _ret.endswith('+00:00'):
+            _ret = _ret[:-6] + 'Z'
+        return _ret
+    return _value.strftime(_format)
+
+
+def format_date(_value, _format=None):
+    # Mirrors rest_framework.fields.DateField.to_native.
+    if _value is None or _format is None:
+        return _value
+    if _format.lower() == ISO_8601:
+        return _value.isoformat()
+    return _value.strftime(_format)
+
+
+class FastSerializer(object):
+    """
+    Read-only mapper from .values_list() rows to the exact representation 
+    serializer_class gives the same rows.  columns are the 
+    values_list() arguments; view_names the detail routes of the 'url' 
+    field and each ForeignKey hyperlink, in argument order of map_rows.
+    """
+    def __init__(self, serializer_class, columns, view_names, map_rows):
+        self.serializer_class = serializer_class
+        self.columns = columns
+        self.view_names = view_names
+        self.map_rows = map_rows
+    
+    def bind_rows(self, request):
+        """
+        Return a function of values_list() rows, starting with self.columns 
+        and possibly carrying more, that serializes them for request, or None 
+        when a hyperlinked route cannot be served from a URL template.
+        """
+        _templates = [api_urlcache.url_templates.get_template(_view_name)
+                      for _view_name in self.view_names]
+        if None in _templates:
+            return None
+        _root = api_urlcache.url_templates.get_url_root(request)
+        return lambda _rows: self.map_rows(_rows, _root, *_templates)
+    
+    def bind(self, request):
+        """Like bind_rows, but the returned function takes a queryset."""
+        _map_rows = self.bind_rows(request)
+        if _map_rows is None:
+            return None
+        return lambda _queryset: _map_rows(_queryset.values_list(*self.columns))
+# /FastSerializer
+
+
+def get_column(_field, _prefix):
+    # values_list() reads a nested ForeignKey's id by its name, not attname.
+    if _prefix and isinstance(_field, models.ForeignKey):
+        return _prefix + _field.name
+    return _prefix + _field.attname
+
+
+def is_compilable(_serializer_class):
+    # Per-instance field changes and transform_ hooks are left to DRF.
+    return not ('get_fields' in vars(_serializer_class) 
+                or any(_name.startswith('transform_') for _name in dir(_serializer_class)))
+
+
+def compile_fields(_serializer_class, _model, _prefix, _columns, _view_names):
+    """
+    Return the source of an expression building the dict _serializer_class 
+    gives a _model row, appending the values_list() columns it reads, each 
+    prefixed with _prefix, and the view names of its hyperlinks.  Returns 
+    None for fields the fast path does not represent exactly.
+    """
+    if not is_compilable(_serializer_class):
+        return None
+    if issubclass(_serializer_class, serializers.ModelSerializer):
+        _meta = getattr(_serializer_class, 'Meta', None)
+        _fields = getattr(_meta, 'fields', None)
+        if (getattr(_meta, 'model', None) is not _model or not _fields 
+                or _serializer_class.base_fields):
+            return None
+        _declared = dict.fromkeys(_fields)
+    else:
+        _fields = tuple(_serializer_class.base_fields)
+        _declared = _serializer_class.base_fields
+        if not _fields:
+            return None
+    
+    _items = []
+    for _name in _fields:
+        _value = "_row[%d]" % len(_columns)
+        _declared_field = _declared[_name]
+        if _declared_field is not None and _declared_field.source not in (None, _name):
+            return None
+        if _name == 'url' and _declared_field is None:
+            _columns.append(_prefix + ('pk' if not _prefix else _model._meta.pk.name))
+            _view_names.append(api_urlcache.url_templates.get_view_name(_model))
+            _items.append("_root + _template%d.format(_quote(%s))" % (
+                                len(_view_names) - 1, _value))
+            continue
+        try:
+            _field = _model._meta.get_field(_name)
+        except FieldDoesNotExist:
+            return None
+        
+        if isinstance(_declared_field, serializers.BaseSerializer):
+            if _declared_field.many or not isinstance(_field, models.ForeignKey):
+                return None
+            _columns.append(get_column(_field, _prefix))
+            _nested = compile_fields(type(_declared_field), 
+                                     _field.rel.to, 
+                                     _prefix + _name + '__', 
+                                     _columns, 
+                                     _view_names)
+            if _nested is None:
+                return None
+            _items.append("None if %s is None else %s" % (_value, _nested))
+            continue
+        if _declared_field is not None:
+            if not (isinstance(_declared_field, DECLARED_PASSTHROUGH_FIELDS) 
+                    and isinstance(_field, PASSTHROUGH_FIELDS)):
+                return None
+            _columns.append(get_column(_field, _prefix))
+            _items.append(_value)
+            continue
+        
+        _columns.append(get_column(_field, _prefix))
+        if isinstance(_field, models.ForeignKey):
+            _view_names.append(api_urlcache.url_templates.get_view_name(_field.rel.to))
+            _items.append("None if %s is None else _root + _template%d.format(_quote(%s))" % (
+                                _value, len(_view_names) - 1, _value))
+        elif isinstance(_field, models.DateTimeField):
+            _items.append("_format_datetime(%s, _datetime_format)" % _value)
+        elif isinstance(_field, models.DateField):
+            _items.append("_format_date(%s, _date_format)" % _value)
+        elif isinstance(_field, PASSTHROUGH_FIELDS):
+            _items.append(_value)
+        else:
+            return None
+    return "_dict((%s))" % "".join("(%r, %s), " % (_name, _item)
+                                   for _name, _item in zip(_fields, _items))
+# /compile_fields
+
+
+def compile_serializer(_serializer_class, _model):
+    """
+    Compile _serializer_class, rendering _model rows, into a FastSerializer 
+    whose map_rows is a generated function building every row's dict, 
+    nested serializers' included, in a single expression.  Model 
+    serializers compile their Meta.fields, plain serializers their declared 
+    fields.  Returns None when any field is one compile_fields leaves to 
+    DRF.
+    """
+    _columns = []
+    _view_names = []
+    _expression = compile_fields(_serializer_class, _model, '', _columns, _view_names)
+    if _expression is None:
+        return None
+    _source = ("def map_rows(_rows, _root, %s):\n"
+               "    return [%s for _row in _rows]\n") % (
+                    "".join("_template%d, " % _index
+                            for _index in range(len(_view_names))), 
+                    _expression)
+    _namespace = {'_dict': OrderedDict, 
+                  '_quote': api_urlcache.quote_lookup, 
+                  '_format_datetime': format_datetime, 
+                  '_format_date': format_date, 
+                  '_datetime_format': api_settings.DATETIME_FORMAT, 
+                  '_date_format': api_settings.DATE_FORMAT}
+    exec(compile(_source, '<fastpath %s>' % _serializer_class.__name__, 'exec'), 
+         _namespace)
+    return FastSerializer(_serializer_class, 
+                          tuple(_columns), 
+                          tuple(_view_names), 
+                          _namespace['map_rows'])
+# /compile_serializer
+
+
+def iter_rows(_fast, _map_rows, _queryset, chunk_size=500):
+    """
+    Serialize _queryset lazily with a function from FastSerializer.bind_rows, 
+    reading chunk_size rows at a time from a database iterator.
+    """
+    _rows = _queryset.values_list(*_fast.columns).iterator()
+    while True:
+        _chunk = list(itertools.islice(_rows, chunk_size))
+        if not _chunk:
+            return
+        for _item in _map_rows(_chunk):
+            yield _item
+# /iter_rows
+
+
+# Weak, so sparse serializer classes dropped from their cache go too.
+_compiled = weakref.WeakKeyDictionary()
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_serializer(_serializer_class, _model):
+    """Return the FastSerializer of _serializer_class, compiling it once."""
+    try:
+        return _compiled[_serializer_class]
+    except KeyError:
+        pass
+    _fast = compile_serializer(_serializer_class, _model)
+    with _compiled_lock:
+        _compiled[_serializer_class] = _fast
+    return _fast
+# /get_compiled_serializer
+
+
+def get_fast_serializer(_serializer_class, _model):
+    """
+    Return the FastSerializer the views should use for _serializer_class 
+    rendering _model rows, or None when it has none or FAST_PATH_SERIALIZERS 
+    is off.
+    """
+    if not is_enabled():
+        return None
+    return get_compiled_serializer(_serializer_class, _model)
+# /get_fast_serializer
+
+
+# EOF - publican_api fast-path list serialization
@@ -0,0 +1,65 @@
+"""publican_api range filters"""
+
+from django.core.exceptions import ValidationError
+
+
+RANGE_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte')
+
+# Choice fields only compare for equality.
+CHOICE_LOOKUPS = ('exact',)
+
+FILTER_SEPARATOR = '__'
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def get_lookups(_field):
+    return CHOICE_LOOKUPS if _field.choices else RANGE_LOOKUPS
+
+
+def parse_filters(_model, _params):
+    """
+    Return the filter() kwargs of the query parameters naming one of 
+    _model.FILTER_FIELDS, as 'field' or 'field__lookup'.  Other parameters 
+    without a lookup are left to the view; a lookup on anything not 
+    whitelisted, or a value the field rejects, raises InvalidFilter.
+    """
+    _filters = {}
+    for _param, _value in _params.items():
+        _name, _separator, _lookup = _param.partition(FILTER_SEPARATOR)
+        if _name not in _model.FILTER_FIELDS:
+            if _separator:
+                raise InvalidFilter("Unknown filter '%s'.  Filter on: %s." % (
+                                        _param, ", ".join(_model.FILTER_FIELDS)))
+            continue
+        _field = _model._meta.get_field(_name)
+        _lookup = _lookup or 'exact'
+        if _lookup not in get_lookups(_field):
+            raise InvalidFilter("'%s' supports: %s." % (_name, 
+                                                       ", ".join(get_lookups(_field))))
+        try:
+            _value = _field.to_python(_value)
+            if _field.choices:
+                _field.validate(_value, None)
+        except ValidationError:
+            raise InvalidFilter("Invalid value for '%s'." % _param)
+        _filters[_name + FILTER_SEPARATOR + _lookup] = _value
+    return _filters
+# /parse_filters
+
+
+def apply_filters(_queryset, _filters):
+    """
+    Filter _queryset and order it by its first filtered field, then pk, so 
+    one index both narrows and orders the rows.  In Meta.ordering SQLite 
+    prefers walking the whole name index to sorting a range.
+    """
+    _names = set(_lookup.partition(FILTER_SEPARATOR)[0] for _lookup in _filters)
+    _ordering = [_name for _name in _queryset.model.FILTER_FIELDS if _name in _names][0]
+    return _queryset.filter(**_filters).order_by(_ordering, 'pk')
+# /apply_filters
+
+
+# EOF - publican_api range filters
@@ -0,0 +1,263 @@
+"""publican_api bulk review ingestion"""
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import get_script_prefix
+from django.core.urlresolvers import resolve
+from django.core.urlresolvers import Resolver404
+from django.db import IntegrityError
+from django.db import transaction
+from django.utils.six.moves.urllib.parse import urlparse
+
+import publican_api.basemodels as api_basemodels
+import publican_api.counts as api_counts
+import publican_api.models as api_models
+import publican_api.ratings as api_ratings
+import publican_api.registry as api_registry
+import publican_api.search as api_search
+import publican_api.validation as api_validation
+import publican_api.writebehind as api_writebehind
+
+
+# Shortest review title, as documented for single creates.
+TITLE_MIN_LENGTH = 8
+
+# Inserts tried before items still colliding with concurrent batches are 
+# reported as failed.
+INSERT_ATTEMPTS = 3
+
+TITLE_TAKEN = "A review with this title already exists."
+
+
+def get_max_bulk_reviews():
+    return getattr(settings, 'MAX_BULK_REVIEWS', 1000)
+
+
+def parse_drink_ref(_value, _detail_view):
+    """
+    Return ('pk', id) or ('slug', slug) for a drink given as its id, slug or 
+    detail URL, or None for anything else.  Slugs are never all digits.
+    """
+    if isinstance(_value, bool):
+        return None
+    if isinstance(_value, int):
+        return ('pk', _value)
+    if not isinstance(_value, str) or not _value:
+        return None
+    if '/' in _value:
+        _path = urlparse(_value).path
+        _prefix = get_script_prefix()
+        if _path.startswith(_prefix):
+            _path = '/' + _path[len(_prefix):]
+        try:
+            _match = resolve(_path)
+        except Resolver404:
+            return None
+        if _match.url_name != _detail_view or 'pk' not in _match.kwargs:
+            return None
+        _value = _match.kwargs['pk']
+    if _value.isdigit():
+        return ('pk', int(_value))
+    return ('slug', _value)
+# /parse_drink_ref
+
+
+def get_drink_ids(_drink_model, _refs):
+    """
+    Map each (kind, value) ref of parse_drink_ref to the pk of an existing 
+    drink, with one query per IN_CHUNK_SIZE ids and per IN_CHUNK_SIZE slugs.
+    """
+    _ids = set(_value for _kind, _value in _refs if _kind == 'pk')
+    _slugs = set(_value for _kind, _value in _refs if _kind == 'slug')
+    _found = {}
+    for _chunk in api_basemodels.filter_in(_drink_model.objects.all(), 'pk', _ids):
+        _found.update((('pk', _pk), _pk) for _pk in _chunk.values_list('pk', flat=True))
+    for _chunk in api_basemodels.filter_in(_drink_model.objects.all(), 'slug', _slugs):
+        _found.update((('slug', _slug), _pk) for _slug, _pk 
+                      in _chunk.values_list('slug', 'pk'))
+    return _found
+# /get_drink_ids
+
+
+def validate_reviews(_review_model, _payloads):
+    """
+    Validate a list of review payloads in one pass.  Drinks may be given by 
+    id, slug or detail URL.  Titles and drinks are checked against the 
+    database in IN_CHUNK_SIZE lookups, not one query per item.  Returns 
+    (valid, errors): valid is a list of (index, cleaned attrs) and errors a 
+    list of (index, {field: [messages]}).
+    """
+    _drink_field = _review_model.drink_field
+    _drink_model = _review_model._meta.get_field(_drink_field).rel.to
+    _detail_view = api_registry.get_entry(_drink_model).detail_view
+    _title_length = _review_model._meta.get_field('title').max_length
+    _description_length = _review_model._meta.get_field('description').max_length
+    
+    # Every rating of the batch is range-checked in one pass.
+    _range_errors = dict(api_validation.get_range_table(_review_model)
+                                       .check_many(_payloads))
+    
+    _cleaned = []
+    _errors = []
+    for _index, _payload in enumerate(_payloads):
+        _item_errors = {}
+        if not isinstance(_payload, dict):
+            _errors.append((_index, {'non_field_errors': ["Expected an object."]}))
+            continue
+        
+        _title = _payload.get('title')
+        if not isinstance(_title, str) or not _title.strip():
+            _item_errors['title'] = ["This field is required."]
+        elif len(_title) < TITLE_MIN_LENGTH:
+            _item_errors['title'] = ["Min %d characters." % TITLE_MIN_LENGTH]
+        elif len(_title) > _title_length:
+            _item_errors['title'] = ["Max %d characters." % _title_length]
+        
+        _description = _payload.get('description', '')
+        if not isinstance(_description, str) or len(_description) > _description_length:
+            _item_errors['description'] = ["Max %d characters." % _description_length]
+        
+        _drink_ref = parse_drink_ref(_payload.get(_drink_field), _detail_view)
+        if _drink_ref is None:
+            _item_errors[_drink_field] = ["Expected the %s id, slug or URL." % 
+                                          _drink_field]
+        
+        _attrs = {'title': _title, 
+                  'description': _description, 
+                  _drink_field + '_id': _drink_ref}
+        for _attribute, _min, _max in _review_model.RATING_RANGES:
+            _attrs[_attribute] = _payload.get(_attribute)
+        _item_errors.update(_range_errors.get(_index, {}))
+        
+        if _item_errors:
+            _errors.append((_index, _item_errors))
+        else:
+            _cleaned.append((_index, _attrs))
+    
+    _taken = get_taken_titles(_review_model, 
+                              [_attrs['title'] for _index, _attrs in _cleaned])
+    _drink_ids = get_drink_ids(_drink_model, 
+                               [_attrs[_drink_field + '_id'] for _index, _attrs in _cleaned])
+    
+    _valid = []
+    for _index, _attrs in _cleaned:
+        if _attrs['title'] in _taken:
+            _errors.append((_index, {'title': [TITLE_TAKEN]}))
+        elif _attrs[_drink_field + '_id'] not in _drink_ids:
+            _errors.append((_index, {_drink_field: ["No such %s." % _drink_field]}))
+        else:
+            _taken.add(_attrs['title'])
+            _attrs[_drink_field + '_id'] = _drink_ids[_attrs[_drink_field + '_id']]
+            _valid.append((_index, _attrs))
+    _errors.sort(key=lambda _error: _error[0])
+    return _valid, _errors
+# /validate_reviews
+
+
+def get_taken_titles(_review_model, _titles):
+    return set(_title for _chunk in api_basemodels.filter_in(_review_model.objects.all(), 
+                                                             'title', 
+                                                             set(_titles)) 
+               for _title in _chunk.values_list('title', flat=True))
+# /get_taken_titles
+
+
+def insert_reviews(_review_model, _valid, _rater):
+    """
+    Insert the validated (index, attrs) items with one bulk_create, 
+    total_rating precomputed, then bring every touched drink's histogram 
+    and daily rollup up to date once for the whole batch, and its rating 
+    with one adjust_rating of the summed delta.  All in one transaction; a 
+    title or slug taken meanwhile raises IntegrityError and inserts nothing.  
+    Returns the created reviews.
+    """
+    _version, _weights = _review_model.get_weight_profile()
+    _slugs = api_basemodels.get_unique_slugs(_review_model, 
+                                             [_attrs['title'] for _index, _attrs in _valid])
+    _reviews = []
+    for (_index, _attrs), _slug in zip(_valid, _slugs):
+        _review = _review_model(rater=_rater, **_attrs)
+        _review.slug = _slug
+        _review.weight_version = _version
+        _review.total_rating = _review.calculate_total_rating(
+                                        _review.get_rating_categories(_weights))
+        _reviews.append(_review)
+    
+    _drink_model = _review_model._meta.get_field(_review_model.drink_field).rel.to
+    _content_type = ContentType.objects.get_for_model(_drink_model)
+    _drink_ids = set(_review.get_drink_id() for _review in _reviews)
+    
+    _deferred = api_writebehind.is_deferred()
+    with transaction.atomic():
+        # bulk_create runs the auto_now_add pre_save, so created is set after.
+        _review_model.objects.bulk_create(
+                        _reviews, 
+                        batch_size=api_ratings.chunk_size_for(_review_model))
+        # bulk_create sends no post_save, and only sets pks on some backends.
+        api_counts.invalidate_count(_review_model)
+        api_search.index_instances([_instance for _chunk in api_basemodels.filter_in(
+                                                        _review_model.objects.all(), 
+                                                        'slug', 
+                                                        _slugs) 
+                                    for _instance in _chunk])
+        _ratings = {}
+        _deltas = {}
+        for _review in _reviews:
+            _rating_delta, _count_delta = _deltas.get(_review.get_drink_id(), (0, 0))
+            _deltas[_review.get_drink_id()] = (_rating_delta + _review.total_rating, 
+                                               _count_delta + 1)
+            _key = (_review.get_drink_id(), 
+                    _review.total_rating, 
+                    _review.created.date())
+            _ratings[_key] = _ratings.get(_key, 0) + 1
+        for (_drink_id, _rating, _day), _count in _ratings.items():
+            api_models.RatingHistogram.adjust(_content_type, 
+                                              _drink_id, 
+                                              _rating, 
+                                              _count)
+            api_models.RatingRollup.adjust(_content_type, 
+                                           _drink_id, 
+                                           _day, 
+                                           _count, 
+                                           _count * _rating)
+        if not _deferred:
+            for _drink_id, (_rating_delta, _count_delta) in sorted(_deltas.items()):
+                _drink_model.adjust_rating(_drink_id, _rating_delta, _count_delta)
+    if _deferred:
+        for _drink_id in _drink_ids:
+            api_writebehind.rating_queue.mark_dirty(_review_model, _drink_id)
+    return _reviews
+# /insert_reviews
+
+
+def ingest_reviews(_review_model, _payloads, _rater):
+    """
+    Validate a batch of reviews and insert the valid ones with 
+    insert_reviews.  Invalid items are reported and skipped.  When a 
+    concurrent batch takes a title first, its items are reported as taken 
+    and the rest retried with fresh slugs, up to INSERT_ATTEMPTS times.  
+    Returns (created reviews, errors).
+    """
+    _valid, _errors = validate_reviews(_review_model, _payloads)
+    for _attempt in range(INSERT_ATTEMPTS):
+        if not _valid:
+            break
+        try:
+            return insert_reviews(_review_model, _valid, _rater), _errors
+        except IntegrityError:
+            _taken = get_taken_titles(_review_model, 
+                                      [_attrs['title'] for _index, _attrs in _valid])
+            _errors.extend((_index, {'title': [TITLE_TAKEN]}) 
+                           for _index, _attrs in _valid if _attrs['title'] in _taken)
+            _valid = [(_index, _attrs) for _index, _attrs in _valid 
+                      if _attrs['title'] not in _taken]
+    else:
+        _errors.extend((_index, {'non_field_errors': ["Conflicted with a concurrent "
+                                                      "batch; please retry."]}) 
+                       for _index, _attrs in _valid)
+    _errors.sort(key=lambda _error: _error[0])
+    return [], _errors
+# /ingest_reviews
+
+
+# EOF - publican_api bulk review ingestion
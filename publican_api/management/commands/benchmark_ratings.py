@@ -0,0 +1,45 @@
+"""publican_api benchmark_ratings command"""
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+import publican_api.ratings as api_ratings
+
+
+class Command(BaseCommand):
+    help = ("Compare re-scoring review tables on the per-row path and with "
+            "the vectorized engine, on synthetic reviews and drinks inserted "
+            "into the configured database in a transaction that is rolled "
+            "back.")
+    
+    option_list = BaseCommand.option_list + (
+        make_option('--reviews', 
+                    action='store', 
+                    type='int', 
+                    dest='reviews', 
+                    default=10 ** 6, 
+                    help="Number of synthetic reviews per review type."),
+        make_option('--drinks', 
+                    action='store', 
+                    type='int', 
+                    dest='drinks', 
+                    default=1000, 
+                    help="Number of synthetic drinks to spread them over."),
+    )
+    
+    def handle(self, *args, **options):
+        for _review_model in api_ratings.REVIEW_MODELS:
+            _per_row, _vectorized = api_ratings.benchmark_total_ratings(
+                                                _review_model, 
+                                                n_reviews=options['reviews'], 
+                                                n_drinks=options['drinks'])
+            self.stdout.write("%s: per-row %.3fs, vectorized %.3fs (%.1fx)" % (
+                                _review_model._meta.verbose_name_plural, 
+                                _per_row, 
+                                _vectorized, 
+                                _per_row / max(_vectorized, 1e-9)))
+# /Command
+
+
+# EOF - publican_api benchmark_ratings command
@@ -0,0 +1,107 @@
+"""publican_api benchmark_serializers command"""
+
+from optparse import make_option
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+import publican_api.fastpath as api_fastpath
+import publican_api.queryplan as api_queryplan
+import publican_api.serializers as api_serializers
+import publican_api.views as api_views
+
+
+def benchmark_serializer(_serializer_class, _model, n_rows=100, repeat=20):
+    """
+    Time DRF serialization of the first n_rows rows of _model, fetched as 
+    instances with the serializer's query plan, against the fast path over values_list() 
+    rows.  Returns (drf_seconds, fast_seconds, identical) per page, where 
+    identical is whether both render to the same JSON bytes, or None 
+    without a fast path.
+    """
+    _fast = api_fastpath.get_compiled_serializer(_serializer_class, _model)
+    if _fast is None:
+        return None
+    _queryset = _model.objects.all()[:n_rows]
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        _request = Request(RequestFactory().get('/'))
+        _mapper = _fast.bind(_request)
+        
+        _start = time.time()
+        for _index in range(repeat):
+            _drf = _serializer_class(list(api_queryplan.apply_query_plan(_queryset, 
+                                                                         _serializer_class)), 
+                                     many=True, 
+                                     context={'request': _request}).data
+        _drf_seconds = (time.time() - _start) / repeat
+        
+        _start = time.time()
+        for _index in range(repeat):
+            _rows = _mapper(_queryset)
+        _fast_seconds = (time.time() - _start) / repeat
+    
+    _renderer = JSONRenderer()
+    return (_drf_seconds, 
+            _fast_seconds, 
+            _renderer.render(_rows) == _renderer.render(_drf))
+# /benchmark_serializer
+
+
+class Command(BaseCommand):
+    help = ("Compare DRF and fast-path list serialization on a page of each "
+            "model's first rows, checking the rendered JSON is byte-identical, "
+            "whether or not FAST_PATH_SERIALIZERS is on.  Runs against the "
+            "configured database and fails if any serializer differs.")
+    
+    option_list = BaseCommand.option_list + (
+        make_option('--rows', 
+                    action='store', 
+                    type='int', 
+                    dest='rows', 
+                    default=100, 
+                    help="Rows per page."), 
+        make_option('--repeat', 
+                    action='store', 
+                    type='int', 
+                    dest='repeat', 
+                    default=20, 
+                    help="Pages serialized per timing."), 
+    )
+    
+    def handle(self, *args, **options):
+        _differing = []
+        for _model, _serializer_class in sorted(
+                            list(api_views.MODEL_SERIALIZERS.items()) 
+                            + [(User, api_serializers.UserSerializer)], 
+                            key=lambda _item: _item[1].__name__):
+            _name = _serializer_class.__name__
+            _result = benchmark_serializer(_serializer_class, 
+                                           _model, 
+                                           n_rows=options['rows'], 
+                                           repeat=options['repeat'])
+            if _result is None:
+                self.stdout.write("%s: no fast path." % _name)
+                continue
+            _drf, _fast, _identical = _result
+            if not _identical:
+                _differing.append(_name)
+            self.stdout.write("%s: drf %.2fms, fast path %.2fms (%.1fx), %s" % (
+                                _name, 
+                                _drf * 1000, 
+                                _fast * 1000, 
+                                _drf / max(_fast, 1e-9), 
+                                "identical" if _identical else "OUTPUT DIFFERS"))
+        if _differing:
+            raise CommandError("Fast path output differs from DRF for: %s." %
+                               ", ".join(_differing))
+# /Command
+
+
+# EOF - publican_api benchmark_serializers command
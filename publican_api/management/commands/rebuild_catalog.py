@@ -0,0 +1,34 @@
+"""publican_api rebuild_catalog command"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.core.management.base import BaseCommand
+
+import publican_api.models as api_models
+import publican_api.ratings as api_ratings
+import publican_api.registry as api_registry
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the cross-model name/slug catalog from every Resource "
+            "table.  Run once to backfill existing rows.")
+    
+    def handle(self, *args, **options):
+        _catalog_model = api_models.CatalogEntry
+        for _entry in api_registry.get_registry().resources:
+            _content_type = ContentType.objects.get_for_model(_entry.model)
+            with transaction.atomic():
+                _catalog_model.objects.filter(resource_content_type=_content_type).delete()
+                _catalog_model.objects.bulk_create(
+                        [_catalog_model(name=_name, 
+                                        slug=_slug, 
+                                        resource_content_type=_content_type, 
+                                        resource_object_id=_pk) 
+                         for _pk, _name, _slug 
+                         in _entry.model.objects.values_list('pk', 'name', 'slug').iterator()], 
+                        batch_size=api_ratings.chunk_size_for(_catalog_model))
+            self.stdout.write("Indexed %s." % _entry.collection)
+# /Command
+
+
+# EOF - publican_api rebuild_catalog command
@@ -0,0 +1,26 @@
+"""publican_api rebuild_search_index command"""
+
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+import publican_api.registry as api_registry
+import publican_api.search as api_search
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the full-text search index from every Resource and Review "
+            "table.  Run once to backfill existing rows.")
+    
+    def handle(self, *args, **options):
+        if not api_search.is_enabled():
+            raise CommandError("Search requires SQLite built with FTS5.")
+        _registry = api_registry.get_registry()
+        for _entry in _registry.resources + _registry.reviews:
+            with transaction.atomic():
+                _count = api_search.rebuild_index(_entry.model)
+            self.stdout.write("Indexed %d %s." % (_count, _entry.collection))
+# /Command
+
+
+# EOF - publican_api rebuild_search_index command
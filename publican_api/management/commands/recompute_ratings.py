@@ -0,0 +1,36 @@
+"""publican_api recompute_ratings command"""
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+import publican_api.ratings as api_ratings
+
+
+class Command(BaseCommand):
+    help = ("Recompute rating_sum, rating_count, overall_rating, rating "
+            "histograms and daily rollups for all beers, wines and liquors "
+            "from their reviews.")
+    
+    option_list = BaseCommand.option_list + (
+        make_option('--chunk-size', 
+                    action='store', 
+                    type='int', 
+                    dest='chunk_size', 
+                    default=api_ratings.DEFAULT_CHUNK_SIZE, 
+                    help="Drinks written per batched UPDATE."),
+    )
+    
+    def handle(self, *args, **options):
+        _max_chunk_size = api_ratings.update_chunk_size_for(api_ratings.RATING_COLUMNS)
+        if not 1 <= options['chunk_size'] <= _max_chunk_size:
+            raise CommandError("--chunk-size must be between 1 and %d." % 
+                               _max_chunk_size)
+        _rated = api_ratings.recompute_overall_ratings(
+                                            chunk_size=options['chunk_size'])
+        self.stdout.write("Recomputed ratings for %d rated drinks." % _rated)
+# /Command
+
+
+# EOF - publican_api recompute_ratings command
@@ -0,0 +1,18 @@
+"""publican_api refresh_trending command"""
+
+from django.core.management.base import BaseCommand
+
+import publican_api.trending as api_trending
+
+
+class Command(BaseCommand):
+    help = ("Recompute and cache the trending drink rankings.  Schedule this "
+            "more often than TRENDING_CACHE_TIMEOUT so reads never compute.")
+    
+    def handle(self, *args, **options):
+        _refreshed = api_trending.refresh_trending()
+        self.stdout.write("Refreshed %d trending rankings." % _refreshed)
+# /Command
+
+
+# EOF - publican_api refresh_trending command
@@ -0,0 +1,65 @@
+"""publican_api rescore_reviews command"""
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+import publican_api.ratings as api_ratings
+
+
+class Command(BaseCommand):
+    help = ("Re-score reviews against the rating weights in force and rebuild "
+            "drink ratings.  The 'sql' engine updates only reviews scored with "
+            "an older weight profile and can resume an interrupted run; the "
+            "'numpy' engine recomputes whole tables in memory.")
+    
+    ENGINES = ('sql', 'numpy')
+    
+    option_list = BaseCommand.option_list + (
+        make_option('--engine', 
+                    action='store', 
+                    dest='engine', 
+                    default='sql', 
+                    help="One of: sql (default), numpy."),
+        make_option('--chunk-size', 
+                    action='store', 
+                    type='int', 
+                    dest='chunk_size', 
+                    default=None, 
+                    help="Rows per UPDATE.  The sql engine defaults to a "
+                         "single statement per review table; the numpy "
+                         "engine binds parameters per row, so takes at most "
+                         "%d." % api_ratings.update_chunk_size_for(
+                                                    api_ratings.RATING_COLUMNS)),
+    )
+    
+    def handle(self, *args, **options):
+        _engine = options['engine']
+        _chunk_size = options['chunk_size']
+        if _engine not in self.ENGINES:
+            raise CommandError("Unknown engine '%s'." % _engine)
+        if _chunk_size is not None and _chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        # The numpy engine writes reviews and drinks with bulk_update_columns; 
+        # the drink columns bind the most parameters per row.
+        _max_chunk_size = api_ratings.update_chunk_size_for(api_ratings.RATING_COLUMNS)
+        if _engine == 'numpy' and _chunk_size is not None and _chunk_size > _max_chunk_size:
+            raise CommandError("--chunk-size must be between 1 and %d for the numpy "
+                               "engine." % _max_chunk_size)
+        
+        for _review_model in api_ratings.REVIEW_MODELS:
+            if _engine == 'sql':
+                _rescored = api_ratings.rescore_reviews(_review_model, 
+                                                        chunk_size=_chunk_size)
+            else:
+                _rescored = api_ratings.rescore_review_table(
+                            _review_model, 
+                            chunk_size=_chunk_size or api_ratings.DEFAULT_CHUNK_SIZE)
+            self.stdout.write("Rescored %d %s." % (
+                                _rescored, 
+                                _review_model._meta.verbose_name_plural))
+# /Command
+
+
+# EOF - publican_api rescore_reviews command
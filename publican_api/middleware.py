@@ -0,0 +1,25 @@
+"""publican_api middleware"""
+
+from django.conf import settings
+from django.db import connection
+
+
+class QueryCountMiddleware(object):
+    """
+    Reports the number of database queries a request ran in an 
+    X-Query-Count response header.  Django only records queries with DEBUG 
+    on, so the header is only sent then.
+    """
+    def process_request(self, request):
+        if settings.DEBUG:
+            request._publican_query_start = len(connection.queries)
+    
+    def process_response(self, request, response):
+        _start = getattr(request, '_publican_query_start', None)
+        if _start is not None:
+            response['X-Query-Count'] = str(len(connection.queries) - _start)
+        return response
+# /QueryCountMiddleware
+
+
+# EOF - publican_api middleware
@@ -1,7 +1,18 @@
 """publican_api models"""
 
+from collections import OrderedDict
+
+from django.db import IntegrityError
 from django.db import models
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Max
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.contenttypes import generic
 from django.contrib.contenttypes.models import ContentType
@@ -30,26 +41,117 @@ class Favorite(models.Model):
 # /Favorite
 
 
+class CatalogEntry(models.Model):
+    """
+    Cross-model index of every Resource by name and slug, so a resource of 
+    any type resolves with one indexed lookup instead of one query per 
+    Resource subclass.  Kept in sync by Resource.save and a post_delete 
+    receiver, which also sees cascaded and queryset deletes.
+    """
+    
+    class Meta:
+        app_label = settings.APP_LABEL
+        unique_together = (('resource_content_type', 'resource_object_id'),)
+    
+    name = models.CharField("Name", 
+                            max_length=128, 
+                            db_index=True)
+    
+    slug = models.SlugField(max_length=128)
+    
+    resource_content_type = models.ForeignKey(ContentType)
+    
+    resource_object_id = models.PositiveIntegerField()
+    
+    resource = generic.GenericForeignKey('resource_content_type', 
+                                         'resource_object_id')
+    
+    @classmethod
+    def index(cls, _resource):
+        _content_type = ContentType.objects.get_for_model(_resource)
+        _entries = cls.objects.filter(resource_content_type=_content_type, 
+                                      resource_object_id=_resource.pk)
+        if not _entries.update(name=_resource.name, slug=_resource.slug):
+            cls.objects.create(name=_resource.name, 
+                               slug=_resource.slug, 
+                               resource_content_type=_content_type, 
+                               resource_object_id=_resource.pk)
+    
+    @classmethod
+    def unindex(cls, _model, _pk):
+        cls.objects.filter(resource_content_type=ContentType.objects.get_for_model(_model), 
+                           resource_object_id=_pk).delete()
+    
+    @classmethod
+    def lookup(cls, _clue, _models=None):
+        """
+        Return the resource whose name or slug is _clue, preferring the first 
+        match in _models order, or None.  One catalog query plus one primary 
+        key fetch of the matched resource.
+        """
+        _entries = cls.objects.filter(Q(name=_clue) | Q(slug=_clue))
+        _order = None
+        if _models is not None:
+            _order = [ContentType.objects.get_for_model(_model).pk 
+                      for _model in _models]
+            _entries = _entries.filter(resource_content_type__in=_order)
+        _matches = list(_entries.values_list('resource_content_type', 
+                                             'resource_object_id'))
+        if not _matches:
+            return None
+        if _order is not None:
+            _matches.sort(key=lambda _match: _order.index(_match[0]))
+        _content_type_id, _object_id = _matches[0]
+        _model = ContentType.objects.get_for_id(_content_type_id).model_class()
+        try:
+            return _model.objects.get(pk=_object_id)
+        except _model.DoesNotExist:
+            return None
+    
+    def __str__(self):
+        return self.name
+# /CatalogEntry
+
+
+def unindex_resource(sender, instance, **kwargs):
+    if issubclass(sender, api_basemodels.Resource):
+        CatalogEntry.unindex(sender, instance.pk)
+# /unindex_resource
+post_delete.connect(unindex_resource)
+
+
 class Beer(api_basemodels.Resource, api_basemodels.Drink):
     
     class Meta(api_basemodels.Resource.Meta):
         verbose_name_plural = "beers"
+        index_together = api_basemodels.Resource.Meta.index_together + (
+                            ('abv', 'ibu'),)
     
     favorites = generic.GenericRelation('Favorite', 
                                         related_query_name='beers', 
                                         content_type_field='resource_content_type', 
                                         object_id_field='resource_object_id')
     
+    # Validated attributes and their (minimum, maximum) accepted values.
+    VALUE_RANGES = (('ibu', 5, 100), 
+                    ('calories', 50, 1000), 
+                    ('abv', 0, 80),)
+    
+    FILTER_FIELDS = ('ibu', 'calories', 'abv', 'overall_rating')
+    
     # range: 5-100
     ibu = models.PositiveSmallIntegerField("International Bitterness Units", 
+                                           db_index=True, 
                                            help_text="Range from 5-100.")
     
     # range: 50-1000
     calories = models.PositiveSmallIntegerField("Calories", 
+                                                db_index=True, 
                                                 help_text="Range from 50-1000.")
     
     # range: 0-80
     abv = models.FloatField("Alcohol By Volume", 
+                            db_index=True, 
                             help_text="Range from 0-80.")
 # /Beer
 admin.site.register(Beer)
@@ -59,6 +161,8 @@ class Wine(api_basemodels.Resource, api_basemodels.Drink):
     
     class Meta(api_basemodels.Resource.Meta):
         verbose_name_plural = "wines"
+        index_together = api_basemodels.Resource.Meta.index_together + (
+                            ('sweetness', 'acidity'),)
     
     TANNIN_CHOICES = (
         ('L', 'Low'), 
@@ -70,18 +174,27 @@ class Wine(api_basemodels.Resource, api_basemodels.Drink):
                                         content_type_field='resource_content_type', 
                                         object_id_field='resource_object_id')
     
+    # Validated attributes and their (minimum, maximum) accepted values.
+    VALUE_RANGES = (('sweetness', 1, 1000), 
+                    ('acidity', 0.1, 1.0),)
+    
+    FILTER_FIELDS = ('sweetness', 'acidity', 'tannin', 'overall_rating')
+    
     # range: 1-1000
     sweetness = models.PositiveSmallIntegerField("Sweetness", 
+                                                 db_index=True, 
                                                  help_text="Range from 1-1000.")
     
     # range: 0.1-1.0
     acidity = models.FloatField("Acidity", 
+                                db_index=True, 
                                 help_text="Range from 0.1-1.0.")
     
     # range: low-high 
     tannin = models.CharField("Tannin", 
                               max_length=1,
                               choices=TANNIN_CHOICES, 
+                              db_index=True, 
                               default='L')
     
     fruit = models.CharField("Fruit", 
@@ -96,18 +209,28 @@ class Liquor(api_basemodels.Resource, api_basemodels.Drink):
     
     class Meta(api_basemodels.Resource.Meta):
         verbose_name_plural = "liquors"
+        index_together = api_basemodels.Resource.Meta.index_together + (
+                            ('abv', 'calories'),)
     
     favorites = generic.GenericRelation('Favorite', 
                                         related_query_name='liquors', 
                                         content_type_field='resource_content_type', 
                                         object_id_field='resource_object_id')
     
+    # Validated attributes and their (minimum, maximum) accepted values.
+    VALUE_RANGES = (('calories', 50, 1000), 
+                    ('abv', 0, 80),)
+    
+    FILTER_FIELDS = ('calories', 'abv', 'overall_rating')
+    
     # range: 50-1000
     calories = models.PositiveSmallIntegerField("Calories", 
+                                                db_index=True, 
                                                 help_text="Range from 50-1000.")
     
     # range: 0-80
     abv = models.FloatField("Alcohol By Volume", 
+                            db_index=True, 
                             help_text="Range from 0-80.")
 # /Liquor
 admin.site.register(Liquor)
@@ -263,6 +386,22 @@ class BeerReview(api_basemodels.Review):
     
     beer = models.ForeignKey(Beer)
     
+    drink_field = 'beer'
+    
+    # Rated attributes and their weights as whole number percentages (sum 100).
+    RATING_WEIGHTS = (('appearance', 10), 
+                      ('aroma', 25), 
+                      ('taste', 45), 
+                      ('palate', 15), 
+                      ('bottlestyle', 5),)
+    
+    # Rated attributes and their (minimum, maximum) accepted values.
+    RATING_RANGES = (('appearance', 1, 5), 
+                     ('aroma', 1, 5), 
+                     ('taste', 1, 10), 
+                     ('palate', 1, 5), 
+                     ('bottlestyle', 1, 5),)
+    
     # range: 1-5
     appearance = models.PositiveSmallIntegerField("Appearance", 
                                                   default=0)
@@ -282,42 +421,6 @@ class BeerReview(api_basemodels.Review):
     # range: 1-5
     bottlestyle = models.PositiveSmallIntegerField("Bottle Style", 
                                                    default=0)
-    
-    def calculate_overall_rating(self):
-        """
-        1) Sum the total_ratings of all instances of reviews for this beer.
-            aggregate_rating = sum([beer.total_rating for beer_review in beer_reviews])
-        2) Divide summed ratings by beers.count() to get averaged rating.
-            average_rating = aggregate_rating / beers.count()
-        3) Ratchet average rating to final quarter fractional value.
-            overall_beer_rating = round(DENOMINATOR * average_rating) / DENOMINATOR
-        4) Return overall rating for this particular beer.
-        """
-        DENOMINATION = 4
-        
-        beer_reviews = BeerReview.objects.filter(beer=self.beer)
-        aggregate_rating = sum([beer_review.total_rating 
-                                for beer_review in beer_reviews])
-        average_rating = aggregate_rating / beer_reviews.count()
-        overall_beer_rating = round(DENOMINATION * average_rating) / DENOMINATION
-        return overall_beer_rating
-    
-    def save(self, *args, **kwargs):
-        """
-        Pass a list of tuples of attributes and their respective rating weights.
-        The weighted ratings are whole number percentages, so the sum of 
-        weighted ratings must add up to 100.
-        """
-        self.slug = slugify(self.title)
-        self.total_rating = self.calculate_total_rating([(self.appearance, 10,), 
-                                                         (self.aroma, 25,), 
-                                                         (self.taste, 45,), 
-                                                         (self.palate, 15,), 
-                                                         (self.bottlestyle, 5,)
-                                                        ])
-        super(BeerReview, self).save(*args, **kwargs)
-        self.beer.overall_rating = self.calculate_overall_rating()
-        self.beer.save()
 # /BeerReview
 admin.site.register(BeerReview)
 
@@ -330,6 +433,34 @@ class WineReview(api_basemodels.Review):
     
     wine = models.ForeignKey(Wine)
     
+    drink_field = 'wine'
+    
+    # Rated attributes and their weights as whole number percentages (sum 100).
+    RATING_WEIGHTS = (('clarity', 5), 
+                      ('color', 5), 
+                      ('intensity', 5), 
+                      ('aroma', 20), 
+                      ('body', 5), 
+                      ('astringency', 5), 
+                      ('alcohol', 5), 
+                      ('balance', 15), 
+                      ('finish', 15), 
+                      ('complexity', 15), 
+                      ('bottlestyle', 5),)
+    
+    # Rated attributes and their (minimum, maximum) accepted values.
+    RATING_RANGES = (('clarity', 1, 5), 
+                     ('color', 1, 5), 
+                     ('intensity', 1, 5), 
+                     ('aroma', 1, 10), 
+                     ('body', 1, 5), 
+                     ('astringency', 1, 5), 
+                     ('alcohol', 1, 5), 
+                     ('balance', 1, 10), 
+                     ('finish', 1, 10), 
+                     ('complexity', 1, 10), 
+                     ('bottlestyle', 1, 5),)
+    
     # range: 1-5
     clarity = models.PositiveSmallIntegerField("Clarity", 
                                                default=0)
@@ -373,49 +504,7 @@ class WineReview(api_basemodels.Review):
     # range: 1-5
     bottlestyle = models.PositiveSmallIntegerField("Bottle Style", 
                                                    default=0)
-    
-    def calculate_overall_rating(self):
-        """
-        1) Sum the total_ratings of all instances of reviews for this wine.
-            aggregate_rating = sum([wine.total_rating for wine_review in wine_reviews])
-        2) Divide summed ratings by wine.count() to get averaged rating.
-            average_rating = aggregate_rating / wines.count()
-        3) Ratchet average rating to final quarter fractional value.
-            overall_wine_rating = round(DENOMINATOR * average_rating) / DENOMINATOR
-        4) Return overall rating for this particular wine.
-        """
-        DENOMINATION = 4
-        
-        wine_reviews = WineReview.objects.filter(wine=self.wine)
-        aggregate_rating = sum([wine_review.total_rating 
-                                for wine_review in wine_reviews])
-        average_rating = aggregate_rating / wine_reviews.count()
-        overall_wine_rating = round(DENOMINATION * average_rating) / DENOMINATION
-        return overall_wine_rating
-    
-    def save(self, *args, **kwargs):
-        """
-        Pass a list of tuples of attributes and their respective rating weights.
-        The weighted ratings are whole number percentages, so the sum of 
-        weighted ratings must add up to 100.
-        """
-        self.slug = slugify(self.title)
-        self.total_rating = self.calculate_total_rating([(self.clarity, 5), 
-                                                         (self.color, 5), 
-                                                         (self.intensity, 5), 
-                                                         (self.aroma, 20), 
-                                                         (self.body, 5), 
-                                                         (self.astringency, 5), 
-                                                         (self.alcohol, 5), 
-                                                         (self.balance, 15), 
-                                                         (self.finish, 15), 
-                                                         (self.complexity, 15), 
-                                                         (self.bottlestyle, 5)
-                                                        ])
-        super(WineReview, self).save(*args, **kwargs)
-        self.wine.overall_rating = self.calculate_overall_rating()
-        self.wine.save()
-    # /WineReview
+# /WineReview
 admin.site.register(WineReview)
 
 
@@ -427,6 +516,20 @@ class LiquorReview(api_basemodels.Review):
     
     liquor = models.ForeignKey(Liquor)
     
+    drink_field = 'liquor'
+    
+    # Rated attributes and their weights as whole number percentages (sum 100).
+    RATING_WEIGHTS = (('appearance', 10), 
+                      ('aroma', 30), 
+                      ('taste', 45), 
+                      ('aftertaste', 15),)
+    
+    # Rated attributes and their (minimum, maximum) accepted values.
+    RATING_RANGES = (('appearance', 1, 5), 
+                     ('aroma', 1, 5), 
+                     ('taste', 1, 10), 
+                     ('aftertaste', 1, 5),)
+    
     # range: 1-5
     appearance = models.PositiveSmallIntegerField("Appearance", 
                                                   default=0)
@@ -442,43 +545,262 @@ class LiquorReview(api_basemodels.Review):
     # range: 1-5
     aftertaste = models.PositiveSmallIntegerField("Aftertaste", 
                                                   default=0)
+# /LiquorReview
+admin.site.register(LiquorReview)
+
+
+def increment_or_create(_model, _lookup, **_increments):
+    """
+    Atomically add _increments to the counter columns of the _model row 
+    matching _lookup, creating the row on its first positive increment.
+    """
+    _rows = _model.objects.filter(**_lookup)
+    _updates = dict((_field, F(_field) + _delta) 
+                    for _field, _delta in _increments.items())
+    if _rows.update(**_updates):
+        return
+    if not any(_delta > 0 for _delta in _increments.values()):
+        return
+    try:
+        with transaction.atomic():
+            _defaults = dict(_lookup, **_increments)
+            _model.objects.create(**_defaults)
+    except IntegrityError:
+        _rows.update(**_updates)
+# /increment_or_create
+
+
+class RatingHistogram(models.Model):
+    """
+    Per-drink count of reviews in each quarter-star step of total_rating, the 
+    grid Review.calculate_total_rating snaps to.  Maintained incrementally by 
+    review saves and deletes, so reading a histogram never touches reviews.
+    """
+    
+    class Meta:
+        app_label = settings.APP_LABEL
+        ordering = ['bucket']
+        unique_together = (('drink_content_type', 'drink_object_id', 'bucket'),)
+    
+    DENOMINATION = 4
+    
+    drink_content_type = models.ForeignKey(ContentType)
+    
+    drink_object_id = models.PositiveIntegerField()
     
-    def calculate_overall_rating(self):
+    drink = generic.GenericForeignKey('drink_content_type', 
+                                      'drink_object_id')
+    
+    # total_rating * DENOMINATION, i.e. the index of the quarter-star step
+    bucket = models.PositiveSmallIntegerField("Bucket")
+    
+    count = models.PositiveIntegerField("Count", 
+                                        default=0)
+    
+    @classmethod
+    def get_bucket(cls, _rating):
+        return int(round(_rating * cls.DENOMINATION))
+    
+    @classmethod
+    def adjust(cls, _content_type, _drink_id, _rating, _delta):
         """
-        1) Sum the total_ratings of all instances of reviews for this liquor.
-            aggregate_rating = sum([liquor.total_rating for liquor_review in liquor_reviews])
-        2) Divide summed ratings by liquor.count() to get averaged rating.
-            average_rating = aggregate_rating / liquors.count()
-        3) Ratchet average rating to final quarter fractional value.
-            overall_liquor_rating = round(DENOMINATOR * average_rating) / DENOMINATOR
-        4) Return overall rating for this particular liquor.
+        Atomically add _delta reviews to the bucket holding _rating, creating 
+        the bucket row the first time it is used.
         """
-        DENOMINATION = 4
-        
-        liquor_reviews = LiquorReview.objects.filter(liquor=self.liquor)
-        aggregate_rating = sum([liquor_review.total_rating 
-                                for liquor_review in liquor_reviews])
-        average_rating = aggregate_rating / liquor_reviews.count()
-        overall_liquor_rating = round(DENOMINATION * average_rating) / DENOMINATION
-        return overall_liquor_rating
+        increment_or_create(cls, 
+                            {'drink_content_type': _content_type, 
+                             'drink_object_id': _drink_id, 
+                             'bucket': cls.get_bucket(_rating)}, 
+                            count=_delta)
+    
+    @classmethod
+    def get_histogram(cls, _drink):
+        """
+        Return an ordered {"<rating>": count} mapping of the drink's non-empty 
+        buckets from one query on this table.
+        """
+        _content_type = ContentType.objects.get_for_model(_drink)
+        _buckets = (cls.objects.filter(drink_content_type=_content_type, 
+                                       drink_object_id=_drink.pk, 
+                                       count__gt=0)
+                               .values_list('bucket', 'count'))
+        return OrderedDict(('%.2f' % (_bucket / float(cls.DENOMINATION)), _count) 
+                           for _bucket, _count in _buckets)
+# /RatingHistogram
+
+
+class RatingRollup(models.Model):
+    """
+    Daily review count and rating sum per drink, bucketed on the day each 
+    review was created and maintained incrementally by review saves and 
+    deletes.  Windowed rankings read only these rows.
+    """
+    
+    class Meta:
+        app_label = settings.APP_LABEL
+        get_latest_by = "day"
+        ordering = ['-day']
+        unique_together = (('drink_content_type', 'drink_object_id', 'day'),)
+        index_together = (('drink_content_type', 'day'),)
+    
+    drink_content_type = models.ForeignKey(ContentType)
+    
+    drink_object_id = models.PositiveIntegerField()
+    
+    drink = generic.GenericForeignKey('drink_content_type', 
+                                      'drink_object_id')
+    
+    day = models.DateField("Day")
+    
+    review_count = models.PositiveIntegerField("Review Count", 
+                                               default=0)
+    
+    rating_sum = models.FloatField("Rating Sum", 
+                                   default=0)
+    
+    @classmethod
+    def adjust(cls, _content_type, _drink_id, _day, _count_delta, _rating_delta):
+        if not (_count_delta or _rating_delta):
+            return
+        increment_or_create(cls, 
+                            {'drink_content_type': _content_type, 
+                             'drink_object_id': _drink_id, 
+                             'day': _day}, 
+                            review_count=_count_delta, 
+                            rating_sum=_rating_delta)
+# /RatingRollup
+
+
+class RatingWeightProfile(models.Model):
+    """
+    A versioned set of rating weights for one review model.  Profiles are 
+    never edited in place: publishing new weights adds a profile with the 
+    next version number, and the latest version is the one in force.  
+    Reviews record the version they were scored with in weight_version; 
+    version 0 stands for the RATING_WEIGHTS defaults on the review model.
+    """
+    
+    class Meta:
+        app_label = settings.APP_LABEL
+        get_latest_by = "version"
+        ordering = ['review_content_type', '-version']
+        unique_together = (('review_content_type', 'version'),)
+    
+    CACHE_KEY = 'publican_api:weights:{0}'
+    
+    # Bounds how long another process may score with superseded weights.
+    CACHE_TIMEOUT = 60
+    
+    review_content_type = models.ForeignKey(ContentType)
+    
+    version = models.PositiveIntegerField("Version", 
+                                          editable=False)
+    
+    created = models.DateTimeField("Created", 
+                                   auto_now_add=True, 
+                                   editable=False)
+    
+    def get_weights(self):
+        return tuple(self.weights.order_by('pk').values_list('attribute', 
+                                                             'weight'))
+    
+    def clean_weights(self, _weights):
+        _review_model = self.review_content_type.model_class()
+        _attributes = set(_attribute for _attribute, _weight 
+                          in _review_model.RATING_WEIGHTS)
+        if set(_attribute for _attribute, _weight in _weights) != _attributes:
+            raise ValidationError("Weights must cover exactly: %s." % 
+                                  ", ".join(sorted(_attributes)))
+        if sum(_weight for _attribute, _weight in _weights) != 100:
+            raise ValidationError("Weights must add up to 100.")
     
     def save(self, *args, **kwargs):
+        if self.version is None:
+            _latest = (RatingWeightProfile.objects
+                                          .filter(review_content_type=self.review_content_type)
+                                          .aggregate(Max('version'))['version__max'])
+            self.version = (_latest or 0) + 1
+        super(RatingWeightProfile, self).save(*args, **kwargs)
+    
+    @classmethod
+    def get_current_weights(cls, _review_model):
         """
-        Pass a list of tuples of attributes and their respective rating weights.
-        The weighted ratings are whole number percentages, so the sum of 
-        weighted ratings must add up to 100.
+        Return (version, ((attribute, weight), ...)) in force for _review_model, 
+        served from the cache so review saves do not query for it.
         """
-        self.slug = slugify(self.title)
-        self.total_rating = self.calculate_total_rating([(self.appearance, 10), 
-                                                        (self.aroma, 30), 
-                                                        (self.taste, 45), 
-                                                        (self.aftertaste, 15)
-                                                       ])
-        super(LiquorReview, self).save(*args, **kwargs)
-        self.liquor.overall_rating = self.calculate_overall_rating()
-        self.liquor.save()
-    # /LiquorReview
-admin.site.register(LiquorReview)
+        _content_type = ContentType.objects.get_for_model(_review_model)
+        _key = cls.CACHE_KEY.format(_content_type.pk)
+        _current = cache.get(_key)
+        if _current is None:
+            try:
+                _profile = (cls.objects.filter(review_content_type=_content_type)
+                                       .latest())
+                _current = (_profile.version, _profile.get_weights())
+            except cls.DoesNotExist:
+                _current = (0, tuple(_review_model.RATING_WEIGHTS))
+            cache.set(_key, _current, cls.CACHE_TIMEOUT)
+        return _current
+    
+    def __str__(self):
+        return "%s weights v%d" % (self.review_content_type, self.version)
+# /RatingWeightProfile
+
+
+class RatingWeight(models.Model):
+    
+    class Meta:
+        app_label = settings.APP_LABEL
+        unique_together = (('profile', 'attribute'),)
+    
+    profile = models.ForeignKey(RatingWeightProfile, 
+                                related_name='weights')
+    
+    attribute = models.CharField("Attribute", 
+                                 max_length=64)
+    
+    # whole number percentage
+    weight = models.PositiveSmallIntegerField("Weight")
+# /RatingWeight
+
+
+def invalidate_rating_weights(sender, instance, **kwargs):
+    _profile = instance if sender is RatingWeightProfile else instance.profile
+    cache.delete(RatingWeightProfile.CACHE_KEY.format(
+                                            _profile.review_content_type_id))
+# /invalidate_rating_weights
+post_save.connect(invalidate_rating_weights, sender=RatingWeightProfile)
+post_delete.connect(invalidate_rating_weights, sender=RatingWeightProfile)
+post_save.connect(invalidate_rating_weights, sender=RatingWeight)
+post_delete.connect(invalidate_rating_weights, sender=RatingWeight)
+
+
+RESOURCE_MODELS = (Beer, 
+                   Wine, 
+                   Liquor, 
+                   Brewery, 
+                   Winery, 
+                   Distillery, 
+                   BeerGlass, 
+                   WineGlass, 
+                   LiquorGlass, 
+                   BeerStyle, 
+                   WineStyle, 
+                   LiquorStyle)
+
+REVIEW_MODELS = (BeerReview, 
+                 WineReview, 
+                 LiquorReview,)
+
+
+# Imported last, as they import the models above; connected here so their 
+# receivers are live wherever the models are loaded, with or without an 
+# app config.
+import publican_api.autocomplete as api_autocomplete
+import publican_api.counts as api_counts
+import publican_api.search as api_search
+api_search.connect(RESOURCE_MODELS + REVIEW_MODELS)
+api_autocomplete.connect(RESOURCE_MODELS)
+api_counts.connect((User, Favorite) + RESOURCE_MODELS + REVIEW_MODELS)
 
 
 # EOF - publican_api models
@@ -0,0 +1,109 @@
+"""publican_api keyset pagination"""
+
+import base64
+import binascii
+from collections import namedtuple
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Cursor orderings besides each model's Meta.ordering; 'updated' lets sync
+# clients walk every change since a point.
+EXTRA_ORDERINGS = ('updated',)
+
+
+KeysetPage = namedtuple('KeysetPage', ('object_list', 
+                                       'next_cursor', 
+                                       'previous_cursor'))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_orderings(_model):
+    """Return the cursor orderings of _model, its Meta.ordering first."""
+    return (_model._meta.ordering[0],) + EXTRA_ORDERINGS
+
+
+def encode_cursor(_ordering, _reverse, _value, _pk):
+    if isinstance(_value, datetime.datetime):
+        # Full precision; a truncated timestamp would skip or repeat rows.
+        _value = _value.isoformat()
+    _payload = json.dumps([_ordering, int(_reverse), _value, _pk], 
+                          separators=(',', ':'))
+    return base64.urlsafe_b64encode(_payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(_token, _model, _ordering):
+    """
+    Return the (reverse, value, pk) of a cursor token for _ordering of 
+    _model, raising InvalidCursor for anything this module did not issue.
+    """
+    try:
+        _payload = base64.urlsafe_b64decode(_token + '=' * (-len(_token) % 4))
+        _cursor_ordering, _reverse, _value, _pk = json.loads(_payload.decode('utf-8'))
+        _value = _model._meta.get_field(_ordering).to_python(_value)
+    except (TypeError, ValueError, binascii.Error, ValidationError):
+        raise InvalidCursor("Invalid cursor.")
+    if _cursor_ordering != _ordering or not isinstance(_pk, int):
+        raise InvalidCursor("Cursor was issued for another ordering.")
+    return bool(_reverse), _value, _pk
+# /decode_cursor
+
+
+class KeysetPaginator(object):
+    """
+    Pages a queryset by (ordering, pk) keys instead of offsets.  A cursor 
+    holds the key of the row a page starts after, so every page is an index 
+    range scan of page_size + 1 keys followed by a primary key fetch, and 
+    page N costs the same as page 1.  Pages are always returned in 
+    ascending order; previous pages are read by walking the index backwards.
+    """
+    def __init__(self, queryset, ordering, page_size):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.page_size = page_size
+    
+    def paginate(self, cursor=None):
+        """Return the KeysetPage for a cursor token, or the first page for None."""
+        _model = self.queryset.model
+        _reverse = False
+        _queryset = self.queryset
+        if cursor:
+            _reverse, _value, _pk = decode_cursor(cursor, _model, self.ordering)
+            _op = 'lt' if _reverse else 'gt'
+            _queryset = _queryset.filter(
+                            Q(**{self.ordering + '__' + _op: _value})
+                            | Q(**{self.ordering: _value, 'pk__' + _op: _pk}))
+        if _reverse:
+            _queryset = _queryset.order_by('-' + self.ordering, '-pk')
+        else:
+            _queryset = _queryset.order_by(self.ordering, 'pk')
+        
+        _keys = list(_queryset.values_list(self.ordering, 'pk')[:self.page_size + 1])
+        _has_more = len(_keys) > self.page_size
+        _keys = _keys[:self.page_size]
+        if _reverse:
+            _keys.reverse()
+        
+        _next = _previous = None
+        if _keys:
+            _first, _last = _keys[0], _keys[-1]
+            # Walking forward, more keys ahead mean a next page and having
+            # come from a cursor means a previous one; backward mirrors it.
+            if _reverse or _has_more:
+                _next = encode_cursor(self.ordering, False, _last[0], _last[1])
+            if (_has_more and _reverse) or (cursor and not _reverse):
+                _previous = encode_cursor(self.ordering, True, _first[0], _first[1])
+        
+        _object_list = (self.queryset.filter(pk__in=[_key[1] for _key in _keys])
+                                     .order_by(self.ordering, 'pk'))
+        return KeysetPage(_object_list, _next, _previous)
+# /KeysetPaginator
+
+
+# EOF - publican_api keyset pagination
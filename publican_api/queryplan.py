@@ -0,0 +1,89 @@
+"""publican_api query planning"""
+
+import threading
+import weakref
+
+from django.db.models.fields import FieldDoesNotExist
+
+from rest_framework import relations
+from rest_framework import serializers
+
+
+# Weak, so sparse serializer classes dropped from their cache go too.
+_plans = weakref.WeakKeyDictionary()
+_plans_lock = threading.Lock()
+
+
+def get_related_model(_model_field, _direct, _m2m):
+    if _direct:
+        return _model_field.rel.to
+    # Reverse relations are RelatedObjects; .model is the related model.
+    return _model_field.model
+
+
+def plan_serializer(_serializer, _model, _prefix='', _prefetching=False):
+    """
+    Walk the nested serializers and related fields of a serializer instance 
+    for _model and return (select_related, prefetch_related) lookup lists. 
+    ForeignKeys are joined; reverse and many-to-many relations, and anything 
+    beneath them, are prefetched.
+    """
+    _select = []
+    _prefetch = []
+    for _name, _field in _serializer.fields.items():
+        _is_nested = isinstance(_field, serializers.BaseSerializer)
+        if not (_is_nested or isinstance(_field, relations.RelatedField)):
+            continue
+        _source = (_field.source or _name).split('.')[0]
+        if _source == '*':
+            continue
+        try:
+            _model_field, _owner, _direct, _m2m = _model._meta.get_field_by_name(_source)
+        except FieldDoesNotExist:
+            continue
+        if _direct and _model_field.rel is None:
+            continue
+        
+        _lookup = _prefix + _source
+        _many = _m2m or not _direct
+        if _prefetching or _many:
+            _prefetch.append(_lookup)
+        else:
+            _select.append(_lookup)
+        if _is_nested:
+            _nested_select, _nested_prefetch = plan_serializer(
+                                    _field, 
+                                    get_related_model(_model_field, _direct, _m2m), 
+                                    _lookup + '__', 
+                                    _prefetching or _many)
+            _select.extend(_nested_select)
+            _prefetch.extend(_nested_prefetch)
+    return _select, _prefetch
+# /plan_serializer
+
+
+def get_query_plan(_serializer_class, _model):
+    """Return the cached (select_related, prefetch_related) plan of a serializer class."""
+    try:
+        return _plans[_serializer_class]
+    except KeyError:
+        pass
+    _select, _prefetch = plan_serializer(_serializer_class(), _model)
+    _plan = (tuple(_select), tuple(_prefetch))
+    with _plans_lock:
+        _plans[_serializer_class] = _plan
+    return _plan
+# /get_query_plan
+
+
+def apply_query_plan(_queryset, _serializer_class):
+    _select, _prefetch = get_query_plan(_serializer_class, _queryset.model)
+    if _select:
+        _queryset = _queryset.select_related(*_select)
+    if _prefetch:
+        _queryset = _queryset.prefetch_related(*_prefetch)
+    return _queryset
+# /apply_query_plan
+
+
+# EOF - publican_api query planning
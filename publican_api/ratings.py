@@ -0,0 +1,494 @@
+"""publican_api ratings"""
+
+import random
+import time
+import uuid
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models import Min
+from django.db.models import Sum
+
+import publican_api.models as api_models
+
+
+REVIEW_MODELS = api_models.REVIEW_MODELS
+
+DENOMINATION = 4
+
+# Each chunk binds (2 * columns + 1) parameters per row, so keep this under 
+# SQLite's default limit of 999 bound parameters for the drink columns below.
+DEFAULT_CHUNK_SIZE = 100
+
+# The drink columns recompute_drink_ratings writes.
+RATING_COLUMNS = ('rating_sum', 'rating_count', 'overall_rating')
+
+
+def update_chunk_size_for(_fields):
+    """
+    Largest bulk_update_columns chunk for _fields that stays under SQLite's 
+    bound parameter limit.
+    """
+    return max(1, 999 // (2 * len(_fields) + 1))
+# /update_chunk_size_for
+
+
+def bulk_update_columns(_model, _rows, _fields, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write per-row values for several columns with one statement per chunk:
+        UPDATE <table> SET <col> = CASE <pk> WHEN %s THEN %s ... END, ... 
+        WHERE <pk> IN (...)
+    Each row is a tuple of (pk, value_for_field_1, value_for_field_2, ...).
+    """
+    _qn = connection.ops.quote_name
+    _table = _qn(_model._meta.db_table)
+    _pk_column = _qn(_model._meta.pk.column)
+    _columns = [_qn(_model._meta.get_field(_field).column) for _field in _fields]
+    _rows = list(_rows)
+    
+    _cursor = connection.cursor()
+    for _start in range(0, len(_rows), chunk_size):
+        _chunk = _rows[_start:_start + chunk_size]
+        _whens = ' '.join(['WHEN %s THEN %s'] * len(_chunk))
+        _assignments = []
+        _params = []
+        for _index, _column in enumerate(_columns, 1):
+            _assignments.append('%s = CASE %s %s END' % (_column, 
+                                                         _pk_column, 
+                                                         _whens))
+            for _row in _chunk:
+                _params.extend((_row[0], _row[_index]))
+        _params.extend(_row[0] for _row in _chunk)
+        _sql = 'UPDATE %s SET %s WHERE %s IN (%s)' % (
+                                            _table, 
+                                            ', '.join(_assignments), 
+                                            _pk_column, 
+                                            ', '.join(['%s'] * len(_chunk)))
+        _cursor.execute(_sql, _params)
+    return len(_rows)
+# /bulk_update_columns
+
+
+def recompute_drink_ratings(_review_model, 
+                            drink_ids=None, 
+                            chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild rating_sum, rating_count and overall_rating for every drink 
+    reviewed by _review_model, or only for drink_ids, from one grouped 
+    aggregate query, then reset drinks that have no reviews at all.  
+    Returns the number of rated drinks.
+    """
+    _drink_field = _review_model.drink_field
+    _drink_model = _review_model._meta.get_field(_drink_field).rel.to
+    _reviews = _review_model.objects.order_by()
+    _drinks = _drink_model.objects.all()
+    if drink_ids is not None:
+        _reviews = _reviews.filter(**{_drink_field + '__in': list(drink_ids)})
+        _drinks = _drinks.filter(pk__in=list(drink_ids))
+    
+    # The default ordering is cleared above so it does not leak into GROUP BY.
+    _aggregates = (_reviews.values_list(_drink_field)
+                           .annotate(Sum('total_rating'), Count('pk')))
+    _rows = [(_drink_id, 
+              _rating_sum, 
+              _rating_count, 
+              _drink_model.calculate_overall_rating(_rating_sum, _rating_count))
+             for _drink_id, _rating_sum, _rating_count in _aggregates]
+    
+    with transaction.atomic():
+        bulk_update_columns(_drink_model, 
+                            _rows, 
+                            RATING_COLUMNS, 
+                            chunk_size=chunk_size)
+        (_drinks.exclude(pk__in=_reviews.values(_drink_field))
+                .update(rating_sum=0, rating_count=0, overall_rating=0))
+    return len(_rows)
+# /recompute_drink_ratings
+
+
+def rebuild_histograms(_review_model):
+    """
+    Replace the RatingHistogram rows of _review_model's drinks with counts 
+    from one grouped query over (drink, total_rating).
+    """
+    _drink_field = _review_model.drink_field
+    _drink_model = _review_model._meta.get_field(_drink_field).rel.to
+    _content_type = ContentType.objects.get_for_model(_drink_model)
+    _histogram_model = api_models.RatingHistogram
+    
+    _counts = {}
+    for _drink_id, _rating, _count in (_review_model.objects
+                                                    .order_by()
+                                                    .values_list(_drink_field, 
+                                                                 'total_rating')
+                                                    .annotate(Count('pk'))):
+        _key = (_drink_id, _histogram_model.get_bucket(_rating))
+        _counts[_key] = _counts.get(_key, 0) + _count
+    
+    with transaction.atomic():
+        _histogram_model.objects.filter(drink_content_type=_content_type).delete()
+        _histogram_model.objects.bulk_create(
+                        [_histogram_model(drink_content_type=_content_type, 
+                                          drink_object_id=_drink_id, 
+                                          bucket=_bucket, 
+                                          count=_count) 
+                         for (_drink_id, _bucket), _count in _counts.items()], 
+                        batch_size=chunk_size_for(_histogram_model))
+    return len(_counts)
+# /rebuild_histograms
+
+
+def rebuild_rollups(_review_model):
+    """
+    Replace the RatingRollup rows of _review_model's drinks with daily sums 
+    accumulated in one streaming pass over (drink, created, total_rating).
+    """
+    _drink_field = _review_model.drink_field
+    _drink_model = _review_model._meta.get_field(_drink_field).rel.to
+    _content_type = ContentType.objects.get_for_model(_drink_model)
+    _rollup_model = api_models.RatingRollup
+    
+    _days = {}
+    for _drink_id, _created, _rating in (_review_model.objects
+                                                      .order_by()
+                                                      .values_list(_drink_field, 
+                                                                   'created', 
+                                                                   'total_rating')
+                                                      .iterator()):
+        _key = (_drink_id, _created.date())
+        _review_count, _rating_sum = _days.get(_key, (0, 0))
+        _days[_key] = (_review_count + 1, _rating_sum + _rating)
+    
+    with transaction.atomic():
+        _rollup_model.objects.filter(drink_content_type=_content_type).delete()
+        _rollup_model.objects.bulk_create(
+                        [_rollup_model(drink_content_type=_content_type, 
+                                       drink_object_id=_drink_id, 
+                                       day=_day, 
+                                       review_count=_review_count, 
+                                       rating_sum=_rating_sum) 
+                         for (_drink_id, _day), (_review_count, _rating_sum) 
+                         in _days.items()], 
+                        batch_size=chunk_size_for(_rollup_model))
+    return len(_days)
+# /rebuild_rollups
+
+
+def chunk_size_for(_model):
+    """
+    Largest bulk_create batch that stays under SQLite's bound parameter limit.
+    """
+    return max(1, 999 // len(_model._meta.concrete_fields))
+# /chunk_size_for
+
+
+def recompute_overall_ratings(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild the rating aggregates, histograms and daily rollups of every Beer, 
+    Wine and Liquor from their review tables with batched writes.
+    """
+    _rated = 0
+    for _review_model in REVIEW_MODELS:
+        _rated += recompute_drink_ratings(_review_model, chunk_size=chunk_size)
+        rebuild_histograms(_review_model)
+        rebuild_rollups(_review_model)
+    return _rated
+# /recompute_overall_ratings
+
+
+def rescore_reviews(_review_model, chunk_size=None):
+    """
+    Re-score every review of _review_model whose weight_version is not the 
+    version in force with one SQL expression UPDATE, run in the database:
+        UPDATE <table> 
+        SET total_rating = ROUND(4 * (<attr> * <weight> + ...) / 100.0) / 4, 
+            weight_version = <version> 
+        WHERE weight_version <> <version>
+    With a chunk_size the same statement runs over consecutive primary key 
+    ranges, each committed on its own, so an interrupted re-score resumes 
+    where it stopped.  Drink aggregates are rebuilt afterwards.  Integer 
+    ratings and weights never land exactly halfway between quarters, so SQL 
+    ROUND() agrees with round() in Review.calculate_total_rating.
+    Returns the number of re-scored reviews.
+    """
+    if chunk_size is not None and chunk_size < 1:
+        # The primary key ranges would never advance.
+        raise ValueError("chunk_size must be at least 1.")
+    _version, _weights = _review_model.get_weight_profile()
+    _qn = connection.ops.quote_name
+    _opts = _review_model._meta
+    _version_column = _qn(_opts.get_field('weight_version').column)
+    _pk_column = _qn(_opts.pk.column)
+    _expression = ' + '.join('%s * %%s' % _qn(_opts.get_field(_attribute).column) 
+                             for _attribute, _weight in _weights)
+    _sql = 'UPDATE %s SET %s = ROUND(%%s * (%s) / 100.0) / %%s, %s = %%s WHERE %s <> %%s' % (
+                                        _qn(_opts.db_table), 
+                                        _qn(_opts.get_field('total_rating').column), 
+                                        _expression, 
+                                        _version_column, 
+                                        _version_column)
+    _params = ([DENOMINATION] + 
+               [_weight for _attribute, _weight in _weights] + 
+               [DENOMINATION, _version, _version])
+    
+    _cursor = connection.cursor()
+    _rescored = 0
+    if chunk_size is None:
+        with transaction.atomic():
+            _cursor.execute(_sql, _params)
+            _rescored = _cursor.rowcount
+    else:
+        _bounds = (_review_model.objects
+                                .exclude(weight_version=_version)
+                                .aggregate(Min('pk'), Max('pk')))
+        _low, _high = _bounds['pk__min'], _bounds['pk__max']
+        while _low is not None and _low <= _high:
+            with transaction.atomic():
+                _cursor.execute(_sql + ' AND %s >= %%s AND %s < %%s' % (_pk_column, 
+                                                                      _pk_column), 
+                                _params + [_low, _low + chunk_size])
+                _rescored += _cursor.rowcount
+            _low += chunk_size
+    
+    recompute_drink_ratings(_review_model)
+    rebuild_histograms(_review_model)
+    rebuild_rollups(_review_model)
+    return _rescored
+# /rescore_reviews
+
+
+def publish_weight_profile(_review_model, _weights):
+    """
+    Store _weights as the next RatingWeightProfile version for _review_model 
+    and re-score its reviews against them.  Returns the new profile.
+    """
+    _content_type = ContentType.objects.get_for_model(_review_model)
+    _profile = api_models.RatingWeightProfile(review_content_type=_content_type)
+    _profile.clean_weights(_weights)
+    with transaction.atomic():
+        _profile.save()
+        api_models.RatingWeight.objects.bulk_create(
+                        [api_models.RatingWeight(profile=_profile, 
+                                                 attribute=_attribute, 
+                                                 weight=_weight) 
+                         for _attribute, _weight in _weights])
+    # bulk_create sends no post_save, so drop the cached weights explicitly.
+    cache.delete(api_models.RatingWeightProfile.CACHE_KEY.format(_content_type.pk))
+    rescore_reviews(_review_model)
+    return _profile
+# /publish_weight_profile
+
+
+def require_numpy():
+    if numpy is None:
+        raise ImproperlyConfigured("The vectorized rating engine requires NumPy.")
+# /require_numpy
+
+
+def calculate_total_ratings(_categories, _weights):
+    """
+    Vectorized Review.calculate_total_rating over a whole table:
+        _categories is an (n_reviews, n_categories) array of attribute ratings,
+        _weights is the matching (n_categories,) array of percentage weights.
+    NumPy rounds half to even, exactly like round() in the per-row path.
+    """
+    _fractional_ratings = _categories.dot(_weights) / 100
+    return numpy.round(DENOMINATION * _fractional_ratings) / DENOMINATION
+# /calculate_total_ratings
+
+
+def calculate_overall_ratings(_drink_ids, _total_ratings):
+    """
+    Group total ratings by drink in one pass and return the arrays 
+    (drink_ids, rating_sums, rating_counts, overall_ratings).
+    """
+    _unique_ids, _inverse = numpy.unique(_drink_ids, return_inverse=True)
+    _rating_sums = numpy.bincount(_inverse, weights=_total_ratings)
+    _rating_counts = numpy.bincount(_inverse)
+    _overall_ratings = (numpy.round(DENOMINATION * _rating_sums / _rating_counts) 
+                        / DENOMINATION)
+    return _unique_ids, _rating_sums, _rating_counts, _overall_ratings
+# /calculate_overall_ratings
+
+
+def rescore_review_table(_review_model, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recompute every total_rating of _review_model with the weights in force 
+    and every overall_rating of its drinks in one vectorized pass, then bulk 
+    update only the review rows whose score or weight_version changed and 
+    every rated drink.  Returns the number of rescored reviews.
+    """
+    require_numpy()
+    
+    _version, _profile_weights = _review_model.get_weight_profile()
+    _attributes = [_attribute for _attribute, _weight in _profile_weights]
+    _weights = numpy.array([_weight for _attribute, _weight 
+                            in _profile_weights], dtype=float)
+    _drink_attname = _review_model._meta.get_field(_review_model.drink_field).attname
+    _drink_model = _review_model._meta.get_field(_review_model.drink_field).rel.to
+    
+    _rows = numpy.array(list(_review_model.objects
+                                          .order_by()
+                                          .values_list('pk', 
+                                                       _drink_attname, 
+                                                       'total_rating', 
+                                                       'weight_version', 
+                                                       *_attributes)), 
+                        dtype=float)
+    if not len(_rows):
+        _drink_model.objects.update(rating_sum=0, rating_count=0, overall_rating=0)
+        rebuild_histograms(_review_model)
+        rebuild_rollups(_review_model)
+        return 0
+    
+    _review_ids = _rows[:, 0].astype(int)
+    _drink_ids = _rows[:, 1].astype(int)
+    _total_ratings = calculate_total_ratings(_rows[:, 4:], _weights)
+    _changed = (_total_ratings != _rows[:, 2]) | (_rows[:, 3] != _version)
+    _overall = calculate_overall_ratings(_drink_ids, _total_ratings)
+    
+    with transaction.atomic():
+        bulk_update_columns(_review_model, 
+                            [(_review_id, _total_rating, _version) 
+                             for _review_id, _total_rating 
+                             in zip(_review_ids[_changed].tolist(), 
+                                    _total_ratings[_changed].tolist())], 
+                            ('total_rating', 'weight_version'), 
+                            chunk_size=chunk_size)
+        bulk_update_columns(_drink_model, 
+                            zip(*[_column.tolist() for _column in _overall]), 
+                            ('rating_sum', 'rating_count', 'overall_rating'), 
+                            chunk_size=chunk_size)
+        (_drink_model.objects
+                     .exclude(pk__in=_review_model.objects.order_by()
+                                                          .values(_review_model.drink_field))
+                     .update(rating_sum=0, rating_count=0, overall_rating=0))
+    rebuild_histograms(_review_model)
+    rebuild_rollups(_review_model)
+    return int(_changed.sum())
+# /rescore_review_table
+
+
+def rescore_per_row(_review_model):
+    """
+    The per-row path rescore_review_table replaces: every review loaded as 
+    an instance, scored with Review.calculate_total_rating and written with 
+    its own UPDATE, then every drink's rating from 
+    Drink.calculate_overall_rating, one UPDATE per drink.
+    """
+    _version, _weights = _review_model.get_weight_profile()
+    _drink_attname = _review_model._meta.get_field(_review_model.drink_field).attname
+    _drink_model = _review_model._meta.get_field(_review_model.drink_field).rel.to
+    _sums = {}
+    with transaction.atomic():
+        for _review in _review_model.objects.order_by().iterator():
+            _total_rating = _review.calculate_total_rating(
+                                        _review.get_rating_categories(_weights))
+            (_review_model.objects.filter(pk=_review.pk)
+                                  .update(total_rating=_total_rating, 
+                                          weight_version=_version))
+            _drink_id = getattr(_review, _drink_attname)
+            _rating_sum, _rating_count = _sums.get(_drink_id, (0, 0))
+            _sums[_drink_id] = (_rating_sum + _total_rating, _rating_count + 1)
+        for _drink_id, (_rating_sum, _rating_count) in _sums.items():
+            (_drink_model.objects.filter(pk=_drink_id)
+                                 .update(rating_sum=_rating_sum, 
+                                         rating_count=_rating_count, 
+                                         overall_rating=_drink_model.calculate_overall_rating(
+                                                                _rating_sum, 
+                                                                _rating_count)))
+        (_drink_model.objects
+                     .exclude(pk__in=_review_model.objects.order_by()
+                                                          .values(_review_model.drink_field))
+                     .update(rating_sum=0, rating_count=0, overall_rating=0))
+    rebuild_histograms(_review_model)
+    rebuild_rollups(_review_model)
+# /rescore_per_row
+
+
+class _Rollback(Exception):
+    pass
+# /_Rollback
+
+
+def get_rating_state(_review_model):
+    """Return every review's total_rating and every drink's rating columns."""
+    _drink_model = _review_model._meta.get_field(_review_model.drink_field).rel.to
+    return (dict(_review_model.objects.values_list('pk', 'total_rating')), 
+            dict((_row[0], _row[1:]) for _row in _drink_model.objects.values_list(
+                                        'pk', 'rating_sum', 'rating_count', 'overall_rating')))
+# /get_rating_state
+
+
+def benchmark_total_ratings(_review_model, n_reviews=10 ** 6, n_drinks=1000):
+    """
+    Insert n_reviews synthetic reviews, rated across each attribute's 
+    RATING_RANGES, over n_drinks synthetic drinks, then time re-scoring the 
+    whole table on the per-row path, rescore_per_row, against the 
+    vectorized engine, rescore_review_table, reads and writes included, and 
+    check both leave the same ratings.  Everything runs in a transaction 
+    that is rolled back.  Returns (per_row_seconds, vectorized_seconds).
+    """
+    require_numpy()
+    
+    _drink_field = _review_model._meta.get_field(_review_model.drink_field)
+    _drink_model = _drink_field.rel.to
+    _prefix = 'benchmark-%s' % uuid.uuid4().hex[:8]
+    try:
+        with transaction.atomic():
+            _rater = User.objects.create(username=_prefix)
+            _drink_model.objects.bulk_create(
+                    [_drink_model(name='%s %d' % (_prefix, _index), 
+                                  slug='%s-%d' % (_prefix, _index), 
+                                  **dict((_attribute, _min) for _attribute, _min, _max 
+                                         in _drink_model.VALUE_RANGES)) 
+                     for _index in range(n_drinks)], 
+                    batch_size=chunk_size_for(_drink_model))
+            _drink_ids = list(_drink_model.objects.filter(slug__startswith=_prefix)
+                                                  .values_list('pk', flat=True))
+            # Built and inserted chunk by chunk so memory stays flat.
+            _chunk_size = chunk_size_for(_review_model)
+            for _start in range(0, n_reviews, _chunk_size):
+                _review_model.objects.bulk_create(
+                        [_review_model(rater=_rater, 
+                                       title='%s %d' % (_prefix, _index), 
+                                       slug='%s-%d' % (_prefix, _index), 
+                                       **dict([(_drink_field.attname, random.choice(_drink_ids))] 
+                                              + [(_attribute, random.randint(_min, _max)) 
+                                                 for _attribute, _min, _max 
+                                                 in _review_model.RATING_RANGES])) 
+                         for _index in range(_start, min(_start + _chunk_size, n_reviews))])
+            
+            # Both paths start from unscored reviews, so both write every row.
+            _review_model.objects.update(total_rating=0, weight_version=0)
+            _start = time.time()
+            rescore_per_row(_review_model)
+            _per_row_seconds = time.time() - _start
+            _per_row_state = get_rating_state(_review_model)
+            
+            _review_model.objects.update(total_rating=0, weight_version=0)
+            _start = time.time()
+            rescore_review_table(_review_model)
+            _vectorized_seconds = time.time() - _start
+            
+            assert get_rating_state(_review_model) == _per_row_state, \
+                    "%s engines disagree." % _review_model.__name__
+            raise _Rollback
+    except _Rollback:
+        pass
+    return _per_row_seconds, _vectorized_seconds
+# /benchmark_total_ratings
+
+
+# EOF - publican_api ratings
@@ -0,0 +1,112 @@
+"""publican_api model registry"""
+
+from collections import namedtuple
+from collections import OrderedDict
+import threading
+
+from django.db import models
+
+from rest_framework.reverse import reverse
+
+import publican_api.basemodels as api_basemodels
+
+
+RegistryEntry = namedtuple('RegistryEntry', ('model', 
+                                             'collection', 
+                                             'list_view', 
+                                             'detail_view'))
+
+
+USERS_ENTRY = RegistryEntry(None, 'users', 'user-list', 'user-detail')
+
+# Bounds the root document cache; ALLOWED_HOSTS keeps real keys far fewer.
+MAX_ROOT_DOCUMENTS = 64
+
+
+class ModelRegistry(object):
+    """
+    Immutable catalogue of the Resource and Review models, their collection 
+    names and view names, built once on first use.  Collections are ordered 
+    users first, then resources, then reviews, as the root lists them.  Also 
+    holds the rendered root responses.
+    """
+    def __init__(self, resources, reviews):
+        self.resources = tuple(resources)
+        self.reviews = tuple(reviews)
+        self.collections = (USERS_ENTRY,) + self.resources + self.reviews
+        self.by_model = dict((_entry.model, _entry) 
+                             for _entry in self.resources + self.reviews)
+        self._root_documents = {}
+        self._rendered_roots = {}
+        self._lock = threading.Lock()
+    
+    def get_root_document(self, request, format=None):
+        """
+        Return the hyperlinked root document for this (scheme, host, format), 
+        reversing every collection URL only the first time the key is seen.
+        """
+        _key = (request.is_secure(), request.get_host(), format)
+        _document = self._root_documents.get(_key)
+        if _document is None:
+            _document = OrderedDict((_entry.collection, 
+                                     reverse(_entry.list_view, 
+                                             request=request, 
+                                             format=format)) 
+                                    for _entry in self.collections)
+            with self._lock:
+                if len(self._root_documents) >= MAX_ROOT_DOCUMENTS:
+                    self._root_documents.clear()
+                self._root_documents[_key] = _document
+        return _document
+    
+    def get_rendered_root(self, _key):
+        """Return the (content, content type) of a rendered root, or None."""
+        return self._rendered_roots.get(_key)
+    
+    def set_rendered_root(self, _key, _content, _content_type):
+        with self._lock:
+            if len(self._rendered_roots) >= MAX_ROOT_DOCUMENTS:
+                self._rendered_roots.clear()
+            self._rendered_roots[_key] = (_content, _content_type)
+# /ModelRegistry
+
+
+def get_entry(_model):
+    _name = _model._meta.verbose_name.replace(' ', '')
+    return RegistryEntry(_model, 
+                         _model._meta.verbose_name_plural.replace(' ', ''), 
+                         _name + "-list", 
+                         _name + "-detail")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def build_registry():
+    # Imported here: publican_api.models imports modules that import this one.
+    import publican_api.models as api_models
+    _models = models.get_models(app_mod=api_models)
+    return ModelRegistry(
+        [get_entry(_model) for _model in _models 
+         if issubclass(_model, api_basemodels.Resource)], 
+        [get_entry(_model) for _model in _models 
+         if issubclass(_model, api_basemodels.Review)])
+# /build_registry
+
+
+def get_registry():
+    """
+    Return the model registry, building it on first use.  Needs no app 
+    config, so it works on Django 1.6 as well as later versions.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = build_registry()
+    return _registry
+# /get_registry
+
+
+# EOF - publican_api model registry
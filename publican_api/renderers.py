@@ -0,0 +1,116 @@
+"""publican_api renderers"""
+
+import csv
+import io
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def require_msgpack():
+    if msgpack is None:
+        raise ImproperlyConfigured("MessagePack rendering requires the msgpack package.")
+# /require_msgpack
+
+
+def get_rows(_data):
+    """Return the rows of a list, a paginated page or a single object."""
+    if isinstance(_data, dict):
+        if 'results' in _data:
+            return _data['results']
+        return [_data]
+    return _data
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders the response data as MessagePack, dates and decimals as in JSON.  
+    Settings only register it when msgpack is installed.
+    """
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        require_msgpack()
+        if data is None:
+            return b''
+        return msgpack.packb(data, 
+                             default=JSONEncoder().default, 
+                             use_bin_type=True)
+# /MessagePackRenderer
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Base of the row-per-line renderers.  stream() yields the encoded output 
+    one row at a time, so viewsets with StreamingRenderMixin can send it as 
+    rows are produced; render() joins it for everything else.
+    """
+    charset = 'utf-8'
+    
+    def stream(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Abstract: subclasses yield the encoded output, as bytes, one row at 
+        a time.
+        """
+        raise NotImplementedError('StreamingRenderer.stream() must be implemented.')
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data, accepted_media_type, renderer_context))
+# /StreamingRenderer
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """Renders each row, the results of a page, as one line of JSON."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    
+    def stream(self, data, accepted_media_type=None, renderer_context=None):
+        for _row in get_rows(data):
+            yield (json.dumps(_row, cls=JSONEncoder, ensure_ascii=False)
+                   + '\n').encode(self.charset)
+# /NDJSONRenderer
+
+
+class CSVRenderer(StreamingRenderer):
+    """
+    Renders rows as CSV with a header of the first row's keys.  Nested 
+    objects and lists, such as expanded relations, are written as JSON.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    
+    def get_value(self, _value):
+        if _value is None:
+            return ''
+        if isinstance(_value, (dict, list)):
+            return json.dumps(_value, cls=JSONEncoder, ensure_ascii=False)
+        return _value
+    
+    def stream(self, data, accepted_media_type=None, renderer_context=None):
+        _buffer = io.StringIO()
+        _writer = csv.writer(_buffer)
+        _header = None
+        for _row in get_rows(data):
+            if _header is None:
+                _header = list(_row.keys())
+                _writer.writerow(_header)
+            _writer.writerow([self.get_value(_row.get(_name)) for _name in _header])
+            yield _buffer.getvalue().encode(self.charset)
+            _buffer.seek(0)
+            _buffer.truncate()
+# /CSVRenderer
+
+
+# EOF - publican_api renderers
@@ -0,0 +1,223 @@
+"""publican_api full-text search"""
+
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError
+from django.db import connection
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+import publican_api.registry as api_registry
+
+
+SEARCH_TABLE = 'publican_api_search'
+
+# Indexed into the 'body' column when a model has them; 'name' or 'title'
+# goes to the 'title' column, which ranks ten times higher.
+BODY_FIELDS = ('location', 'type', 'description', 'fruit')
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# Index rowids pack the content type into the high 32 bits and the object
+# id into the low 32, so each row is written and deleted by one rowid probe.
+ROWID_SHIFT = 32
+ROWID_MASK = (1 << ROWID_SHIFT) - 1
+
+
+def is_enabled():
+    """
+    Whether the database is SQLite built with FTS5, which is a compile-time 
+    option.  Checked once per process by creating the index table.
+    """
+    global _fts5_available
+    if _fts5_available is None:
+        _fts5_available = connection.vendor == 'sqlite' and create_index()
+    return _fts5_available
+
+
+def get_rowid(_content_type_id, _object_id):
+    return (_content_type_id << ROWID_SHIFT) | _object_id
+
+
+def split_rowid(_rowid):
+    return _rowid >> ROWID_SHIFT, _rowid & ROWID_MASK
+
+
+def get_document(_instance):
+    """Return the (title, body) pair indexed for a Resource or Review."""
+    _field_names = _instance._meta.get_all_field_names()
+    _title = _instance.name if 'name' in _field_names else _instance.title
+    _body = " ".join(getattr(_instance, _field) or ''
+                     for _field in BODY_FIELDS if _field in _field_names)
+    return _title, _body
+
+
+# None until this process has tried to create the index table, then 
+# whether that worked.
+_fts5_available = None
+
+
+def create_index():
+    """
+    Create the index table if it is missing and return True, or False when 
+    SQLite lacks FTS5.  Created on first use rather than after migrations, 
+    which have no signal of their own on Django 1.6; the savepoint keeps a 
+    failed CREATE from breaking an enclosing transaction.
+    """
+    try:
+        with transaction.atomic():
+            _cursor = connection.cursor()
+            _cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+                            "title, body, tokenize='unicode61 remove_diacritics 2')"
+                            % SEARCH_TABLE)
+    except DatabaseError:
+        return False
+    return True
+# /create_index
+
+
+def index_instances(_instances):
+    """Insert or replace the index rows of _instances, one statement in all."""
+    if not is_enabled() or not _instances:
+        return
+    _rows = []
+    for _instance in _instances:
+        _content_type = ContentType.objects.get_for_model(_instance)
+        _rows.append((get_rowid(_content_type.pk, _instance.pk),)
+                     + get_document(_instance))
+    _cursor = connection.cursor()
+    _cursor.executemany("INSERT OR REPLACE INTO %s (rowid, title, body) "
+                        "VALUES (%%s, %%s, %%s)" % SEARCH_TABLE, 
+                        _rows)
+# /index_instances
+
+
+def unindex_instance(_model, _pk):
+    if not is_enabled():
+        return
+    _content_type = ContentType.objects.get_for_model(_model)
+    _cursor = connection.cursor()
+    _cursor.execute("DELETE FROM %s WHERE rowid = %%s" % SEARCH_TABLE, 
+                    [get_rowid(_content_type.pk, _pk)])
+
+
+def rebuild_index(_model, chunk_size=500):
+    """
+    Drop and re-add every index row of _model, chunk_size rows at a time. 
+    Returns the number of rows indexed.
+    """
+    if not is_enabled():
+        raise ImproperlyConfigured("Search requires the SQLite FTS5 backend.")
+    _content_type = ContentType.objects.get_for_model(_model)
+    _cursor = connection.cursor()
+    _cursor.execute("DELETE FROM %s WHERE rowid BETWEEN %%s AND %%s"
+                    % SEARCH_TABLE, 
+                    [get_rowid(_content_type.pk, 0), 
+                     get_rowid(_content_type.pk, ROWID_MASK)])
+    _count = 0
+    _chunk = []
+    for _instance in _model.objects.iterator():
+        _chunk.append(_instance)
+        if len(_chunk) == chunk_size:
+            index_instances(_chunk)
+            _count += len(_chunk)
+            _chunk = []
+    index_instances(_chunk)
+    return _count + len(_chunk)
+# /rebuild_index
+
+
+def index_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instances([instance])
+# /index_saved
+
+
+def unindex_deleted(sender, instance, **kwargs):
+    unindex_instance(sender, instance.pk)
+# /unindex_deleted
+
+
+def connect(_searchable_models):
+    for _model in _searchable_models:
+        post_save.connect(index_saved, sender=_model)
+        post_delete.connect(unindex_deleted, sender=_model)
+# /connect
+
+
+def get_match_expression(_query):
+    """
+    Turn free text into an FTS5 expression that matches every word, the last 
+    one as a prefix, so user input never reaches the FTS5 query syntax. 
+    Returns None for a query without words.
+    """
+    _words = re.findall(r'\w+', _query, re.UNICODE)
+    if not _words:
+        return None
+    _terms = ['"%s"' % _word for _word in _words]
+    _terms[-1] += '*'
+    return " ".join(_terms)
+# /get_match_expression
+
+
+def search(_query, _models=None, offset=0, limit=10):
+    """
+    Rank the Resources and Reviews matching _query with bm25, best first, 
+    optionally only of _models.  Returns (total count, [(instance, score)]) 
+    for the page at offset, fetching the page's rows with one query per 
+    model on it.
+    """
+    if not is_enabled():
+        raise ImproperlyConfigured("Search requires the SQLite FTS5 backend.")
+    _match = get_match_expression(_query)
+    if _match is None:
+        return 0, []
+    
+    _where = "%s MATCH %%s" % SEARCH_TABLE
+    _params = [_match]
+    if _models is not None:
+        _content_type_ids = [ContentType.objects.get_for_model(_model).pk
+                             for _model in _models]
+        _where += " AND (rowid >> %d) IN (%s)" % (
+                        ROWID_SHIFT, ", ".join(["%s"] * len(_content_type_ids)))
+        _params += _content_type_ids
+    
+    _cursor = connection.cursor()
+    _cursor.execute("SELECT count(*) FROM %s WHERE %s" % (SEARCH_TABLE, _where), 
+                    _params)
+    _count = _cursor.fetchone()[0]
+    _cursor.execute("SELECT rowid, bm25(%s, %s, %s) AS score FROM %s "
+                    "WHERE %s ORDER BY score LIMIT %%s OFFSET %%s" % (
+                        SEARCH_TABLE, TITLE_WEIGHT, BODY_WEIGHT, 
+                        SEARCH_TABLE, _where), 
+                    _params + [limit, offset])
+    _hits = [split_rowid(_rowid) + (_score,)
+             for _rowid, _score in _cursor.fetchall()]
+    
+    _ids = {}
+    for _content_type_id, _object_id, _score in _hits:
+        _ids.setdefault(_content_type_id, []).append(_object_id)
+    _instances = {}
+    for _content_type_id, _object_ids in _ids.items():
+        _model = ContentType.objects.get_for_id(_content_type_id).model_class()
+        for _pk, _instance in _model.objects.in_bulk(_object_ids).items():
+            _instances[(_content_type_id, _pk)] = _instance
+    # bm25 scores are negative, lower is better; report higher as better.
+    return _count, [(_instances[(_content_type_id, _object_id)], -_score)
+                    for _content_type_id, _object_id, _score in _hits
+                    if (_content_type_id, _object_id) in _instances]
+# /search
+
+
+def get_search_models(_collections):
+    """Map collection names to models, raising KeyError on an unknown one."""
+    _registry = api_registry.get_registry()
+    _entries = dict((_entry.collection, _entry.model)
+                    for _entry in _registry.resources + _registry.reviews)
+    return [_entries[_collection] for _collection in _collections]
+
+
+# EOF - publican_api full-text search
@@ -1,19 +1,149 @@
 """publican_api serializers"""
 
+import threading
+
 from django.forms import widgets
 from django.contrib.auth.models import User
+from django.utils.datastructures import SortedDict
 
 from rest_framework import serializers
 
 import publican_api.models as api_models
-
-
-def get_msg(_attribute='', _min=0, _max=1):
-    _fragment = " value should be between {0} to {1}."
-    return _attribute + _fragment.format(_min, _max)
-
-
-class BeerSerializer(serializers.HyperlinkedModelSerializer):
+import publican_api.urlcache as api_urlcache
+import publican_api.validation as api_validation
+
+
+class CachedHyperlinkedRelatedField(serializers.HyperlinkedRelatedField):
+
+    def get_url(self, obj, view_name, request, format):
+        _value = getattr(obj, self.lookup_field, None)
+        if _value is None:
+            return None
+        _url = api_urlcache.url_templates.get_url(view_name, 
+                                                  _value, 
+                                                  self.lookup_field, 
+                                                  request=request, 
+                                                  format=format)
+        if _url is None:
+            return super(CachedHyperlinkedRelatedField, self).get_url(obj, 
+                                                                      view_name, 
+                                                                      request, 
+                                                                      format)
+        return _url
+# /CachedHyperlinkedRelatedField
+
+
+class CachedHyperlinkedIdentityField(serializers.HyperlinkedIdentityField):
+
+    def get_url(self, obj, view_name, request, format):
+        _value = getattr(obj, self.lookup_field, None)
+        if _value is None:
+            return None
+        _url = api_urlcache.url_templates.get_url(view_name, 
+                                                  _value, 
+                                                  self.lookup_field, 
+                                                  request=request, 
+                                                  format=format)
+        if _url is None:
+            return super(CachedHyperlinkedIdentityField, self).get_url(obj, 
+                                                                       view_name, 
+                                                                       request, 
+                                                                       format)
+        return _url
+# /CachedHyperlinkedIdentityField
+
+
+class PublicanSerializer(serializers.HyperlinkedModelSerializer):
+    """
+    HyperlinkedModelSerializer whose 'url' and related hyperlinks are 
+    formatted from cached URL templates instead of reversed per row.
+    """
+    _hyperlink_field_class = CachedHyperlinkedRelatedField
+    _hyperlink_identify_field_class = CachedHyperlinkedIdentityField
+# /PublicanSerializer
+
+
+# Bounds the sparse serializer cache; clients reuse a handful of fieldsets.
+MAX_SPARSE_SERIALIZERS = 256
+
+_sparse_serializers = {}
+_sparse_lock = threading.Lock()
+
+
+def get_field_names(_serializer_class):
+    """Return the output field names of _serializer_class, without instantiating it."""
+    _meta = getattr(_serializer_class, 'Meta', None)
+    if getattr(_meta, 'fields', None):
+        return tuple(_meta.fields)
+    return tuple(_serializer_class.base_fields)
+
+
+def get_sparse_serializer_class(_serializer_class, _fields):
+    """
+    Return a subclass of _serializer_class that outputs only _fields, a 
+    tuple of names from get_field_names.  Model serializers get a narrowed 
+    Meta and plain serializers narrowed base_fields, so the fast path 
+    compiles the narrowed columns too.  Model serializers left with no Meta 
+    field drop the unwanted fields after get_fields instead, since DRF 
+    reads empty Meta.fields as every field.  Subclasses are cached.
+    """
+    _key = (_serializer_class, _fields)
+    _sparse = _sparse_serializers.get(_key)
+    if _sparse is not None:
+        return _sparse
+    
+    _meta = getattr(_serializer_class, 'Meta', None)
+    if any(_name in _fields for _name in getattr(_meta, 'fields', None) or ()):
+        _sparse_meta = type('Meta', (_meta,), {
+            'fields': tuple(_name for _name in _meta.fields if _name in _fields), 
+            'read_only_fields': tuple(_name for _name 
+                                      in getattr(_meta, 'read_only_fields', ()) 
+                                      if _name in _fields), 
+        })
+        _sparse = type(_serializer_class.__name__, 
+                       (_serializer_class,), 
+                       {'Meta': _sparse_meta})
+    elif not issubclass(_serializer_class, serializers.ModelSerializer):
+        _sparse = type(_serializer_class.__name__, (_serializer_class,), {})
+        # Set after the class is made, as the metaclass collects every 
+        # declared field of the bases into base_fields.
+        _sparse.base_fields = SortedDict((_name, _field) for _name, _field 
+                                         in _serializer_class.base_fields.items() 
+                                         if _name in _fields)
+    else:
+        def get_fields(self):
+            _all = super(_sparse, self).get_fields()
+            for _name in list(_all):
+                if _name not in _fields:
+                    del _all[_name]
+            return _all
+        _sparse = type(_serializer_class.__name__, 
+                       (_serializer_class,), 
+                       {'get_fields': get_fields})
+    
+    with _sparse_lock:
+        if len(_sparse_serializers) >= MAX_SPARSE_SERIALIZERS:
+            _sparse_serializers.clear()
+        _sparse_serializers[_key] = _sparse
+    return _sparse
+# /get_sparse_serializer_class
+
+
+class RangeValidationMixin(object):
+    """
+    Checks every ranged attribute of range_model, or of Meta.model, against 
+    its compiled RangeTable in one pass before the per-field validate_ hooks.
+    """
+    range_model = None
+    
+    def perform_validation(self, attrs):
+        _table = api_validation.get_range_table(self.range_model or self.Meta.model)
+        self._errors.update(_table.check(attrs, skip=self._errors))
+        return super(RangeValidationMixin, self).perform_validation(attrs)
+# /RangeValidationMixin
+
+
+class BeerSerializer(RangeValidationMixin, PublicanSerializer):
     
     class Meta:
         model = api_models.Beer
@@ -34,38 +164,10 @@ class BeerSerializer(serializers.HyperlinkedModelSerializer):
                             'overall_rating', 
                             'created', 
                             'updated',)
-    
-    def validate_ibu(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 5
-        MAX_VALUE = 100
-        msg = get_msg("IBU", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_calories(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 50
-        MAX_VALUE = 1000
-        msg = get_msg("Calories", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_abv(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 0
-        MAX_VALUE = 80
-        msg = get_msg("ABV", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
 # /BeerSerializer
 
 
-class WineSerializer(serializers.HyperlinkedModelSerializer):
+class WineSerializer(RangeValidationMixin, PublicanSerializer):
     
     class Meta:
         model = api_models.Wine
@@ -87,29 +189,10 @@ class WineSerializer(serializers.HyperlinkedModelSerializer):
                             'overall_rating', 
                             'created', 
                             'updated',)
-    
-    def validate_sweetness(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 1
-        MAX_VALUE = 1000
-        msg = get_msg("Sweetness", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_acidity(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 0.1
-        MAX_VALUE = 1.0
-        msg = get_msg("Acidity", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
 # /WineSerializer
 
 
-class LiquorSerializer(serializers.HyperlinkedModelSerializer):
+class LiquorSerializer(RangeValidationMixin, PublicanSerializer):
     
     class Meta:
         model = api_models.Liquor
@@ -129,29 +212,10 @@ class LiquorSerializer(serializers.HyperlinkedModelSerializer):
                             'overall_rating', 
                             'created', 
                             'updated',)
-    
-    def validate_calories(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 50
-        MAX_VALUE = 1000
-        msg = get_msg("Calories", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_abv(self, attrs, source):
-        value = attrs[source]
-        MIN_VALUE = 0
-        MAX_VALUE = 80
-        msg = get_msg("ABV", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_VALUE) or (value > MAX_VALUE):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
 # /LiquorSerializer
 
 
-class BrewerySerializer(serializers.HyperlinkedModelSerializer):
+class BrewerySerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.Brewery
@@ -172,7 +236,7 @@ class BrewerySerializer(serializers.HyperlinkedModelSerializer):
 # /BrewerySerializer
 
 
-class WinerySerializer(serializers.HyperlinkedModelSerializer):
+class WinerySerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.Winery
@@ -193,7 +257,7 @@ class WinerySerializer(serializers.HyperlinkedModelSerializer):
 # /WinerySerializer
 
 
-class DistillerySerializer(serializers.HyperlinkedModelSerializer):
+class DistillerySerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.Distillery
@@ -214,7 +278,7 @@ class DistillerySerializer(serializers.HyperlinkedModelSerializer):
 # /DistillerySerializer
 
 
-class BeerGlassSerializer(serializers.HyperlinkedModelSerializer):
+class BeerGlassSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.BeerGlass
@@ -235,7 +299,7 @@ class BeerGlassSerializer(serializers.HyperlinkedModelSerializer):
 # /BeerGlassSerializer
 
 
-class WineGlassSerializer(serializers.HyperlinkedModelSerializer):
+class WineGlassSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.WineGlass
@@ -256,7 +320,7 @@ class WineGlassSerializer(serializers.HyperlinkedModelSerializer):
 # /WineGlassSerializer
 
 
-class LiquorGlassSerializer(serializers.HyperlinkedModelSerializer):
+class LiquorGlassSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.LiquorGlass
@@ -277,7 +341,7 @@ class LiquorGlassSerializer(serializers.HyperlinkedModelSerializer):
 # /LiquorGlassSerializer
 
 
-class BeerStyleSerializer(serializers.HyperlinkedModelSerializer):
+class BeerStyleSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.BeerStyle
@@ -298,7 +362,7 @@ class BeerStyleSerializer(serializers.HyperlinkedModelSerializer):
 # /BeerStyleSerializer
 
 
-class WineStyleSerializer(serializers.HyperlinkedModelSerializer):
+class WineStyleSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.WineStyle
@@ -319,7 +383,7 @@ class WineStyleSerializer(serializers.HyperlinkedModelSerializer):
 # /WineStyleSerializer
 
 
-class LiquorStyleSerializer(serializers.HyperlinkedModelSerializer):
+class LiquorStyleSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.LiquorStyle
@@ -340,7 +404,7 @@ class LiquorStyleSerializer(serializers.HyperlinkedModelSerializer):
 # /LiquorStyleSerializer
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
+class UserSerializer(PublicanSerializer):
 
     class Meta:
         model = User
@@ -356,7 +420,7 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
 # /UserSerializer
 
 
-class FavoriteSerializer(serializers.HyperlinkedModelSerializer):
+class FavoriteSerializer(PublicanSerializer):
     
     class Meta:
         model = api_models.Favorite
@@ -372,290 +436,84 @@ class FavoriteSerializer(serializers.HyperlinkedModelSerializer):
 # /FavoriteSerializer
 
 
-class BeerReviewSerializer(serializers.Serializer):
+class BeerReviewSerializer(RangeValidationMixin, serializers.Serializer):
+    
+    range_model = api_models.BeerReview
     
     beer = BeerSerializer()
     
     rater = UserSerializer()
     
     aroma = serializers.IntegerField()
-    # range: 1-5
     
     appearance = serializers.IntegerField()
-    # range: 1-5
     
     taste = serializers.IntegerField()
-    # range: 1-10
     
     palate = serializers.IntegerField()
-    # range: 1-5
     
     bottlestyle = serializers.IntegerField()
-    # range: 1-5
     
     description = serializers.CharField(required=False, 
                                         widget=widgets.Textarea)
-    
-    def validate_aroma(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Aroma", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_appearance(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Appearance", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_taste(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 10
-        msg = get_msg("Taste", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_palate(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Palate", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_bottlestyle(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Bottle style", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
 # /BeerReviewSerializer
 
 
-class WineReviewSerializer(serializers.Serializer):
+class WineReviewSerializer(RangeValidationMixin, serializers.Serializer):
+    
+    range_model = api_models.WineReview
     
     wine = WineSerializer()
     
     rater = UserSerializer()
     
     clarity = serializers.IntegerField()
-    # range: 1-5
     
     color = serializers.IntegerField()
-    # range: 1-5
     
     intensity = serializers.IntegerField()
-    # range: 1-5
     
     aroma = serializers.IntegerField()
-    # range: 1-20
     
     body = serializers.IntegerField()
-    # range: 1-5
     
     astringency = serializers.IntegerField()
-    # range: 1-5
     
     alcohol = serializers.IntegerField()
-    # range: 1-5
     
     balance = serializers.IntegerField()
-    # range: 1-15
     
     finish = serializers.IntegerField()
-    # range: 1-15
     
     complexity = serializers.IntegerField()
-    # range: 1-15
     
     bottlestyle = serializers.IntegerField()
-    # range: 1-5
     
     description = serializers.CharField(required=False, 
                                         widget=widgets.Textarea)
-    
-    def validate_clarity(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Clarity", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_color(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Color", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_intensity(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Intensity", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_aroma(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 20
-        msg = get_msg("Aroma", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_body(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Body", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_astringency(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Astringency", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_alcohol(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Alcohol", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_balance(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 15
-        msg = get_msg("Balance", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_finish(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 15
-        msg = get_msg("Finish", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_complexity(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 15
-        msg = get_msg("Complexity", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_bottlestyle(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Bottle style", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
 # /WineReviewSerializer
 
 
-class LiquorReviewSerializer(serializers.Serializer):
+class LiquorReviewSerializer(RangeValidationMixin, serializers.Serializer):
+    
+    range_model = api_models.LiquorReview
     
     liquor = LiquorSerializer()
     
     rater = UserSerializer()
     
     appearance = serializers.IntegerField()
-    # range: 1-5
     
     aroma = serializers.IntegerField()
-    # range: 1-5
     
     taste = serializers.IntegerField()
-    # range: 1-10
     
     aftertaste = serializers.IntegerField()
-    # range: 1-5
     
     bottlestyle = serializers.IntegerField()
-    # range: 1-5
     
     description = serializers.CharField(required=False, 
                                         widget=widgets.Textarea)
-    
-    FRAGMENT = " should be rated on a scale of {0} to {1}."
-    
-    def validate_appearance(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Appearance", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_aroma(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Aroma", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_taste(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 10
-        msg = get_msg("Taste", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_aftertaste(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Aftertaste", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
-    
-    def validate_bottlestyle(self, attrs, source):
-        value = attrs[source]
-        MIN_RATING = 1
-        MAX_RATING = 5
-        msg = get_msg("Bottle style", MIN_VALUE, MAX_VALUE)
-        if (value < MIN_RATING) or (value > MAX_RATING):
-            raise serializers.ValidationError(msg)
-        return attrs
 # /LiquorReviewSerializer
 
 
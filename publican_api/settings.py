@@ -73,6 +73,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'publican_api.middleware.QueryCountMiddleware',
 )
 
 AUTHENTICATION_BACKENDS = (
@@ -80,11 +81,26 @@ AUTHENTICATION_BACKENDS = (
 )
 
 
+# MessagePack is only offered where the optional msgpack package imports.
+try:
+    import msgpack
+except ImportError:
+    MSGPACK_RENDERER_CLASSES = ()
+else:
+    MSGPACK_RENDERER_CLASSES = ('publican_api.renderers.MessagePackRenderer',)
+
+
 #rest framework settings
 REST_FRAMEWORK = {
     'PAGINATE_BY': 10,                 # Default to 10
     'PAGINATE_BY_PARAM': 'page_size',  # Client override using `?page_size=xxx`.
     'MAX_PAGINATE_BY': 100,            # Maximum despite `?page_size=xxx`.
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ) + MSGPACK_RENDERER_CLASSES + (
+        'publican_api.renderers.NDJSONRenderer',        # Streamed by viewsets.
+    ),
     'DEFAULT_THROTTLE_CLASSES': (
         'rest_framework.throttling.ScopedRateThrottle',
         'publican_api.throttles.BurstRateThrottle',
@@ -101,9 +117,58 @@ REST_FRAMEWORK = {
         'glasscreate': '1/hour',    # CustomListCreateThrottle
         'stylecreate': '1/day',     # CustomListCreateThrottle
         'reviewcreate': '1/week',   # CustomListCreateThrottle
+        'reviewbulk': '1/week',     # CustomListCreateThrottle, BulkReviewMixin
     },
     'EXCEPTION_HANDLER': 'publican_api.views.custom_exception_handler',
 }
 
 
+# Seconds a cached collection count is trusted; creates and deletes drop it 
+# sooner.  ROW_COUNT_CACHE names the CACHES alias counts are kept in, which 
+# must be shared by every worker process, e.g. memcached: with a 
+# per-process cache, such as the default local memory one, a process misses 
+# other processes' creates and deletes until the timeout.
+ROW_COUNT_CACHE = 'default'
+ROW_COUNT_CACHE_TIMEOUT = 300
+
+
+# Rows read per keyset chunk by the export endpoint.
+EXPORT_CHUNK_SIZE = 1000
+
+
+# Serialize lists from values_list() rows on the compiled fast path.  The 
+# test suite checks its output against DRF's for every serializer; 
+# `manage.py benchmark_serializers` repeats the check on this database.
+FAST_PATH_SERIALIZERS = True
+
+
+# Defer drink rating updates from review saves to a background flush.
+DEFERRED_RATINGS = False
+
+# Seconds a deferred drink rating may lag behind its reviews.
+RATING_FLUSH_INTERVAL = 5
+
+
+# Day windows offered by the trending endpoint, and how many drinks each 
+# cached ranking holds.
+TRENDING_WINDOWS = (1, 7, 30)
+TRENDING_LIMIT = 25
+
+# Seconds a cached trending ranking is served; refresh_trending should run 
+# more often than this.
+TRENDING_CACHE_TIMEOUT = 900
+
+
+# Largest batch accepted by a bulk review POST.
+MAX_BULK_REVIEWS = 1000
+
+
+# Most matches one autocomplete request returns, and seconds the in-process 
+# autocomplete index may rank with stale drink ratings, or miss names 
+# written by other processes.  Resources other processes delete stay 
+# listed, unless drinks, until this process restarts.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_RATING_REFRESH = 60
+
+
 # EOF - publican_api settings
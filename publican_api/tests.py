@@ -0,0 +1,792 @@
+"""publican_api tests"""
+
+from itertools import combinations
+import json
+import re
+from unittest import mock
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db import models
+from django.db import transaction
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APITestCase
+
+import publican_api.autocomplete as api_autocomplete
+import publican_api.basemodels as api_basemodels
+import publican_api.export as api_export
+import publican_api.fastpath as api_fastpath
+import publican_api.filters as api_filters
+import publican_api.ingest as api_ingest
+import publican_api.models as api_models
+import publican_api.queryplan as api_queryplan
+import publican_api.ratings as api_ratings
+import publican_api.registry as api_registry
+import publican_api.serializers as api_serializers
+import publican_api.trending as api_trending
+import publican_api.urlcache as api_urlcache
+import publican_api.validation as api_validation
+import publican_api.views as api_views
+import publican_api.writebehind as api_writebehind
+
+
+# Queries allowed per review write once the drink's histogram bucket and 
+# rollup day rows exist:
+#   create: SELECT taken slugs, INSERT review, INSERT search row, 
+#           UPDATE histogram, UPDATE rollup, SELECT drink FOR UPDATE, 
+#           UPDATE drink
+#   update: UPDATE review (slug kept while the title is unchanged), 
+#           REPLACE search row, UPDATE histogram (old and new bucket), 
+#           UPDATE rollup, SELECT drink FOR UPDATE, UPDATE drink
+#   delete: DELETE review, DELETE search row, UPDATE histogram, 
+#           UPDATE rollup, SELECT drink FOR UPDATE, UPDATE drink
+REVIEW_QUERY_BUDGETS = {
+    'create': 7, 
+    'update': 7, 
+    'delete': 6, 
+}
+
+SAMPLE_DRINKS = {
+    api_models.Beer: {'ibu': 50, 'calories': 150, 'abv': 5}, 
+    api_models.Wine: {'sweetness': 500, 'acidity': 0.5, 'tannin': 'L'}, 
+    api_models.Liquor: {'calories': 100, 'abv': 40}, 
+}
+
+
+class SparseFieldsTest(APITestCase):
+    
+    def setUp(self):
+        self.beer = api_models.Beer.objects.create(name="Sparse Test Ale", 
+                                                   ibu=40, 
+                                                   calories=200, 
+                                                   abv=5.0)
+    
+    def test_detail_with_rating_histogram(self):
+        _response = self.client.get('/beers/%d/' % self.beer.pk, 
+                                    {'fields': 'name,rating_histogram'})
+        self.assertEqual(_response.status_code, 200)
+        self.assertEqual(set(_response.data), set(['name', 'rating_histogram']))
+        self.assertEqual(_response.data['name'], "Sparse Test Ale")
+    
+    def test_detail_with_rating_histogram_only(self):
+        _response = self.client.get('/beers/%d/' % self.beer.pk, 
+                                    {'fields': 'rating_histogram'})
+        self.assertEqual(_response.status_code, 200)
+        self.assertEqual(set(_response.data), set(['rating_histogram']))
+    
+    def test_unknown_field(self):
+        _response = self.client.get('/beers/%d/' % self.beer.pk, 
+                                    {'fields': 'name,colour'})
+        self.assertEqual(_response.status_code, 400)
+# /SparseFieldsTest
+
+
+def get_ratings(_review_model, _index):
+    # _index 1 rates every attribute at its minimum, 2 at its maximum.
+    return dict((_attribute, (_min, _max)[_index - 1]) 
+                for _attribute, _min, _max in _review_model.RATING_RANGES)
+
+
+@override_settings(DEFERRED_RATINGS=False)
+class ReviewQueryBudgetTest(TestCase):
+    """
+    Create, update and delete a review of each type against warmed up 
+    fixtures and fail, listing the SQL, if any write issues more queries 
+    than REVIEW_QUERY_BUDGETS allows.
+    """
+    def setUp(self):
+        self.rater = User.objects.create(username='query-budget-rater')
+    
+    def assert_budget(self, _review_model, _operation, _queries):
+        self.assertLessEqual(len(_queries.captured_queries), 
+                             REVIEW_QUERY_BUDGETS[_operation], 
+                             "%s %s: %d queries (budget %d)\n    %s" % (
+                                _review_model.__name__, 
+                                _operation, 
+                                len(_queries.captured_queries), 
+                                REVIEW_QUERY_BUDGETS[_operation], 
+                                "\n    ".join(_query['sql'] for _query 
+                                              in _queries.captured_queries)))
+    
+    def test_review_writes(self):
+        for _review_model in api_ratings.REVIEW_MODELS:
+            _drink_field = _review_model.drink_field
+            _drink_model = _review_model._meta.get_field(_drink_field).rel.to
+            _drink = _drink_model.objects.create(
+                                name='query budget %s' % _drink_field, 
+                                **SAMPLE_DRINKS[_drink_model])
+            # Warm up caches, histogram buckets and the rollup day.
+            for _index in (1, 2):
+                _review_model.objects.create(
+                                rater=self.rater, 
+                                title='query budget warm up %d' % _index, 
+                                **dict({_drink_field: _drink}, 
+                                       **get_ratings(_review_model, _index)))
+            
+            _review = _review_model(rater=self.rater, 
+                                    title='query budget measured', 
+                                    **dict({_drink_field: _drink}, 
+                                           **get_ratings(_review_model, 1)))
+            with CaptureQueriesContext(connection) as _queries:
+                _review.save()
+            self.assert_budget(_review_model, 'create', _queries)
+            
+            for _attribute, _value in get_ratings(_review_model, 2).items():
+                setattr(_review, _attribute, _value)
+            with CaptureQueriesContext(connection) as _queries:
+                _review.save()
+            self.assert_budget(_review_model, 'update', _queries)
+            
+            with CaptureQueriesContext(connection) as _queries:
+                _review.delete()
+            self.assert_budget(_review_model, 'delete', _queries)
+# /ReviewQueryBudgetTest
+
+
+@override_settings(DEFERRED_RATINGS=False)
+class IngestReviewsTest(TestCase):
+    
+    def setUp(self):
+        self.rater = User.objects.create(username='ingest-rater')
+        self.ale = api_models.Beer.objects.create(name="Ingest Test Ale", 
+                                                  **SAMPLE_DRINKS[api_models.Beer])
+        self.stout = api_models.Beer.objects.create(name="Ingest Test Stout", 
+                                                    **SAMPLE_DRINKS[api_models.Beer])
+    
+    def get_payload(self, _title, _beer):
+        _payload = {'title': _title, 'description': "A bulk ingested review.", 'beer': _beer}
+        _payload.update(get_ratings(api_models.BeerReview, 2))
+        return _payload
+    
+    def test_partial_success(self):
+        _payloads = [
+            self.get_payload("First bulk review", self.ale.pk), 
+            self.get_payload("Short", self.ale.pk), 
+            self.get_payload("Unknown drink review", 'no-such-beer'), 
+            self.get_payload("First bulk review", self.stout.pk), 
+            self.get_payload("Review by slug", self.stout.slug), 
+            self.get_payload("Review by URL", 'http://testserver' + 
+                             reverse('beer-detail', kwargs={'pk': self.stout.pk})), 
+            "not an object", 
+        ]
+        _created, _errors = api_ingest.ingest_reviews(api_models.BeerReview, 
+                                                      _payloads, 
+                                                      self.rater)
+        self.assertEqual(sorted(_review.title for _review in _created), 
+                         ["First bulk review", "Review by URL", "Review by slug"])
+        self.assertEqual([_index for _index, _item_errors in _errors], [1, 2, 3, 6])
+        self.assertIn('title', dict(_errors)[1])
+        self.assertIn('beer', dict(_errors)[2])
+        self.assertEqual(dict(_errors)[3], {'title': [api_ingest.TITLE_TAKEN]})
+        self.assertEqual(api_models.BeerReview.objects.filter(beer=self.stout).count(), 2)
+    
+    def test_one_rating_update_per_drink(self):
+        _payloads = ([self.get_payload("Ale bulk review %d" % _n, self.ale.pk) 
+                      for _n in range(3)] 
+                     + [self.get_payload("Stout bulk review %d" % _n, self.stout.pk) 
+                        for _n in range(2)])
+        with mock.patch.object(api_models.Beer, 'adjust_rating', 
+                               wraps=api_models.Beer.adjust_rating) as _adjust:
+            _created, _errors = api_ingest.ingest_reviews(api_models.BeerReview, 
+                                                          _payloads, 
+                                                          self.rater)
+        self.assertEqual(_errors, [])
+        self.assertEqual(sorted((_call[0][0], _call[0][2]) for _call in _adjust.call_args_list), 
+                         sorted([(self.ale.pk, 3), (self.stout.pk, 2)]))
+        _ale = api_models.Beer.objects.get(pk=self.ale.pk)
+        self.assertEqual(_ale.rating_count, 3)
+        self.assertEqual(_ale.rating_sum, sum(_review.total_rating for _review in _created 
+                                              if _review.beer_id == self.ale.pk))
+    
+    def test_large_batch(self):
+        # More items than SQLite binds in one statement.
+        _payloads = [self.get_payload("Large batch review %04d" % _n, self.ale.pk) 
+                     for _n in range(api_ingest.get_max_bulk_reviews())]
+        _created, _errors = api_ingest.ingest_reviews(api_models.BeerReview, 
+                                                      _payloads, 
+                                                      self.rater)
+        self.assertEqual((len(_created), _errors), (len(_payloads), []))
+    
+    def test_title_taken_by_concurrent_batch(self):
+        _get_unique_slugs = api_basemodels.get_unique_slugs
+        
+        def take_title(_model, _values):
+            # Commits a review with the first title after validation passed.
+            if not _model.objects.filter(title="Contested review").exists():
+                _model.objects.create(rater=self.rater, 
+                                      title="Contested review", 
+                                      beer=self.ale, 
+                                      **get_ratings(_model, 1))
+            return _get_unique_slugs(_model, _values)
+        
+        _payloads = [self.get_payload("Contested review", self.ale.pk), 
+                     self.get_payload("Uncontested review", self.ale.pk)]
+        with mock.patch.object(api_basemodels, 'get_unique_slugs', side_effect=take_title):
+            _created, _errors = api_ingest.ingest_reviews(api_models.BeerReview, 
+                                                          _payloads, 
+                                                          self.rater)
+        self.assertEqual([_review.title for _review in _created], ["Uncontested review"])
+        self.assertEqual(_errors, [(0, {'title': [api_ingest.TITLE_TAKEN]})])
+# /IngestReviewsTest
+
+
+class AutocompleteIndexTest(TransactionTestCase):
+    # Not TestCase: its transaction would hold every write back from the index.
+    
+    def setUp(self):
+        api_models.Beer.objects.create(name="Amber Index Ale", **SAMPLE_DRINKS[api_models.Beer])
+        self.index = api_autocomplete.AutocompleteIndex()
+        self.index.build()
+        api_autocomplete.autocomplete_index, self.shared = (self.index, 
+                                                            api_autocomplete.autocomplete_index)
+    
+    def tearDown(self):
+        api_autocomplete.autocomplete_index = self.shared
+    
+    def get_names(self, _prefix):
+        return [_match[2] for _match in self.index.complete(_prefix)]
+    
+    def test_committed_writes(self):
+        _beer = api_models.Beer.objects.create(name="Amber Second Ale", 
+                                               **SAMPLE_DRINKS[api_models.Beer])
+        self.assertEqual(self.get_names("amber"), ["Amber Index Ale", "Amber Second Ale"])
+        _beer.name = "Bock Renamed"
+        _beer.save()
+        self.assertEqual(self.get_names("amber"), ["Amber Index Ale"])
+        self.assertEqual(self.get_names("bock"), ["Bock Renamed"])
+        _beer.delete()
+        self.assertEqual(self.get_names("bock"), [])
+    
+    def test_rolled_back_write(self):
+        try:
+            with transaction.atomic():
+                api_models.Beer.objects.create(name="Amber Phantom Ale", 
+                                               **SAMPLE_DRINKS[api_models.Beer])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.get_names("amber"), ["Amber Index Ale"])
+# /AutocompleteIndexTest
+
+
+# Required attribute of each related resource base, set on the samples.
+SAMPLE_RESOURCE_ATTRIBUTES = (
+    (api_basemodels.Facility, 'location'), 
+    (api_basemodels.Glass, 'type'), 
+    (api_basemodels.Style, 'description'), 
+)
+
+
+class FastPathTest(APITestCase):
+    """
+    Render every viewset serializer, and a sparse variant per field, on the 
+    fast path and through DRF, and fail unless the JSON is the same bytes.
+    """
+    def setUp(self):
+        _rater = User.objects.create(username='fast-path-rater')
+        for _drink_model, _kwargs in SAMPLE_DRINKS.items():
+            _drink = _drink_model.objects.create(name="Fast Path \u00c9 %s" % _drink_model.__name__, 
+                                                 **_kwargs)
+            for _model in api_views.MODEL_SERIALIZERS:
+                _keys = [_field.name for _field in _model._meta.fields
+                         if isinstance(_field, models.ForeignKey) 
+                         and _field.rel.to is _drink_model]
+                if not _keys:
+                    continue
+                if issubclass(_model, api_basemodels.Review):
+                    _model.objects.create(rater=_rater, 
+                                          title="Fast path %s" % _model.__name__, 
+                                          description="Caf\u00e9 & <notes>", 
+                                          **dict({_keys[0]: _drink}, 
+                                                 **get_ratings(_model, 2)))
+                    continue
+                _attribute = [_name for _base, _name in SAMPLE_RESOURCE_ATTRIBUTES 
+                              if issubclass(_model, _base)][0]
+                _model.objects.create(name="Fast path %s" % _model.__name__, 
+                                      **{_keys[0]: _drink, _attribute: "sample"})
+        self.request = Request(RequestFactory().get('/'))
+    
+    def assert_same_output(self, _serializer_class, _model):
+        _fast = api_fastpath.compile_serializer(_serializer_class, _model)
+        self.assertIsNotNone(_fast, "%s has no fast path." % _serializer_class.__name__)
+        _queryset = _model.objects.order_by('pk')
+        _drf = _serializer_class(list(_queryset), 
+                                 many=True, 
+                                 context={'request': self.request}).data
+        _renderer = JSONRenderer()
+        self.assertEqual(_renderer.render(_fast.bind(self.request)(_queryset)), 
+                         _renderer.render(_drf), 
+                         _serializer_class.__name__)
+    
+    def test_every_serializer(self):
+        for _model, _serializer_class in (list(api_views.MODEL_SERIALIZERS.items()) 
+                                          + [(User, api_serializers.UserSerializer)]):
+            self.assertTrue(_model.objects.exists(), _model.__name__)
+            self.assert_same_output(_serializer_class, _model)
+            for _name in api_serializers.get_field_names(_serializer_class):
+                self.assert_same_output(
+                            api_serializers.get_sparse_serializer_class(_serializer_class, 
+                                                                        (_name,)), 
+                            _model)
+    
+    def test_sparse_review_list(self):
+        _responses = []
+        for _enabled in (False, True):
+            with override_settings(FAST_PATH_SERIALIZERS=_enabled):
+                _responses.append(self.client.get('/beerreviews/', 
+                                                  {'fields': 'beer,rater,aroma'}))
+        self.assertEqual(_responses[0].status_code, 200)
+        self.assertEqual(_responses[0].content, _responses[1].content)
+    
+    def test_lookup_values_percent_encoded(self):
+        self.assertEqual(api_urlcache.url_templates.get_path('beer-detail', 'caf\u00e9 & bar'), 
+                         reverse('beer-detail', kwargs={'pk': 'caf\u00e9 & bar'}))
+# /FastPathTest
+
+
+def get_filter_combinations(_model):
+    """Every single filter field of _model and every pair of them."""
+    return ([(_name,) for _name in _model.FILTER_FIELDS]
+            + list(combinations(_model.FILTER_FIELDS, 2)))
+
+
+def get_sample_filters(_model, _names):
+    # A lower bound for range fields and the first choice for choice fields.
+    _filters = {}
+    for _name in _names:
+        _field = _model._meta.get_field(_name)
+        if _field.choices:
+            _filters[_name] = _field.choices[0][0]
+        else:
+            _filters[_name + api_filters.FILTER_SEPARATOR + 'gte'] = _field.to_python(0)
+    return _filters
+
+
+def explain_query_plan(_queryset):
+    """Return the detail column of SQLite's EXPLAIN QUERY PLAN for _queryset."""
+    _sql, _params = _queryset.query.sql_with_params()
+    _cursor = connection.cursor()
+    _cursor.execute("EXPLAIN QUERY PLAN " + _sql, _params)
+    return [_row[-1] for _row in _cursor.fetchall()]
+
+
+def is_full_scan(_details, _table):
+    # SEARCH steps use an index range; a SCAN of the table, or of one of its 
+    # indexes, reads every row.
+    _pattern = re.compile(r'^SCAN (TABLE )?%s\b' % re.escape(_table))
+    return any(_pattern.match(_detail) for _detail in _details)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN checks require SQLite.")
+class FilterPlanTest(TestCase):
+    """
+    EXPLAIN every supported drink filter and pair of filters as the list 
+    views run them and fail, listing the plans, if any falls back to a full 
+    table scan.
+    """
+    def test_no_full_scans(self):
+        _full_scans = []
+        for _entry in api_registry.get_registry().resources:
+            if not issubclass(_entry.model, api_basemodels.Drink):
+                continue
+            for _names in get_filter_combinations(_entry.model):
+                _filters = get_sample_filters(_entry.model, _names)
+                _details = explain_query_plan(
+                                api_filters.apply_filters(_entry.model.objects.all(), 
+                                                          _filters))
+                if is_full_scan(_details, _entry.model._meta.db_table):
+                    _full_scans.append("%s %s: %s" % (_entry.collection, 
+                                                      "&".join(sorted(_filters)), 
+                                                      "; ".join(_details)))
+        self.assertEqual(_full_scans, [], 
+                         "Filters falling back to a full scan:\n" + "\n".join(_full_scans))
+# /FilterPlanTest
+
+
+class StreamingPaginationTest(APITestCase):
+    
+    def setUp(self):
+        for _index in range(3):
+            api_models.Beer.objects.create(name="Streamed Ale %d" % _index, 
+                                           **SAMPLE_DRINKS[api_models.Beer])
+    
+    def test_links_in_headers(self):
+        _response = self.client.get('/beers/', 
+                                    {'page': 2, 'page_size': 1}, 
+                                    HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(_response.status_code, 200)
+        self.assertEqual(len(b''.join(_response.streaming_content).splitlines()), 1)
+        self.assertIn('page=3', _response['Link'])
+        self.assertIn('rel="next"', _response['Link'])
+        self.assertIn('page=1', _response['Link'])
+        self.assertIn('rel="prev"', _response['Link'])
+        self.assertEqual(_response['X-Total-Count'], '3')
+    
+    def test_last_page_has_no_next(self):
+        _response = self.client.get('/beers/', 
+                                    {'page': 3, 'page_size': 1}, 
+                                    HTTP_ACCEPT='text/csv')
+        self.assertNotIn('rel="next"', _response['Link'])
+# /StreamingPaginationTest
+
+
+class ExpandTest(APITestCase):
+    
+    def setUp(self):
+        # Brewery names run opposite to their beers' pks.
+        for _index in range(5):
+            _beer = api_models.Beer.objects.create(name="Expanded Ale %d" % _index, 
+                                                   **SAMPLE_DRINKS[api_models.Beer])
+            api_models.Brewery.objects.create(name="Brewery %d" % (5 - _index), 
+                                              location="Here", 
+                                              beer=_beer)
+    
+    def test_expanded_rows_match_their_results(self):
+        _seen = []
+        for _page in (1, 2, 3):
+            _response = self.client.get('/breweries/', 
+                                        {'expand': 'beer', 'page': _page, 'page_size': 2})
+            self.assertEqual(_response.status_code, 200)
+            for _result in _response.data['results']:
+                _brewery = api_models.Brewery.objects.get(pk=_result['id'])
+                self.assertEqual(_result['beer']['id'], _brewery.beer_id)
+                _seen.append(_result['id'])
+        self.assertEqual(sorted(_seen), 
+                         sorted(api_models.Brewery.objects.values_list('pk', flat=True)))
+# /ExpandTest
+
+
+class RangeTableTest(TestCase):
+    
+    def test_messages(self):
+        _errors = api_validation.get_range_table(api_models.Beer).check(
+                                    {'ibu': -1, 'abv': 5, 'calories': 10 ** 6})
+        self.assertEqual(sorted(_errors), ['calories', 'ibu'])
+        self.assertTrue(_errors['ibu'][0].startswith("IBU value should be between "))
+        self.assertTrue(_errors['calories'][0].startswith("Calories value should be between "))
+        _errors = api_validation.get_range_table(api_models.BeerReview).check(
+                                    {'bottlestyle': 0})
+        self.assertTrue(_errors['bottlestyle'][0].startswith(
+                                    "Bottle style should be rated on a scale of "))
+# /RangeTableTest
+
+
+class RatingQueueTest(TestCase):
+    
+    def setUp(self):
+        self.rater = User.objects.create(username='rating-queue-rater')
+        self.addCleanup(api_writebehind.rating_queue.stop)
+    
+    def create_reviews(self, _drink, _label):
+        for _number, _index in enumerate((1, 2, 2)):
+            api_models.BeerReview.objects.create(
+                                rater=self.rater, 
+                                title="Queued %s review %d" % (_label, _number), 
+                                beer=_drink, 
+                                **get_ratings(api_models.BeerReview, _index))
+    
+    def test_coalesced_until_flush(self):
+        _immediate = api_models.Beer.objects.create(name="Immediate Ale", 
+                                                    **SAMPLE_DRINKS[api_models.Beer])
+        with override_settings(DEFERRED_RATINGS=False):
+            self.create_reviews(_immediate, "immediate")
+        
+        _queued = api_models.Beer.objects.create(name="Queued Ale", 
+                                                 **SAMPLE_DRINKS[api_models.Beer])
+        # An interval the worker never reaches, so only flush() drains.
+        with override_settings(DEFERRED_RATINGS=True, RATING_FLUSH_INTERVAL=3600):
+            self.create_reviews(_queued, "queued")
+            self.assertEqual(api_writebehind.rating_queue.pending(), 1)
+            self.assertEqual(api_models.Beer.objects.get(pk=_queued.pk).overall_rating, 
+                             _queued.overall_rating)
+            self.assertEqual(api_writebehind.rating_queue.flush(), 1)
+        self.assertEqual(api_writebehind.rating_queue.pending(), 0)
+        self.assertEqual(api_models.Beer.objects.get(pk=_queued.pk).overall_rating, 
+                         api_models.Beer.objects.get(pk=_immediate.pk).overall_rating)
+# /RatingQueueTest
+
+
+@override_settings(DEFERRED_RATINGS=False)
+class RatingHistogramTest(TestCase):
+    
+    def setUp(self):
+        _rater = User.objects.create(username='histogram-rater')
+        self.beer = api_models.Beer.objects.create(name="Histogram Ale", 
+                                                   **SAMPLE_DRINKS[api_models.Beer])
+        self.reviews = [api_models.BeerReview.objects.create(
+                                rater=_rater, 
+                                title="Histogram review %d" % _number, 
+                                beer=self.beer, 
+                                **get_ratings(api_models.BeerReview, _index))
+                        for _number, _index in enumerate((1, 2, 2))]
+        self.low = '%.2f' % self.reviews[0].total_rating
+        self.high = '%.2f' % self.reviews[1].total_rating
+    
+    def test_buckets_follow_writes(self):
+        _histogram = api_models.RatingHistogram.get_histogram
+        self.assertEqual(list(_histogram(self.beer).items()), 
+                         [(self.low, 1), (self.high, 2)])
+        
+        _review = self.reviews[2]
+        for _attribute, _value in get_ratings(api_models.BeerReview, 1).items():
+            setattr(_review, _attribute, _value)
+        _review.save()
+        self.assertEqual(list(_histogram(self.beer).items()), 
+                         [(self.low, 2), (self.high, 1)])
+        
+        self.reviews[1].delete()
+        self.assertEqual(list(_histogram(self.beer).items()), [(self.low, 2)])
+# /RatingHistogramTest
+
+
+@override_settings(DEFERRED_RATINGS=False)
+class RatingRollupTest(TestCase):
+    
+    def setUp(self):
+        self.rater = User.objects.create(username='rollup-rater')
+    
+    def review(self, _beer, _title, _index):
+        return api_models.BeerReview.objects.create(rater=self.rater, 
+                                                    title=_title, 
+                                                    beer=_beer, 
+                                                    **get_ratings(api_models.BeerReview, _index))
+    
+    def test_daily_rows_and_ranking(self):
+        _busy = api_models.Beer.objects.create(name="Busy Ale", 
+                                               **SAMPLE_DRINKS[api_models.Beer])
+        _quiet = api_models.Beer.objects.create(name="Quiet Ale", 
+                                                **SAMPLE_DRINKS[api_models.Beer])
+        _reviews = [self.review(_busy, "Busy review %d" % _index, _index) 
+                    for _index in (1, 2)]
+        self.review(_busy, "Busy review 3", 2)
+        self.review(_quiet, "Quiet review", 2)
+        _reviews[1].delete()
+        
+        _rollup = api_models.RatingRollup.objects.get(
+                        drink_content_type=ContentType.objects.get_for_model(api_models.Beer), 
+                        drink_object_id=_busy.pk)
+        self.assertEqual(_rollup.day, _reviews[0].created.date())
+        self.assertEqual(_rollup.review_count, 2)
+        self.assertAlmostEqual(_rollup.rating_sum, 
+                               sum(api_models.BeerReview.objects.filter(beer=_busy)
+                                                                .values_list('total_rating', 
+                                                                             flat=True)))
+        
+        _trending = api_trending.compute_trending(api_models.Beer, 1)
+        self.assertEqual([(_entry['id'], _entry['window_reviews']) for _entry in _trending], 
+                         [(_busy.pk, 2), (_quiet.pk, 1)])
+# /RatingRollupTest
+
+
+class CatalogLookupTest(TestCase):
+    
+    def setUp(self):
+        self.beer = api_models.Beer.objects.create(name="Catalog Shared", 
+                                                   **SAMPLE_DRINKS[api_models.Beer])
+        self.wine = api_models.Wine.objects.create(name="Catalog Shared", 
+                                                   **SAMPLE_DRINKS[api_models.Wine])
+    
+    def test_name_and_slug(self):
+        _lookup = api_models.CatalogEntry.lookup
+        self.assertEqual(_lookup(self.wine.slug), self.wine)
+        self.assertEqual(_lookup("Catalog Shared", [api_models.Wine, api_models.Beer]), 
+                         self.wine)
+        self.assertEqual(_lookup("Catalog Shared", [api_models.Beer, api_models.Wine]), 
+                         self.beer)
+        self.assertIsNone(_lookup("Catalog Shared", [api_models.Liquor]))
+        self.assertIsNone(_lookup("Catalog Missing"))
+    
+    def test_one_catalog_query_and_one_fetch(self):
+        api_models.CatalogEntry.lookup(self.beer.slug, [api_models.Beer])
+        with self.assertNumQueries(2):
+            self.assertEqual(api_models.CatalogEntry.lookup(self.beer.slug, 
+                                                            [api_models.Beer]), 
+                             self.beer)
+    
+    def test_follows_renames_and_deletes(self):
+        self.beer.name = "Catalog Renamed"
+        self.beer.save()
+        self.assertEqual(api_models.CatalogEntry.lookup("Catalog Renamed"), self.beer)
+        self.assertEqual(api_models.CatalogEntry.lookup("Catalog Shared"), self.wine)
+        api_models.Wine.objects.filter(pk=self.wine.pk).delete()
+        self.assertIsNone(api_models.CatalogEntry.lookup("Catalog Shared"))
+# /CatalogLookupTest
+
+
+class UniqueSlugTest(APITestCase):
+    
+    def create_beer(self, _name):
+        return api_models.Beer.objects.create(name=_name, **SAMPLE_DRINKS[api_models.Beer])
+    
+    # Names are unique, but differently written ones share a slug.
+    def test_collisions_get_suffixes(self):
+        self.assertEqual([self.create_beer(_name).slug 
+                          for _name in ("Twin Ale", "Twin-Ale", "twin ale!")], 
+                         ['twin-ale', 'twin-ale-2', 'twin-ale-3'])
+        self.assertEqual(api_basemodels.get_unique_slugs(api_models.Beer, 
+                                                         ["TWIN ALE", "Twin  Ale", "Solo Ale"]), 
+                         ['twin-ale-4', 'twin-ale-5', 'solo-ale'])
+    
+    def test_rename_keeps_matching_slug(self):
+        _beer = self.create_beer("Kept Ale")
+        self.create_beer("Kept-Ale")
+        _beer.name = "KEPT ale"
+        _beer.save()
+        self.assertEqual(_beer.slug, 'kept-ale')
+        _beer.name = "Moved Ale"
+        _beer.save()
+        self.assertEqual(_beer.slug, 'moved-ale')
+    
+    def test_digit_names_never_read_as_pks(self):
+        self.assertEqual(self.create_beer("1999").slug, '1999-beer')
+    
+    def test_slug_and_pk_routes(self):
+        _beer = self.create_beer("Routed Ale")
+        for _lookup in (_beer.slug, _beer.pk):
+            _response = self.client.get('/beers/%s/' % _lookup)
+            self.assertEqual(_response.status_code, 200)
+            self.assertEqual(_response.data['id'], _beer.pk)
+        self.assertEqual(self.client.get('/beers/no-such-ale/').status_code, 404)
+# /UniqueSlugTest
+
+
+class UrlTemplateTest(APITestCase):
+    
+    def test_paths_match_reverse(self):
+        _registry = api_registry.get_registry()
+        for _entry in _registry.resources + _registry.reviews:
+            for _value in (7, 'some-slug'):
+                self.assertEqual(api_urlcache.url_templates.get_path(_entry.detail_view, 
+                                                                     _value), 
+                                 reverse(_entry.detail_view, kwargs={'pk': _value}))
+    
+    def test_absolute_urls_match_reverse(self):
+        _beer = api_models.Beer.objects.create(name="Templated Ale", 
+                                               **SAMPLE_DRINKS[api_models.Beer])
+        _response = self.client.get('/beers/%d/' % _beer.pk)
+        self.assertEqual(_response.data['url'], 
+                         'http://testserver' + reverse('beer-detail', kwargs={'pk': _beer.pk}))
+        self.assertEqual(_beer.get_absolute_url(), 
+                         reverse('beer-detail', kwargs={'pk': _beer.slug}))
+    
+    def test_unknown_route(self):
+        self.assertIsNone(api_urlcache.url_templates.get_path('no-such-detail', 7))
+# /UrlTemplateTest
+
+
+@override_settings(DEFERRED_RATINGS=False, FAST_PATH_SERIALIZERS=False)
+class QueryPlanTest(APITestCase):
+    
+    def add_reviews(self, _count):
+        for _index in range(_count):
+            _number = api_models.BeerReview.objects.count()
+            api_models.BeerReview.objects.create(
+                        rater=User.objects.create(username='plan-rater-%d' % _number), 
+                        title="Planned review %d" % _number, 
+                        beer=api_models.Beer.objects.create(name="Planned Ale %d" % _number, 
+                                                            **SAMPLE_DRINKS[api_models.Beer]), 
+                        **get_ratings(api_models.BeerReview, 1))
+    
+    def test_nested_serializers_joined(self):
+        self.add_reviews(3)
+        _queryset = api_queryplan.apply_query_plan(api_models.BeerReview.objects.all(), 
+                                                   api_serializers.BeerReviewSerializer)
+        _context = {'request': Request(RequestFactory().get('/'))}
+        with self.assertNumQueries(1):
+            api_serializers.BeerReviewSerializer(list(_queryset), 
+                                                 many=True, 
+                                                 context=_context).data
+    
+    def test_list_queries_do_not_grow_with_the_page(self):
+        _counts = []
+        for _count in (1, 5):
+            self.add_reviews(_count)
+            # Once warm, so the cached count query is not part of either run.
+            self.client.get('/beerreviews/')
+            with CaptureQueriesContext(connection) as _queries:
+                self.assertEqual(self.client.get('/beerreviews/').status_code, 200)
+            _counts.append(len(_queries.captured_queries))
+        self.assertEqual(_counts[0], _counts[1])
+# /QueryPlanTest
+
+
+class CursorPaginationTest(APITestCase):
+    
+    def create_beer(self, _name):
+        return api_models.Beer.objects.create(name=_name, **SAMPLE_DRINKS[api_models.Beer])
+    
+    def read_names(self, _url, _params=None):
+        _response = self.client.get(_url, _params)
+        self.assertEqual(_response.status_code, 200)
+        return [_result['name'] for _result in _response.data['results']], _response.data['next']
+    
+    def test_stable_across_inserts(self):
+        for _letter in 'BDFH':
+            self.create_beer("Cursor %s" % _letter)
+        _names, _next = self.read_names('/beers/', {'cursor': '', 'page_size': 2})
+        self.assertEqual(_names, ["Cursor B", "Cursor D"])
+        # Before the cursor, which an offset page would shift onto page 2; 
+        # and after it, which the next page picks up.
+        self.create_beer("Cursor A")
+        self.create_beer("Cursor E")
+        _names, _next = self.read_names(_next)
+        self.assertEqual(_names, ["Cursor E", "Cursor F"])
+        _names, _next = self.read_names(_next)
+        self.assertEqual(_names, ["Cursor H"])
+        self.assertIsNone(_next)
+    
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/beers/', {'cursor': 'not-a-cursor'}).status_code, 
+                         400)
+# /CursorPaginationTest
+
+
+class ExportTest(APITestCase):
+    
+    def setUp(self):
+        self.beers = [api_models.Beer.objects.create(name="Exported Ale %d" % _index, 
+                                                     **SAMPLE_DRINKS[api_models.Beer]) 
+                      for _index in range(5)]
+        self.client.force_authenticate(User.objects.create(username='export-reader'))
+    
+    def read_ids(self, _params):
+        _response = self.client.get('/export/beers/', _params)
+        self.assertEqual(_response.status_code, 200)
+        self.assertTrue(_response.streaming)
+        return [json.loads(_line.decode('utf-8'))['id'] 
+                for _line in b''.join(_response.streaming_content).splitlines()]
+    
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_every_row_in_id_order(self):
+        _ids = [_beer.pk for _beer in self.beers]
+        self.assertEqual(self.read_ids({}), _ids)
+        self.assertEqual(self.read_ids({'after': _ids[2]}), _ids[3:])
+    
+    def test_chunks_read_as_consumed(self):
+        _request = Request(RequestFactory().get('/'))
+        for _enabled in (True, False):
+            with override_settings(FAST_PATH_SERIALIZERS=_enabled):
+                _rows = api_export.iter_export(api_models.Beer.objects.all(), 
+                                               api_serializers.BeerSerializer, 
+                                               _request, 
+                                               chunk_size=2, 
+                                               context={'request': _request})
+                with self.assertNumQueries(1):
+                    next(_rows)
+                # Two more chunks, the last one short.
+                with self.assertNumQueries(2):
+                    self.assertEqual(len(list(_rows)), 4)
+# /ExportTest
+
+
+# EOF - publican_api tests
@@ -0,0 +1,103 @@
+"""publican_api trending"""
+
+import datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+import publican_api.models as api_models
+import publican_api.ratings as api_ratings
+import publican_api.urlcache as api_urlcache
+
+
+CACHE_KEY = 'publican_api:trending:{0}:{1}'
+
+
+def get_trending_windows():
+    return getattr(settings, 'TRENDING_WINDOWS', (1, 7, 30))
+
+
+def get_trending_limit():
+    return getattr(settings, 'TRENDING_LIMIT', 25)
+
+
+def get_drink_models():
+    return [_review_model._meta.get_field(_review_model.drink_field).rel.to 
+            for _review_model in api_ratings.REVIEW_MODELS]
+
+
+def compute_trending(_drink_model, _days):
+    """
+    Rank drinks by review count, then rating sum, over the last _days days 
+    (today included) from the daily rollups alone, and return up to 
+    TRENDING_LIMIT entries with their window and all-time ratings.
+    """
+    _content_type = ContentType.objects.get_for_model(_drink_model)
+    _since = timezone.now().date() - datetime.timedelta(days=_days - 1)
+    _ranked = list(api_models.RatingRollup.objects
+                                          .filter(drink_content_type=_content_type, 
+                                                  day__gte=_since)
+                                          .order_by()
+                                          .values_list('drink_object_id')
+                                          .annotate(Sum('review_count'), 
+                                                    Sum('rating_sum'))
+                                          .filter(review_count__sum__gt=0)
+                                          .order_by('-review_count__sum', 
+                                                    '-rating_sum__sum')
+                                          [:get_trending_limit()])
+    _drinks = _drink_model.objects.in_bulk([_row[0] for _row in _ranked])
+    _view_name = api_urlcache.url_templates.get_view_name(_drink_model)
+    
+    _trending = []
+    for _drink_id, _review_count, _rating_sum in _ranked:
+        _drink = _drinks.get(_drink_id)
+        if _drink is None:
+            continue
+        _trending.append({
+            'rank': len(_trending) + 1, 
+            'id': _drink.pk, 
+            'name': _drink.name, 
+            'slug': _drink.slug, 
+            'url': api_urlcache.url_templates.get_path(_view_name, _drink.pk), 
+            'window_reviews': _review_count, 
+            'window_rating': _drink_model.calculate_overall_rating(_rating_sum, 
+                                                                   _review_count), 
+            'overall_rating': _drink.overall_rating, 
+        })
+    return _trending
+# /compute_trending
+
+
+def get_trending(_drink_model, _days):
+    """
+    Return the cached ranking for (_drink_model, _days), computing it only on 
+    a cache miss.  The refresh_trending command keeps the cache warm.
+    """
+    _key = CACHE_KEY.format(_drink_model._meta.model_name, _days)
+    _trending = cache.get(_key)
+    if _trending is None:
+        _trending = compute_trending(_drink_model, _days)
+        cache.set(_key, _trending, getattr(settings, 'TRENDING_CACHE_TIMEOUT', 900))
+    return _trending
+# /get_trending
+
+
+def refresh_trending():
+    """
+    Recompute and cache the ranking of every drink type for every window.
+    """
+    _refreshed = 0
+    for _drink_model in get_drink_models():
+        for _days in get_trending_windows():
+            cache.set(CACHE_KEY.format(_drink_model._meta.model_name, _days), 
+                      compute_trending(_drink_model, _days), 
+                      getattr(settings, 'TRENDING_CACHE_TIMEOUT', 900))
+            _refreshed += 1
+    return _refreshed
+# /refresh_trending
+
+
+# EOF - publican_api trending
@@ -0,0 +1,96 @@
+"""publican_api url template cache"""
+
+import threading
+
+from django.core.urlresolvers import NoReverseMatch
+from django.core.urlresolvers import get_script_prefix
+from django.core.urlresolvers import reverse
+from django.utils.http import urlquote
+
+
+# Reversed in place of a lookup value; matches the routers' '[^/.]+' lookup
+# pattern and cannot occur in any route of its own.
+SENTINEL = 'publicanurltemplatelookup'
+
+
+def get_detail_view_name(_model):
+    return _model._meta.verbose_name.replace(' ', '') + "-detail"
+
+
+def quote_lookup(_value):
+    # Percent-encoded as reverse() encodes its kwargs; ints need none.
+    if isinstance(_value, int):
+        return _value
+    return urlquote(_value)
+
+
+class UrlTemplateCache(object):
+    """
+    Reverses each (view name, lookup kwarg) route once, with SENTINEL as the 
+    lookup value, and keeps the resulting path as a format string.  Later 
+    URLs for the route are a str.format of the lookup value into the path, 
+    with no resolver regex work.  Routes that need more kwargs than the 
+    lookup, or a format suffix, are not cached; callers fall back to 
+    reverse() for those.
+    """
+    def __init__(self):
+        self._templates = {}
+        self._view_names = {}
+        self._lock = threading.Lock()
+    
+    def get_view_name(self, _model):
+        _view_name = self._view_names.get(_model)
+        if _view_name is None:
+            _view_name = self._view_names[_model] = get_detail_view_name(_model)
+        return _view_name
+    
+    def get_template(self, _view_name, _kwarg='pk'):
+        _key = (_view_name, _kwarg, get_script_prefix())
+        try:
+            return self._templates[_key]
+        except KeyError:
+            pass
+        try:
+            _path = reverse(_view_name, kwargs={_kwarg: SENTINEL})
+        except NoReverseMatch:
+            _template = None
+        else:
+            _template = (_path.replace('{', '{{')
+                              .replace('}', '}}')
+                              .replace(SENTINEL, '{0}'))
+        with self._lock:
+            self._templates[_key] = _template
+        return _template
+    
+    def get_path(self, _view_name, _value, _kwarg='pk'):
+        """Return the path of _view_name for _value, or None if not cached."""
+        _template = self.get_template(_view_name, _kwarg)
+        if _template is None:
+            return None
+        return _template.format(quote_lookup(_value))
+    
+    def get_url(self, _view_name, _value, _kwarg='pk', request=None, format=None):
+        """
+        Return the URL of _view_name for _value, absolute when a request is 
+        given, or None if the route cannot be served from a template.
+        """
+        if format is not None:
+            return None
+        _path = self.get_path(_view_name, _value, _kwarg)
+        if _path is None or request is None:
+            return _path
+        return self.get_url_root(request) + _path
+    
+    def get_url_root(self, request):
+        # The scheme and host are fixed for the request; build them once.
+        _root = getattr(request, '_publican_url_root', None)
+        if _root is None:
+            _root = request._publican_url_root = request.build_absolute_uri('/')[:-1]
+        return _root
+# /UrlTemplateCache
+
+
+url_templates = UrlTemplateCache()
+
+
+# EOF - publican_api url template cache
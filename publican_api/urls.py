@@ -18,8 +18,21 @@ admin.autodiscover()
 
 urlpatterns = (patterns('', 
     url(r'^$', api_views.PublicanRoot.as_view()),
+    url(r'^trending/(?P<collection>[a-z]+)/$', 
+        api_views.TrendingView.as_view(), 
+        name='trending'),
+    url(r'^search/$', api_views.SearchView.as_view(), name='search'),
+    url(r'^autocomplete/$', 
+        api_views.AutocompleteView.as_view(), 
+        name='autocomplete'),
 ))
 
+urlpatterns += format_suffix_patterns(patterns('', 
+    url(r'^export/(?P<collection>[a-z]+)/$', 
+        api_views.ExportView.as_view(), 
+        name='export'),
+), allowed=['ndjson', 'csv'])
+
 resources_router = SimpleRouter()
 resources_router.register(r'beers', api_views.BeerViewSet)
 resources_router.register(r'wines', api_views.WineViewSet)
@@ -33,14 +46,14 @@ resources_router.register(r'liquorglasses', api_views.LiquorGlassViewSet)
 resources_router.register(r'beerstyles', api_views.BeerStyleViewSet)
 resources_router.register(r'winestyles', api_views.WineStyleViewSet)
 resources_router.register(r'liquorstyles', api_views.LiquorStyleViewSet)
-urlpatterns += resources_router.urls
+urlpatterns += format_suffix_patterns(resources_router.urls)
 
 
 reviews_router = SimpleRouter()
 reviews_router.register(r'beerreviews', api_views.BeerReviewViewSet)
 reviews_router.register(r'winereviews', api_views.WineReviewViewSet)
 reviews_router.register(r'liquorreviews', api_views.LiquorReviewViewSet)
-urlpatterns += reviews_router.urls
+urlpatterns += format_suffix_patterns(reviews_router.urls)
 
 
 users_router = ExtendedSimpleRouter()
@@ -63,7 +76,7 @@ users_routes.register(r'liquorreviews',
                       api_views.LiquorReviewViewSet,
                       base_name='liquorreviews',
                       parents_query_lookups=['publican_api_liquorreview_rater'])
-urlpatterns += users_router.urls
+urlpatterns += format_suffix_patterns(users_router.urls)
 
 
 # Login, logout, and admin views for the browsable API
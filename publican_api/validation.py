@@ -0,0 +1,96 @@
+"""publican_api range validation"""
+
+import threading
+
+from django.utils.text import capfirst
+
+import publican_api.basemodels as api_basemodels
+
+
+VALUE_MESSAGE = "{0} value should be between {1} to {2}."
+RATING_MESSAGE = "{0} should be rated on a scale of {1} to {2}."
+
+# Message labels of attributes not named by capitalizing them.
+RANGE_LABELS = {
+    'abv': "ABV", 
+    'bottlestyle': "Bottle style", 
+    'ibu': "IBU", 
+}
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+class RangeTable(object):
+    """
+    A model's (attribute, minimum, maximum) rows compiled into one validator. 
+    Labels and bounds are resolved once; messages are only formatted for 
+    values that fail.
+    """
+    def __init__(self, rows, message, types):
+        # rows: (attribute, minimum, maximum, label)
+        self.rows = tuple(rows)
+        self.message = message
+        self.types = types
+    
+    def check(self, attrs, required=False, skip=()):
+        """
+        Return {attribute: [message]} for every out-of-range value in attrs, 
+        or an empty dict.  Missing values fail only when required.
+        """
+        _errors = {}
+        for _attribute, _min, _max, _label in self.rows:
+            if _attribute in skip:
+                continue
+            _value = attrs.get(_attribute)
+            if _value is None:
+                if not required:
+                    continue
+            elif (not isinstance(_value, bool) and isinstance(_value, self.types)
+                    and _min <= _value <= _max):
+                continue
+            _errors[_attribute] = [self.message.format(_label, _min, _max)]
+        return _errors
+    
+    def check_many(self, payloads, required=True):
+        """
+        Check a list of payloads in one pass and return (index, errors) for 
+        each failing one.  Payloads that are not dicts are left to the caller.
+        """
+        _failures = []
+        for _index, _payload in enumerate(payloads):
+            if isinstance(_payload, dict):
+                _errors = self.check(_payload, required)
+                if _errors:
+                    _failures.append((_index, _errors))
+        return _failures
+# /RangeTable
+
+
+def compile_range_table(_model):
+    if issubclass(_model, api_basemodels.Review):
+        _rows, _message, _types = _model.RATING_RANGES, RATING_MESSAGE, (int,)
+    else:
+        _rows, _message, _types = _model.VALUE_RANGES, VALUE_MESSAGE, (int, float)
+    return RangeTable([(_attribute, 
+                        _min, 
+                        _max, 
+                        RANGE_LABELS.get(_attribute, capfirst(_attribute)))
+                       for _attribute, _min, _max in _rows], 
+                      _message, 
+                      _types)
+# /compile_range_table
+
+
+def get_range_table(_model):
+    """Return the RangeTable of a Review or Drink model, compiling it once."""
+    _table = _tables.get(_model)
+    if _table is None:
+        _table = compile_range_table(_model)
+        with _tables_lock:
+            _tables[_model] = _table
+    return _table
+# /get_range_table
+
+
+# EOF - publican_api range validation
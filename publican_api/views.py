@@ -1,31 +1,52 @@
 """publican_api views"""
 
+from collections import namedtuple
 from collections import OrderedDict
 
 from django.db import models
 from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
 from django.http import Http404
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.urlresolvers import NoReverseMatch
 from django.contrib.contenttypes.models import ContentType
 
 from rest_framework.views import APIView
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.reverse import reverse
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.templatetags.rest_framework import replace_query_param
 from rest_framework.views import exception_handler
+from rest_framework.exceptions import ParseError
 from rest_framework import authentication
 from rest_framework import permissions
 from rest_framework import viewsets
 from rest_framework import generics
+from rest_framework import status
 
 from rest_framework_extensions.mixins import NestedViewSetMixin
 
+import publican_api.autocomplete as api_autocomplete
+import publican_api.counts as api_counts
+import publican_api.export as api_export
+import publican_api.fastpath as api_fastpath
+import publican_api.filters as api_filters
 import publican_api.models as api_models
+import publican_api.pagination as api_pagination
 import publican_api.basemodels as api_basemodels
+import publican_api.ingest as api_ingest
 import publican_api.serializers as api_serializers
 import publican_api.permissions as api_permissions
+import publican_api.queryplan as api_queryplan
+import publican_api.renderers as api_renderers
+import publican_api.registry as api_registry
+import publican_api.search as api_search
 import publican_api.throttles as api_throttles
+import publican_api.trending as api_trending
 
 
 def get_subclassed_models(_app_label, _app_mod, _base_model):
@@ -37,12 +58,11 @@ def get_subclassed_models(_app_label, _app_mod, _base_model):
 
 def get_instance(_models, _clue):
     if isinstance(_clue, str):
-        for _model in _models:
-            try:
-              return _model.objects.get(Q(name=_clue) | Q(slug=_clue))
-            except _model.DoesNotExist:
-              continue #Ignore any model that doesn't return a result during loop.
-        raise Http404 #But, if no model returned a query result, raise not found.
+        #One indexed catalog lookup across every model instead of one per model.
+        _instance = api_models.CatalogEntry.lookup(_clue, _models)
+        if _instance is None:
+            raise Http404 #No model has an item with that name or slug.
+        return _instance
     raise ParseError("Attribute to search must be 'name' or 'slug' of item.")
 # /get_instance
 
@@ -66,56 +86,772 @@ class PublicanRoot(APIView):
     Finds all publican entities and returns them as hyperlinked resources.
     </pre>
     """
+    def get_cache_key(self, request, format=None):
+        # The browsable API renders the user and forms into the page, so only 
+        # the other renderers' output is the same for every request.
+        if isinstance(request.accepted_renderer, BrowsableAPIRenderer):
+            return None
+        return (request.is_secure(), request.get_host(), format, 
+                request.accepted_media_type)
+    
     def get(self, request, *args, **kwargs):
-        _app_label = settings.APP_LABEL
-        _models_dict = OrderedDict()
+        _format = kwargs.get('format', None)
+        self.root_cache_key = self.get_cache_key(request, format=_format)
+        if self.root_cache_key is not None:
+            _rendered = api_registry.get_registry().get_rendered_root(self.root_cache_key)
+            if _rendered is not None:
+                return HttpResponse(_rendered[0], content_type=_rendered[1])
+        #Users first, then resources (subclasses of basemodels.Resource), then 
+        #reviews (subclasses of basemodels.Review), from the model registry.
+        return Response(api_registry.get_registry().get_root_document(
+                                                request, 
+                                                format=_format))
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(PublicanRoot, self).finalize_response(request, response, 
+                                                               *args, **kwargs)
+        if (isinstance(response, Response) and response.status_code == 200 
+            and getattr(self, 'root_cache_key', None) is not None):
+            response.render()
+            api_registry.get_registry().set_rendered_root(self.root_cache_key, 
+                                                          response.content, 
+                                                          response['Content-Type'])
+        return response
+# /PublicanRoot
+
+
+class TrendingView(APIView):
+    """
+    <pre>
+    Ranks `beers`, `wines` or `liquors` by review activity over a sliding 
+    window of days.  Rankings are read from daily rollups and cached.
+    
+    PARAMETERS:
+    'days':                 (int,       one of TRENDING_WINDOWS, default 7)
+    'limit':                (int,       1-TRENDING_LIMIT, default 10)
+    </pre>
+    """
+    def get(self, request, collection, *args, **kwargs):
+        _drink_models = dict((_model._meta.verbose_name_plural, _model) 
+                             for _model in api_trending.get_drink_models())
+        if collection not in _drink_models:
+            raise Http404
         
-        _resource_models = get_subclassed_models(_app_label, 
-                                                 api_models, 
-                                                 api_basemodels.Resource)
+        try:
+            _days = int(request.QUERY_PARAMS.get('days', 7))
+            _limit = int(request.QUERY_PARAMS.get('limit', 10))
+        except ValueError:
+            raise ParseError("'days' and 'limit' must be integers.")
+        if _days not in api_trending.get_trending_windows():
+            raise ParseError("'days' must be one of %s." % 
+                             ", ".join(str(_window) for _window 
+                                       in api_trending.get_trending_windows()))
+        _limit = max(1, min(_limit, api_trending.get_trending_limit()))
         
-        _review_models = get_subclassed_models(_app_label, 
-                                               api_models, 
-                                               api_basemodels.Review)
+        _trending = []
+        for _entry in api_trending.get_trending(_drink_models[collection], 
+                                                _days)[:_limit]:
+            _entry = dict(_entry)
+            _entry['url'] = request.build_absolute_uri(_entry['url'])
+            _trending.append(_entry)
+        return Response(OrderedDict([('days', _days), ('results', _trending)]))
+# /TrendingView
+
+
+class SparseFieldsMixin(object):
+    """
+    GET requests may pass `?fields=name,slug,...` to receive only those 
+    fields.  Names are checked against the serializer class before any 
+    query runs; the serializer is narrowed to them and the queryset loads 
+    only their columns with only(), or values_list() on the fast path.
+    """
+    fields_param = 'fields'
+    
+    sparse_fields = None
+    
+    def initial(self, request, *args, **kwargs):
+        super(SparseFieldsMixin, self).initial(request, *args, **kwargs)
+        _param = request.QUERY_PARAMS.get(self.fields_param)
+        if request.method != 'GET' or not _param:
+            return
+        _requested = set(_name.strip() for _name in _param.split(',') if _name.strip())
+        _known = (api_serializers.get_field_names(
+                        super(SparseFieldsMixin, self).get_serializer_class()) 
+                  # Response fields added outside the serializer, by other 
+                  # mixins such as RatingHistogramMixin.
+                  + tuple(getattr(self, 'extra_fields', ())))
+        _unknown = sorted(_requested.difference(_known))
+        if _unknown:
+            raise ParseError("Unknown fields: %s.  Choose from: %s." % (
+                                ", ".join(_unknown), ", ".join(_known)))
+        self.sparse_fields = tuple(_name for _name in _known if _name in _requested)
+    
+    def get_serializer_class(self):
+        _serializer_class = super(SparseFieldsMixin, self).get_serializer_class()
+        if self.sparse_fields is None:
+            return _serializer_class
+        return api_serializers.get_sparse_serializer_class(_serializer_class, 
+                                                           self.sparse_fields)
+    
+    def get_queryset(self):
+        _queryset = super(SparseFieldsMixin, self).get_queryset()
+        if self.sparse_fields is None:
+            return _queryset
+        _columns = []
+        for _name in self.sparse_fields:
+            try:
+                _field = _queryset.model._meta.get_field(_name)
+            except FieldDoesNotExist:
+                continue
+            if _field.concrete and not isinstance(_field, models.ManyToManyField):
+                _columns.append(_name)
+        return _queryset.only('pk', *_columns)
+# /SparseFieldsMixin
+
+
+class QueryPlanMixin(object):
+    """
+    Joins or prefetches every relation the serializer class renders, nested 
+    serializers and related hyperlinks alike, so a page costs a fixed number 
+    of queries instead of one or more per row.
+    """
+    def get_queryset(self):
+        return api_queryplan.apply_query_plan(
+                            super(QueryPlanMixin, self).get_queryset(), 
+                            self.get_serializer_class())
+# /QueryPlanMixin
+
+
+class FastListMixin(object):
+    """
+    With FAST_PATH_SERIALIZERS on, list responses are serialized from 
+    values_list() rows by the compiled fast path of the viewset's 
+    serializer, with output identical to DRF's.  Serializers without one, 
+    and format-suffixed requests, use DRF.  For 
+    streaming renderers the rows are produced lazily from a database 
+    iterator instead of as one list.
+    """
+    def get_list_mapper(self, request):
+        """
+        Return a function serializing a queryset on the fast path, or None 
+        when the request must go through DRF.
+        """
+        _fast = api_fastpath.get_fast_serializer(self.get_serializer_class(), 
+                                                 self.queryset.model)
+        _map_rows = None
+        if _fast is not None and self.allow_empty and self.format_kwarg is None:
+            _map_rows = _fast.bind_rows(request)
+        if _map_rows is None:
+            return None
+        if (isinstance(request.accepted_renderer, api_renderers.StreamingRenderer) 
+                and not getattr(self, 'expansions', ())):
+            return lambda _queryset: api_fastpath.iter_rows(_fast, _map_rows, _queryset)
+        return lambda _queryset: _map_rows(_queryset.values_list(*_fast.columns))
+    
+    def list(self, request, *args, **kwargs):
+        # Paginated lists are mapped by CountFreePaginationMixin; this only 
+        # serves unpaginated ones.
+        _mapper = self.get_list_mapper(request)
+        if _mapper is None or self.get_paginate_by() is not None:
+            return super(FastListMixin, self).list(request, *args, **kwargs)
+        self.object_list = self.filter_queryset(self.get_queryset())
+        return Response(_mapper(self.object_list))
+# /FastListMixin
+
+
+class StreamingRenderMixin(object):
+    """
+    Responses negotiated to a StreamingRenderer (NDJSON, CSV) are sent as a 
+    StreamingHttpResponse, encoded one row at a time as the rows are 
+    produced, so memory stays flat however large the page.  Those formats 
+    carry only the rows, so a paginated list's next and previous links go 
+    in a Link header and its count, when known, in X-Total-Count.
+    """
+    def get_pagination_headers(self, _data):
+        if not isinstance(_data, dict) or 'results' not in _data:
+            return {}
+        _headers = {}
+        _links = ['<%s>; rel="%s"' % (_data[_key], _rel) 
+                  for _key, _rel in (('next', 'next'), ('previous', 'prev')) 
+                  if _data.get(_key)]
+        if _links:
+            _headers['Link'] = ", ".join(_links)
+        if _data.get('count') is not None:
+            _headers['X-Total-Count'] = str(_data['count'])
+        return _headers
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(StreamingRenderMixin, self).finalize_response(request, 
+                                                                       response, 
+                                                                       *args, 
+                                                                       **kwargs)
+        _renderer = getattr(response, 'accepted_renderer', None)
+        if (not isinstance(_renderer, api_renderers.StreamingRenderer) 
+                or response.data is None):
+            return response
+        _streaming = StreamingHttpResponse(
+                        _renderer.stream(response.data, 
+                                         response.accepted_media_type, 
+                                         response.renderer_context), 
+                        status=response.status_code, 
+                        content_type="%s; charset=%s" % (response.accepted_media_type, 
+                                                         _renderer.charset))
+        for _header, _value in response.items():
+            if _header.lower() != 'content-type':
+                _streaming[_header] = _value
+        for _header, _value in self.get_pagination_headers(response.data).items():
+            _streaming[_header] = _value
+        _streaming.cookies = response.cookies
+        return _streaming
+# /StreamingRenderMixin
+
+
+class CursorPaginationMixin(object):
+    """
+    Lists requested with `?cursor=` (empty for the first page) are paged by 
+    keyset instead of offset: ordered by the model's Meta.ordering, or by 
+    `?order=updated`, with pk as the tiebreaker, and linked by opaque 
+    next/previous cursors.  Every page costs the same however deep it is.  
+    Other lists keep offset pagination.
+    """
+    cursor_param = 'cursor'
+    order_param = 'order'
+    
+    def list(self, request, *args, **kwargs):
+        if self.cursor_param not in request.QUERY_PARAMS:
+            return super(CursorPaginationMixin, self).list(request, *args, **kwargs)
         
+        _model = self.queryset.model
+        _orderings = api_pagination.get_orderings(_model)
+        _ordering = request.QUERY_PARAMS.get(self.order_param, _orderings[0])
+        if _ordering not in _orderings:
+            raise ParseError("'%s' must be one of %s." % (self.order_param, 
+                                                          ", ".join(_orderings)))
+        _paginator = api_pagination.KeysetPaginator(
+                            self.filter_queryset(self.get_queryset()), 
+                            _ordering, 
+                            self.get_paginate_by() or api_settings.PAGINATE_BY)
+        try:
+            _page = _paginator.paginate(request.QUERY_PARAMS[self.cursor_param])
+        except api_pagination.InvalidCursor as _error:
+            raise ParseError(str(_error))
         
-        #Add users to first position in sorted root dictionary.
-        _models_dict['users'] = reverse('user-list', 
-                                        request=request, 
-                                        format=kwargs.get('format', None)
-                                        )
+        self.object_list = _page.object_list
+        _get_mapper = getattr(self, 'get_list_mapper', None)
+        _mapper = _get_mapper(request) if _get_mapper is not None else None
+        if _mapper is not None:
+            _results = _mapper(self.object_list)
+        else:
+            _results = self.get_serializer(self.object_list, many=True).data
+        _url = request.build_absolute_uri()
+        return Response(OrderedDict([
+            ('next', replace_query_param(_url, self.cursor_param, _page.next_cursor) 
+                     if _page.next_cursor else None), 
+            ('previous', replace_query_param(_url, self.cursor_param, _page.previous_cursor) 
+                         if _page.previous_cursor else None), 
+            ('results', _results), 
+        ]))
+# /CursorPaginationMixin
+
+
+def order_totally(_queryset):
+    """
+    Return _queryset ordered by its ordering, then pk, so each row's place 
+    is fixed: offset pages neither repeat nor skip rows, and a page read 
+    twice yields the same rows in the same order.
+    """
+    _ordering = list(_queryset.query.order_by 
+                     or (_queryset.query.default_ordering and _queryset.model._meta.ordering) 
+                     or ())
+    if _ordering and _ordering[-1] in ('pk', '-pk', 'id', '-id'):
+        return _queryset
+    return _queryset.order_by(*(_ordering + ['pk']))
+
+
+class CountFreePaginationMixin(object):
+    """
+    Offset pages are read with one query for page_size + 1 rows; the extra 
+    row decides `next`, so no COUNT(*) runs alongside the page.  `count` is 
+    the collection's cached row count, dropped on every create and delete, 
+    or null for nested routes and filtered lists, which list a subset.  It 
+    relies on the ROW_COUNT_CACHE alias being shared by every process; see 
+    counts.get_count.
+    """
+    def get_page_number(self):
+        _page = (self.kwargs.get(self.page_kwarg) 
+                 or self.request.QUERY_PARAMS.get(self.page_kwarg) 
+                 or 1)
+        try:
+            _page = int(_page)
+        except ValueError:
+            raise Http404("Page must be an integer.")
+        if _page < 1:
+            raise Http404("Page must be 1 or more.")
+        return _page
+    
+    def get_cached_count(self):
+        if (getattr(self, 'get_parents_query_dict', dict)() 
+                or getattr(self, 'range_filters', None)):
+            return None
+        return api_counts.get_count(self.queryset)
+    
+    def list(self, request, *args, **kwargs):
+        _page_size = self.get_paginate_by()
+        if _page_size is None:
+            return super(CountFreePaginationMixin, self).list(request, *args, **kwargs)
         
-        #Add favorites to second position in sorted root dictionary.
-        # _models_dict['favorites'] = reverse('favorite-list', 
-                                        # request=request, 
-                                        # format=kwargs.get('format', None)
-                                        # )
-                
-        #Add resources (subclasses of basemodels.Resource) to root dictionary.
-        for _rsc_model in _resource_models:
-            _model_name = _rsc_model._meta.verbose_name_plural.replace(' ', '')
-            _view_name = _rsc_model._meta.verbose_name.replace(' ', '') + "-list"
-            _resource_url = reverse(_view_name, 
-                                    request=request, 
-                                    format=kwargs.get('format', None)
-                                    )
-            _models_dict[_model_name] = _resource_url
+        _page = self.get_page_number()
+        _offset = (_page - 1) * _page_size
+        _queryset = order_totally(self.filter_queryset(self.get_queryset()))
+        _window = _queryset[_offset:_offset + _page_size + 1]
+        _get_mapper = getattr(self, 'get_list_mapper', None)
+        _mapper = _get_mapper(request) if _get_mapper is not None else None
+        if _mapper is not None:
+            _rows = list(_mapper(_window))
+            _has_next = len(_rows) > _page_size
+            _results = _rows[:_page_size]
+            # Lazy; only ExpandMixin reads the page back, for its keys.
+            self.object_list = _queryset[_offset:_offset + _page_size]
+        else:
+            _instances = list(_window)
+            _has_next = len(_instances) > _page_size
+            self.object_list = _instances[:_page_size]
+            _results = self.get_serializer(self.object_list, many=True).data
+        if not _results and _page > 1:
+            raise Http404("Page %d is past the end of the list." % _page)
+
+        _url = request.build_absolute_uri()
+        return Response(OrderedDict([
+            ('count', self.get_cached_count()), 
+            ('next', replace_query_param(_url, self.page_kwarg, _page + 1) 
+                     if _has_next else None), 
+            ('previous', replace_query_param(_url, self.page_kwarg, _page - 1) 
+                         if _page > 1 else None), 
+            ('results', _results), 
+        ]))
+# /CountFreePaginationMixin
+
+
+class RangeFilterMixin(object):
+    """
+    GET requests may filter on the model's FILTER_FIELDS, as `?abv=5` or 
+    with a gt, gte, lt or lte lookup, as `?abv__gte=5&ibu__lte=40`.  Only 
+    whitelisted, indexed fields and lookups are accepted, and values are 
+    checked before any query runs.  Filtered lists are ordered by the first 
+    filtered field, then id, so they are index range scans; FilterPlanTest 
+    confirms it for each combination.
+    """
+    range_filters = None
+    
+    def initial(self, request, *args, **kwargs):
+        super(RangeFilterMixin, self).initial(request, *args, **kwargs)
+        if request.method != 'GET':
+            return
+        try:
+            self.range_filters = api_filters.parse_filters(self.queryset.model, 
+                                                           request.QUERY_PARAMS)
+        except api_filters.InvalidFilter as _error:
+            raise ParseError(str(_error))
+    
+    def filter_queryset(self, queryset):
+        queryset = super(RangeFilterMixin, self).filter_queryset(queryset)
+        if self.range_filters:
+            queryset = api_filters.apply_filters(queryset, self.range_filters)
+        return queryset
+# /RangeFilterMixin
+
+
+# Resource and review collections also render as CSV.
+TABULAR_RENDERER_CLASSES = (tuple(api_settings.DEFAULT_RENDERER_CLASSES) 
+                            + (api_renderers.CSVRenderer,))
+
+
+Expansion = namedtuple('Expansion', ('name', 'model', 'field', 'forward'))
+
+_expansions = {}
+
+
+def get_expansions(_model):
+    """
+    Return the relations ?expand= can inline for _model, by name: its 
+    ForeignKeys by field name, and the resources pointing at it by 
+    collection, with its reviews as 'reviews'.
+    """
+    _model_expansions = _expansions.get(_model)
+    if _model_expansions is not None:
+        return _model_expansions
+    _model_expansions = OrderedDict()
+    for _field in _model._meta.concrete_fields:
+        if (isinstance(_field, models.ForeignKey) 
+                and _field.rel.to in MODEL_SERIALIZERS):
+            _model_expansions[_field.name] = Expansion(_field.name, 
+                                                       _field.rel.to, 
+                                                       _field, 
+                                                       True)
+    for _related in _model._meta.get_all_related_objects():
+        _entry = api_registry.get_registry().by_model.get(_related.model)
+        if _entry is None or _related.model not in MODEL_SERIALIZERS:
+            continue
+        _name = ('reviews' if issubclass(_related.model, api_basemodels.Review) 
+                 else _entry.collection)
+        _model_expansions[_name] = Expansion(_name, 
+                                             _related.model, 
+                                             _related.field, 
+                                             False)
+    _expansions[_model] = _model_expansions
+    return _model_expansions
+# /get_expansions
+
+
+class ExpandMixin(object):
+    """
+    GET requests may pass `?expand=beer,breweries,reviews,...` to inline 
+    related resources in place of, or next to, their hyperlinks.  Names are 
+    checked before any query runs.  Each relation is loaded with one query 
+    for the whole page, keyed by the page's ids, and serialized by the 
+    related viewset's serializer, on its fast path where it has one.  
+    Reverse relations, such as a drink's reviews, are unbounded, so each 
+    group holds at most PAGINATE_BY rows, lowest ids first, picked by one 
+    index probe per result; `<name>_truncated` says whether rows were left 
+    out.
+    """
+    expand_param = 'expand'
+    
+    expansions = ()
+    
+    def initial(self, request, *args, **kwargs):
+        super(ExpandMixin, self).initial(request, *args, **kwargs)
+        _param = request.QUERY_PARAMS.get(self.expand_param)
+        if request.method != 'GET' or not _param:
+            return
+        _requested = set(_name.strip() for _name in _param.split(',') if _name.strip())
+        _known = get_expansions(self.queryset.model)
+        _unknown = sorted(_requested.difference(_known))
+        if _unknown:
+            raise ParseError("Unknown expansions: %s.  Choose from: %s." % (
+                                ", ".join(_unknown), ", ".join(_known)))
+        self.expansions = tuple(_expansion for _name, _expansion in _known.items() 
+                                if _name in _requested)
+    
+    def get_expansion_limit(self):
+        return api_settings.PAGINATE_BY
+    
+    def get_forward_expansions(self):
+        return [_expansion for _expansion in self.expansions if _expansion.forward]
+    
+    def get_keys(self, _object_list):
+        """
+        Return the (pk, forward key, ...) tuple of each object the results 
+        were serialized from.  The results themselves may be values_list() 
+        rows or sparse, so they cannot be relied on.  A queryset, as the fast 
+        path leaves in object_list, is read back with one narrow query over 
+        the same totally ordered window.
+        """
+        _forward = self.get_forward_expansions()
+        if isinstance(_object_list, list):
+            return [(_object.pk,) + tuple(getattr(_object, _expansion.field.attname) 
+                                          for _expansion in _forward)
+                    for _object in _object_list]
+        return list(_object_list.values_list('pk', *[_expansion.field.name 
+                                                     for _expansion in _forward]))
+    
+    def list(self, request, *args, **kwargs):
+        response = super(ExpandMixin, self).list(request, *args, **kwargs)
+        if not self.expansions or response.status_code != status.HTTP_200_OK:
+            return response
+        _results = response.data
+        if isinstance(_results, dict):
+            _results = _results['results']
+        self.expand_results(_results, self.get_keys(self.object_list))
+        return response
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = super(ExpandMixin, self).retrieve(request, *args, **kwargs)
+        if not self.expansions or response.status_code != status.HTTP_200_OK:
+            return response
+        self.expand_results([response.data], self.get_keys([self.object]))
+        return response
+    
+    def expand_results(self, _results, _keys):
+        """
+        Inline every requested expansion into _results, given the matching 
+        (pk, forward key, ...) tuple of each result.
+        """
+        _forward = self.get_forward_expansions()
+        for _expansion in self.expansions:
+            _column = 1 + _forward.index(_expansion) if _expansion.forward else 0
+            _ids = set(_key[_column] for _key in _keys if _key[_column] is not None)
+            _groups, _truncated = (self.load_expansion(_expansion, list(_ids)) 
+                                   if _ids else ({}, set()))
+            for _result, _key in zip(_results, _keys):
+                if _expansion.forward:
+                    _result[_expansion.name] = _groups.get(_key[_column], [None])[0]
+                else:
+                    _result[_expansion.name] = _groups.get(_key[0], [])
+                    _result[_expansion.name + '_truncated'] = _key[0] in _truncated
+    
+    def load_expansion(self, _expansion, _ids):
+        """
+        Fetch the rows of _expansion for _ids with one query and return their 
+        representations grouped by id, {id: [representation, ...]}, with the 
+        set of ids whose reverse group was cut at get_expansion_limit().
+        """
+        _serializer_class = MODEL_SERIALIZERS[_expansion.model]
+        _key = 'pk' if _expansion.forward else _expansion.field.name
+        _truncated = set()
+        if _expansion.forward:
+            _queryset = _expansion.model.objects.filter(pk__in=_ids)
+        else:
+            # The foreign key index is (key, pk), so each probe reads only 
+            # limit + 1 index entries however large the group.
+            _limit = self.get_expansion_limit()
+            _pks = []
+            for _id in _ids:
+                _group = list(_expansion.model.objects.filter(**{_key: _id})
+                                                      .order_by('pk')
+                                                      .values_list('pk', flat=True)[:_limit + 1])
+                if len(_group) > _limit:
+                    _truncated.add(_id)
+                _pks.extend(_group[:_limit])
+            _queryset = _expansion.model.objects.filter(pk__in=_pks)
         
-        #Add reviews (subclasses of basemodels.Review) to root dictionary.
-        for _rvw_model in _review_models:
-            _model_name = _rvw_model._meta.verbose_name_plural.replace(' ', '')
-            _view_name = _rvw_model._meta.verbose_name.replace(' ', '') + "-list"
-            _resource_url = reverse(_view_name, 
-                                    request=request, 
-                                    format=kwargs.get('format', None)
-                                    )
-            _models_dict[_model_name] = _resource_url
+        _fast = api_fastpath.get_fast_serializer(_serializer_class, _expansion.model)
+        _map_rows = None
+        if _fast is not None and self.format_kwarg is None:
+            _map_rows = _fast.bind_rows(self.request)
+        if _map_rows is not None:
+            _rows = list(_queryset.values_list(*(_fast.columns + (_key,))))
+            _row_ids = [_row[-1] for _row in _rows]
+            _data = _map_rows(_rows)
+        else:
+            _instances = list(api_queryplan.apply_query_plan(_queryset, _serializer_class))
+            _attname = 'pk' if _expansion.forward else _expansion.field.attname
+            _row_ids = [getattr(_instance, _attname) for _instance in _instances]
+            _data = _serializer_class(_instances, 
+                                      many=True, 
+                                      context=self.get_serializer_context()).data
         
-        return Response(_models_dict)
-# /PublicanRoot
+        _groups = {}
+        for _id, _item in zip(_row_ids, _data):
+            _groups.setdefault(_id, []).append(_item)
+        return _groups, _truncated
+# /ExpandMixin
 
 
-class BeerViewSet(viewsets.ModelViewSet):
+class SlugOrPkLookupMixin(object):
+    """
+    Detail routes accept either the pk or the slug.  Slugs are never all 
+    digits, so each request is a single probe of the pk or the unique slug 
+    index, never a filter that may match several rows.
+    """
+    def get_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.filter_queryset(self.get_queryset())
+        _lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        _field = self.lookup_field if _lookup.isdigit() else self.slug_field
+        obj = generics.get_object_or_404(queryset, **{_field: _lookup})
+        self.check_object_permissions(self.request, obj)
+        return obj
+# /SlugOrPkLookupMixin
+
+
+class SearchView(APIView):
+    """
+    <pre>
+    Ranked full-text search across every resource and review, by name or 
+    title first, then location, type, description and fruit.
+    
+    PARAMETERS:
+    'q':                    (str,       words to match, the last as a prefix)
+    'type':                 (str,       comma separated collections, optional)
+    'page':                 (int,       default 1)
+    'page_size':            (int,       1-MAX_PAGINATE_BY, default PAGINATE_BY)
+    </pre>
+    """
+    def get(self, request, *args, **kwargs):
+        _query = request.QUERY_PARAMS.get('q', '')
+        _models = None
+        if request.QUERY_PARAMS.get('type'):
+            try:
+                _models = api_search.get_search_models(
+                                    request.QUERY_PARAMS['type'].split(','))
+            except KeyError:
+                raise ParseError("'type' must be a comma separated list of collections.")
+        try:
+            _page = int(request.QUERY_PARAMS.get('page', 1))
+            _page_size = int(request.QUERY_PARAMS.get(api_settings.PAGINATE_BY_PARAM, 
+                                                      api_settings.PAGINATE_BY))
+        except ValueError:
+            raise ParseError("'page' and 'page_size' must be integers.")
+        _page = max(1, _page)
+        _page_size = max(1, min(_page_size, api_settings.MAX_PAGINATE_BY))
+        
+        _count, _hits = api_search.search(_query, 
+                                          _models, 
+                                          offset=(_page - 1) * _page_size, 
+                                          limit=_page_size)
+        _url = request.build_absolute_uri()
+        _results = []
+        for _instance, _score in _hits:
+            _results.append(OrderedDict([
+                ('type', api_registry.get_registry().by_model[type(_instance)].collection), 
+                ('id', _instance.pk), 
+                ('name', str(_instance)), 
+                ('slug', _instance.slug), 
+                ('url', request.build_absolute_uri(_instance.get_absolute_url())), 
+                ('score', _score), 
+            ]))
+        return Response(OrderedDict([
+            ('count', _count), 
+            ('next', replace_query_param(_url, 'page', _page + 1) 
+                     if _page * _page_size < _count else None), 
+            ('previous', replace_query_param(_url, 'page', _page - 1) 
+                         if _page > 1 else None), 
+            ('results', _results), 
+        ]))
+# /SearchView
+
+
+class AutocompleteView(APIView):
+    """
+    <pre>
+    Completes resource names from an in-process index, best rated drinks 
+    first.  Each process holds its own index: names written by this process 
+    show up once their transaction commits, but names written by other 
+    processes, and every drink rating, lag by up to 
+    AUTOCOMPLETE_RATING_REFRESH seconds.
+    
+    PARAMETERS:
+    'q':                    (str,       name prefix, case-insensitive)
+    'type':                 (str,       comma separated collections, optional)
+    'limit':                (int,       1-AUTOCOMPLETE_LIMIT, default AUTOCOMPLETE_LIMIT)
+    </pre>
+    """
+    def get(self, request, *args, **kwargs):
+        _prefix = request.QUERY_PARAMS.get('q', '')
+        _collections = None
+        if request.QUERY_PARAMS.get('type'):
+            _collections = frozenset(request.QUERY_PARAMS['type'].split(','))
+            if not _collections <= set(_entry.collection for _entry 
+                                       in api_registry.get_registry().resources):
+                raise ParseError("'type' must be a comma separated list of resource collections.")
+        try:
+            _limit = int(request.QUERY_PARAMS.get('limit', 
+                                                  api_autocomplete.get_autocomplete_limit()))
+        except ValueError:
+            raise ParseError("'limit' must be an integer.")
+        _limit = max(1, min(_limit, api_autocomplete.get_autocomplete_limit()))
+        if not _prefix.strip():
+            return Response([])
+        
+        return Response([OrderedDict([
+                            ('type', _collection), 
+                            ('id', _pk), 
+                            ('name', _name), 
+                            ('slug', _slug), 
+                            ('overall_rating', _rating), 
+                        ]) for _collection, _pk, _name, _slug, _rating 
+                        in api_autocomplete.autocomplete_index.complete(_prefix, 
+                                                                        _limit, 
+                                                                        _collections)])
+# /AutocompleteView
+
+
+class ExportView(StreamingRenderMixin, APIView):
+    """
+    <pre>
+    Streams every row of a resource or review collection as NDJSON or CSV, 
+    in id order, read in keyset chunks of EXPORT_CHUNK_SIZE rows so memory 
+    stays flat.  Pass the last id received as 'after' to resume.
+    
+    PARAMETERS:
+    'after':                (int,       last id already received, default 0)
+    'format':               (str,       'ndjson' or 'csv', default 'ndjson')
+    
+    PERMISSIONS:
+    authenticated:          (RETRIEVE)
+    </pre>
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = (api_renderers.NDJSONRenderer, 
+                        api_renderers.CSVRenderer,)
+    
+    def get(self, request, collection, *args, **kwargs):
+        _registry = api_registry.get_registry()
+        _models = dict((_entry.collection, _entry.model) 
+                       for _entry in _registry.resources + _registry.reviews)
+        if collection not in _models:
+            raise Http404
+        try:
+            _after = int(request.QUERY_PARAMS.get('after', 0))
+        except ValueError:
+            raise ParseError("'after' must be an integer.")
+        
+        _model = _models[collection]
+        return Response(api_export.iter_export(_model.objects.all(), 
+                                               MODEL_SERIALIZERS[_model], 
+                                               request, 
+                                               after=_after, 
+                                               context={'request': request, 
+                                                        'view': self, 
+                                                        'format': None}))
+# /ExportView
+
+
+class RatingHistogramMixin(object):
+    """
+    Adds the drink's materialized `rating_histogram` to detail responses.  
+    The histogram is read from its own table, never from the review tables.
+    """
+    extra_fields = ('rating_histogram',)
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = super(RatingHistogramMixin, self).retrieve(request, 
+                                                              *args, 
+                                                              **kwargs)
+        if (getattr(self, 'sparse_fields', None) is not None 
+                and 'rating_histogram' not in self.sparse_fields):
+            return response
+        response.data['rating_histogram'] = \
+                        api_models.RatingHistogram.get_histogram(self.object)
+        return response
+# /RatingHistogramMixin
+
+
+class PublicanDrinkViewSet(StreamingRenderMixin, 
+                           ExpandMixin, 
+                           CursorPaginationMixin, 
+                           CountFreePaginationMixin, 
+                           RangeFilterMixin, 
+                           SparseFieldsMixin, 
+                           FastListMixin, 
+                           SlugOrPkLookupMixin, 
+                           RatingHistogramMixin, 
+                           viewsets.ModelViewSet):
+    """
+    Base of the drink viewsets: resource lists with range filters and the 
+    rating histogram on detail responses.
+    """
+# /PublicanDrinkViewSet
+
+
+class PublicanResourceViewSet(StreamingRenderMixin, 
+                              ExpandMixin, 
+                              CursorPaginationMixin, 
+                              CountFreePaginationMixin, 
+                              SparseFieldsMixin, 
+                              QueryPlanMixin, 
+                              FastListMixin, 
+                              SlugOrPkLookupMixin, 
+                              viewsets.ModelViewSet):
+    """
+    Base of the facility, glass and style viewsets: resource lists with 
+    their related drink joined by the query plan.
+    """
+# /PublicanResourceViewSet
+
+
+class BeerViewSet(PublicanDrinkViewSet):
     """
     <pre>
     Handles `beer` resources.
@@ -126,6 +862,21 @@ class BeerViewSet(viewsets.ModelViewSet):
     'calories':             (int,       50-1000)
     'abv':                  (float,     0-80)
     
+    DETAIL ONLY:
+    'rating_histogram':     (dict,      rating-->review count)
+    
+    EXPAND:
+    'breweries':            (list,      brewery resources, at most PAGINATE_BY)
+    'beerglasses':          (list,      beer glass resources, at most PAGINATE_BY)
+    'beerstyles':           (list,      beer style resources, at most PAGINATE_BY)
+    'reviews':              (list,      beer reviews, at most PAGINATE_BY)
+    
+    FILTERS:
+    'ibu':                  (int,       exact, gt, gte, lt, lte)
+    'calories':             (int,       exact, gt, gte, lt, lte)
+    'abv':                  (float,     exact, gt, gte, lt, lte)
+    'overall_rating':       (float,     exact, gt, gte, lt, lte)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -136,13 +887,14 @@ class BeerViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.BeerSerializer
     queryset = api_models.Beer.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'drinkcreate'
 # /BeerViewSet
 
 
-class WineViewSet(viewsets.ModelViewSet):
+class WineViewSet(PublicanDrinkViewSet):
     """
     <pre>
     Handles `wine` resources.
@@ -154,6 +906,21 @@ class WineViewSet(viewsets.ModelViewSet):
     'tannin':               (choice,    'L','H')
     'fruit':                (str,       0-128 chars)
     
+    DETAIL ONLY:
+    'rating_histogram':     (dict,      rating-->review count)
+    
+    EXPAND:
+    'wineries':             (list,      winery resources, at most PAGINATE_BY)
+    'wineglasses':          (list,      wine glass resources, at most PAGINATE_BY)
+    'winestyles':           (list,      wine style resources, at most PAGINATE_BY)
+    'reviews':              (list,      wine reviews, at most PAGINATE_BY)
+    
+    FILTERS:
+    'sweetness':            (int,       exact, gt, gte, lt, lte)
+    'acidity':              (float,     exact, gt, gte, lt, lte)
+    'tannin':               (choice,    exact)
+    'overall_rating':       (float,     exact, gt, gte, lt, lte)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -164,13 +931,14 @@ class WineViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.WineSerializer
     queryset = api_models.Wine.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'drinkcreate'
 # /WineViewSet
 
 
-class LiquorViewSet(viewsets.ModelViewSet):
+class LiquorViewSet(PublicanDrinkViewSet):
     """
     <pre>
     Handles `liquor` resources.
@@ -180,6 +948,20 @@ class LiquorViewSet(viewsets.ModelViewSet):
     'calories':             (int,       50-1000)
     'abv':                  (float,     0-80)
     
+    DETAIL ONLY:
+    'rating_histogram':     (dict,      rating-->review count)
+    
+    EXPAND:
+    'distilleries':         (list,      distillery resources, at most PAGINATE_BY)
+    'liquorglasses':        (list,      liquor glass resources, at most PAGINATE_BY)
+    'liquorstyles':         (list,      liquor style resources, at most PAGINATE_BY)
+    'reviews':              (list,      liquor reviews, at most PAGINATE_BY)
+    
+    FILTERS:
+    'calories':             (int,       exact, gt, gte, lt, lte)
+    'abv':                  (float,     exact, gt, gte, lt, lte)
+    'overall_rating':       (float,     exact, gt, gte, lt, lte)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -190,13 +972,14 @@ class LiquorViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.LiquorSerializer
     queryset = api_models.Liquor.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'drinkcreate'
 # /LiquorViewSet
 
 
-class BreweryViewSet(viewsets.ModelViewSet):
+class BreweryViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `brewery` resources.
@@ -206,6 +989,9 @@ class BreweryViewSet(viewsets.ModelViewSet):
     'location':             (str,       8-128 chars)
     'beer':                 (int,       fk-->Beer<pk>)
     
+    EXPAND:
+    'beer':                 (dict,      beer resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -216,13 +1002,14 @@ class BreweryViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.BrewerySerializer
     queryset = api_models.Brewery.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'facilitycreate'
 # /BreweryViewSet
 
 
-class WineryViewSet(viewsets.ModelViewSet):
+class WineryViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `winery` resources.
@@ -232,6 +1019,9 @@ class WineryViewSet(viewsets.ModelViewSet):
     'location':             (str,       8-128 chars)
     'wine':                 (int,       fk-->Wine<pk>)
     
+    EXPAND:
+    'wine':                 (dict,      wine resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -242,13 +1032,14 @@ class WineryViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.WinerySerializer
     queryset = api_models.Winery.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'facilitycreate'
 # /WineryViewSet
 
 
-class DistilleryViewSet(viewsets.ModelViewSet):
+class DistilleryViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `distillery` resources.
@@ -258,6 +1049,9 @@ class DistilleryViewSet(viewsets.ModelViewSet):
     'location':             (str,       8-128 chars)
     'liquor':               (int,       fk-->Liquor<pk>)
     
+    EXPAND:
+    'liquor':               (dict,      liquor resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -268,13 +1062,14 @@ class DistilleryViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.DistillerySerializer
     queryset = api_models.Distillery.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'facilitycreate'
 # /DistilleryViewSet
 
 
-class BeerGlassViewSet(viewsets.ModelViewSet):
+class BeerGlassViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `beer glass` resources.
@@ -284,6 +1079,9 @@ class BeerGlassViewSet(viewsets.ModelViewSet):
     'type':                 (str,       8-128 chars)
     'beer':                 (int,       fk-->Beer<pk>)
     
+    EXPAND:
+    'beer':                 (dict,      beer resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -294,13 +1092,14 @@ class BeerGlassViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.BeerGlassSerializer
     queryset = api_models.BeerGlass.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'glasscreate'
 # /BeerGlassViewSet
 
 
-class WineGlassViewSet(viewsets.ModelViewSet):
+class WineGlassViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `wine glass` resources.
@@ -310,6 +1109,9 @@ class WineGlassViewSet(viewsets.ModelViewSet):
     'type':                 (str,       8-128 chars)
     'wine':                 (int,       fk-->Wine<pk>)
     
+    EXPAND:
+    'wine':                 (dict,      wine resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -320,13 +1122,14 @@ class WineGlassViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.WineGlassSerializer
     queryset = api_models.WineGlass.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'glasscreate'
 # /WineGlassViewSet
 
 
-class LiquorGlassViewSet(viewsets.ModelViewSet):
+class LiquorGlassViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `liquor glass` resources.
@@ -336,6 +1139,9 @@ class LiquorGlassViewSet(viewsets.ModelViewSet):
     'type':                 (str,       8-128 chars)
     'liquor':               (int,       fk-->Liquor<pk>)
     
+    EXPAND:
+    'liquor':               (dict,      liquor resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -346,13 +1152,14 @@ class LiquorGlassViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.LiquorGlassSerializer
     queryset = api_models.LiquorGlass.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'glasscreate'
 # /LiquorGlassViewSet
 
 
-class BeerStyleViewSet(viewsets.ModelViewSet):
+class BeerStyleViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `beer style` resources.
@@ -362,6 +1169,9 @@ class BeerStyleViewSet(viewsets.ModelViewSet):
     'description':          (str,       8-128 chars)
     'beer':                 (int,       fk-->Beer<pk>)
     
+    EXPAND:
+    'beer':                 (dict,      beer resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -372,13 +1182,14 @@ class BeerStyleViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.BeerStyleSerializer
     queryset = api_models.BeerStyle.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'stylecreate'
 # /BeerStyleViewSet
 
 
-class WineStyleViewSet(viewsets.ModelViewSet):
+class WineStyleViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `wine style` resources.
@@ -388,6 +1199,9 @@ class WineStyleViewSet(viewsets.ModelViewSet):
     'description':          (str,       8-128 chars)
     'wine':                 (int,       fk-->Wine<pk>)
     
+    EXPAND:
+    'wine':                 (dict,      wine resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -398,13 +1212,14 @@ class WineStyleViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.WineStyleSerializer
     queryset = api_models.WineStyle.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'stylecreate'
 # /WineStyleViewSet
 
 
-class LiquorStyleViewSet(viewsets.ModelViewSet):
+class LiquorStyleViewSet(PublicanResourceViewSet):
     """
     <pre>
     Handles `liquor style` resources.
@@ -414,6 +1229,9 @@ class LiquorStyleViewSet(viewsets.ModelViewSet):
     'description':          (str,       8-128 chars)
     'liquor':               (int,       fk-->Liquor<pk>)
     
+    EXPAND:
+    'liquor':               (dict,      liquor resource)
+    
     PERMISSIONS:
     authenticated:          (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE only)
@@ -424,13 +1242,55 @@ class LiquorStyleViewSet(viewsets.ModelViewSet):
     """
     serializer_class = api_serializers.LiquorStyleSerializer
     queryset = api_models.LiquorStyle.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
     throttle_scope = 'stylecreate'
 # /LiquorStyleViewSet
 
 
-class FavoriteViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
+class BulkReviewMixin(object):
+    """
+    POSTing a JSON array instead of a single object ingests the whole batch 
+    at once: one validation pass, one bulk insert and one aggregate update 
+    per touched drink.  Items that fail validation are reported by index 
+    without failing the rest of the batch.  Batches are throttled under 
+    their own scope, bulk_throttle_scope, rather than the single create's.
+    """
+    bulk_throttle_scope = 'reviewbulk'
+    
+    def check_throttles(self, request):
+        if request.method == 'POST' and isinstance(request.DATA, list):
+            self.throttle_scope = self.bulk_throttle_scope
+        super(BulkReviewMixin, self).check_throttles(request)
+    
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.DATA, list):
+            return super(BulkReviewMixin, self).create(request, *args, **kwargs)
+        
+        if len(request.DATA) > api_ingest.get_max_bulk_reviews():
+            raise ParseError("At most %d reviews per batch." % 
+                             api_ingest.get_max_bulk_reviews())
+        
+        _created, _errors = api_ingest.ingest_reviews(self.queryset.model, 
+                                                      request.DATA, 
+                                                      request.user)
+        _data = OrderedDict([
+            ('created', len(_created)), 
+            ('failed', len(_errors)), 
+            ('errors', [OrderedDict([('index', _index), ('errors', _item_errors)]) 
+                        for _index, _item_errors in _errors]), 
+        ])
+        _status = status.HTTP_201_CREATED if _created else status.HTTP_400_BAD_REQUEST
+        return Response(_data, status=_status)
+# /BulkReviewMixin
+
+
+class FavoriteViewSet(StreamingRenderMixin, 
+                      CountFreePaginationMixin, 
+                      SparseFieldsMixin, 
+                      viewsets.ModelViewSet, 
+                      NestedViewSetMixin):
     """
     <pre>
     Handles `favorite` resources.
@@ -454,7 +1314,24 @@ class FavoriteViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
 # /FavoriteViewSet
 
 
-class BeerReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
+class PublicanReviewViewSet(StreamingRenderMixin, 
+                            CursorPaginationMixin, 
+                            CountFreePaginationMixin, 
+                            SparseFieldsMixin, 
+                            QueryPlanMixin, 
+                            FastListMixin, 
+                            SlugOrPkLookupMixin, 
+                            BulkReviewMixin, 
+                            viewsets.ModelViewSet, 
+                            NestedViewSetMixin):
+    """
+    Base of the review viewsets: keyset or offset lists, bulk creates, and 
+    nested routes under their rater.
+    """
+# /PublicanReviewViewSet
+
+
+class BeerReviewViewSet(PublicanReviewViewSet):
     """
     <pre>
     Handles `beer review` resources.
@@ -470,16 +1347,22 @@ class BeerReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
     'palate':               (int,       1-5)
     'bottlestyle':          (int,       1-5)
     
+    BULK CREATE:
+    POST a list of the above (with 'beer' as an id, slug or URL) to ingest 
+    a batch.
+    
     PERMISSIONS:
     authenticated & owner:  (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE)
     
     THROTTLES:
     create:                 (1/week)
+    bulk create:            (1/week)
     </pre>
     """
     serializer_class = api_serializers.BeerReviewSerializer
     queryset = api_models.BeerReview.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly, 
                           api_permissions.IsOwnerOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
@@ -490,7 +1373,7 @@ class BeerReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
 # /BeerReviewViewSet
 
 
-class WineReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
+class WineReviewViewSet(PublicanReviewViewSet):
     """
     <pre>
     Handles `wine review` resources.
@@ -512,16 +1395,22 @@ class WineReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
     'complexity':           (int,       1-10)
     'bottlestyle':          (int,       1-5)
     
+    BULK CREATE:
+    POST a list of the above (with 'wine' as an id, slug or URL) to ingest 
+    a batch.
+    
     PERMISSIONS:
     authenticated & owner:  (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE)
     
     THROTTLES:
     create:                 (1/week)
+    bulk create:            (1/week)
     </pre>
     """
     serializer_class = api_serializers.WineReviewSerializer
     queryset = api_models.WineReview.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly, 
                           api_permissions.IsOwnerOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
@@ -532,7 +1421,7 @@ class WineReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
 # /WineReviewViewSet
 
 
-class LiquorReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
+class LiquorReviewViewSet(PublicanReviewViewSet):
     """
     <pre>
     Handles `liquor review` resources.
@@ -547,16 +1436,22 @@ class LiquorReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
     'taste':                (int,       1-10)
     'aftertaste':           (int,       1-5)
     
+    BULK CREATE:
+    POST a list of the above (with 'liquor' as an id, slug or URL) to ingest 
+    a batch.
+    
     PERMISSIONS:
     authenticated & owner:  (CREATE/RETRIEVE/UPDATE/DELETE)
     anonymous:              (RETRIEVE)
     
     THROTTLES:
     create:                 (1/week)
+    bulk create:            (1/week)
     </pre>
     """
     serializer_class = api_serializers.LiquorReviewSerializer
     queryset = api_models.LiquorReview.objects.all()
+    renderer_classes = TABULAR_RENDERER_CLASSES
     permission_classes = (permissions.IsAuthenticatedOrReadOnly, 
                           api_permissions.IsOwnerOrReadOnly,)
     throttle_classes = (api_throttles.CustomListCreateThrottle,)
@@ -567,13 +1462,21 @@ class LiquorReviewViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
 # /LiquorReviewViewSet
 
 
-class UserViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
+class UserViewSet(StreamingRenderMixin, 
+                  CountFreePaginationMixin, 
+                  SparseFieldsMixin, 
+                  FastListMixin, 
+                  SlugOrPkLookupMixin, 
+                  viewsets.ModelViewSet, 
+                  NestedViewSetMixin):
     """
     <pre>
-    Handles `user` resources.
+    Handles `user` resources, addressed by pk or username.  An all-digit 
+    username resolves as a pk.
     </pre>
     """
     serializer_class = api_serializers.UserSerializer
+    slug_field = 'username'
     queryset = User.objects.filter(is_superuser=False, 
                                    is_staff=False).order_by('-last_login')
     permission_classes = (permissions.IsAuthenticatedOrReadOnly, 
@@ -584,4 +1487,23 @@ class UserViewSet(viewsets.ModelViewSet, NestedViewSetMixin):
 # /UserViewSet
 
 
+# Each model's viewset serializer, for ?expand= and exports.
+MODEL_SERIALIZERS = dict((_viewset.queryset.model, _viewset.serializer_class) 
+                          for _viewset in (BeerViewSet, 
+                                           WineViewSet, 
+                                           LiquorViewSet, 
+                                           BreweryViewSet, 
+                                           WineryViewSet, 
+                                           DistilleryViewSet, 
+                                           BeerGlassViewSet, 
+                                           WineGlassViewSet, 
+                                           LiquorGlassViewSet, 
+                                           BeerStyleViewSet, 
+                                           WineStyleViewSet, 
+                                           LiquorStyleViewSet, 
+                                           BeerReviewViewSet, 
+                                           WineReviewViewSet, 
+                                           LiquorReviewViewSet))
+
+
 #EOF - publican_api views
\ No newline at end of file
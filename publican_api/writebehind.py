@@ -0,0 +1,109 @@
+"""publican_api write-behind rating queue"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_deferred():
+    return getattr(settings, 'DEFERRED_RATINGS', False)
+
+
+class RatingQueue(object):
+    """
+    Opt-in write-behind queue for drink rating updates (settings.DEFERRED_RATINGS).
+    
+    Review saves and deletes mark their drink dirty instead of updating the 
+    drink row themselves.  Markers for the same drink coalesce, and a local 
+    daemon thread recomputes every dirty drink once per flush interval 
+    (settings.RATING_FLUSH_INTERVAL seconds), so a burst of reviews on one 
+    drink costs one aggregate query and one UPDATE per interval.  Markers 
+    live in process memory; anything lost to a crash is repaired by the 
+    recompute_ratings command.  Tests call flush() to drain synchronously.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._stopped = threading.Event()
+        self._worker = None
+    
+    def get_interval(self):
+        return getattr(settings, 'RATING_FLUSH_INTERVAL', 5)
+    
+    def mark_dirty(self, _review_model, _drink_id):
+        with self._lock:
+            self._dirty.setdefault(_review_model, set()).add(_drink_id)
+            if self._worker is None or not self._worker.is_alive():
+                self._start()
+    
+    def pending(self):
+        with self._lock:
+            return sum(len(_drink_ids) for _drink_ids in self._dirty.values())
+    
+    def flush(self):
+        """
+        Recompute every drink marked dirty since the last flush and return how 
+        many were recomputed.  Markers are put back if a recompute fails.
+        """
+        # Imported here: ratings imports the models, which import this module.
+        import publican_api.ratings as api_ratings
+        
+        with self._lock:
+            _dirty, self._dirty = self._dirty, {}
+        
+        _flushed = 0
+        while _dirty:
+            _review_model, _drink_ids = _dirty.popitem()
+            try:
+                api_ratings.recompute_drink_ratings(_review_model, 
+                                                    drink_ids=_drink_ids)
+            except Exception:
+                _dirty[_review_model] = _drink_ids
+                with self._lock:
+                    for _model, _ids in _dirty.items():
+                        self._dirty.setdefault(_model, set()).update(_ids)
+                raise
+            _flushed += len(_drink_ids)
+        return _flushed
+    
+    def stop(self):
+        """
+        Stop the worker thread and drain whatever is still queued.
+        """
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self.flush()
+    
+    def _start(self):
+        self._stopped.clear()
+        self._worker = threading.Thread(target=self._run, 
+                                        name='publican-rating-queue')
+        self._worker.daemon = True
+        self._worker.start()
+    
+    def _run(self):
+        while not self._stopped.wait(self.get_interval()):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Deferred rating flush failed; will retry.")
+            finally:
+                # Each worker iteration gets a fresh connection, like a request.
+                connection.close()
+# /RatingQueue
+
+
+rating_queue = RatingQueue()
+atexit.register(rating_queue.stop)
+
+
+# EOF - publican_api write-behind rating queue